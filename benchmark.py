@@ -0,0 +1,375 @@
+import os
+import sys
+import time
+import tempfile
+import subprocess
+import statistics
+import argparse
+
+# Modules that should only be loaded on first use, not at startup
+LAZY_MODULES = ['requests', 'dotenv', 'csv', 'sqlite3', 'tkinter.filedialog']
+
+def parse_importtime(stderr):
+    """Parse `python -X importtime` output into (module, self_us, cumulative_us) rows"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3:
+            continue
+        rows.append((parts[2].strip(), int(parts[0]), int(parts[1])))
+    return rows
+
+def bench_startup(runs=10, top=10):
+    """Measure cold import time of calculator.py using `python -X importtime`"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    totals = []
+    last_rows = []
+
+    print(f"\n=== Startup Benchmark ({runs} runs) ===")
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', 'import calculator'],
+            cwd=here, capture_output=True, text=True
+        )
+        if proc.returncode != 0:
+            print(f"Import failed:\n{proc.stderr}")
+            return
+        last_rows = parse_importtime(proc.stderr)
+        # The calculator module itself is the last top-level import
+        totals.append(next(cum for name, _, cum in reversed(last_rows) if name == 'calculator'))
+
+    print(f"import calculator (cumulative): median {statistics.median(totals) / 1000:.1f} ms, "
+          f"min {min(totals) / 1000:.1f} ms, max {max(totals) / 1000:.1f} ms")
+
+    print(f"\nTop {top} modules by self time (last run):")
+    print(f"{'Module':<40} {'Self [ms]':>10} {'Cumulative [ms]':>16}")
+    print("-" * 68)
+    for name, self_us, cum_us in sorted(last_rows, key=lambda r: r[1], reverse=True)[:top]:
+        print(f"{name.strip():<40} {self_us / 1000:>10.2f} {cum_us / 1000:>16.2f}")
+
+    # Verify heavy modules stay unloaded until first use
+    check = subprocess.run(
+        [sys.executable, '-c',
+         'import sys, calculator; '
+         f'print(",".join(m for m in {LAZY_MODULES!r} if m in sys.modules))'],
+        cwd=here, capture_output=True, text=True
+    )
+    loaded = check.stdout.strip()
+    print(f"\nLazy modules loaded at startup: {loaded or 'none'}")
+
+def make_calculator():
+    """Create a Calculator on a hidden root window, writing its files to a temp dir"""
+    import tkinter as tk
+    from calculator import Calculator
+
+    os.chdir(tempfile.mkdtemp(prefix='calculator_bench_'))
+    root = tk.Tk()
+    root.withdraw()
+    calculator = Calculator(root)
+    root.update()
+    return root, calculator
+
+def tk_dont_wait():
+    """Flags for processing all pending Tk events without blocking"""
+    import _tkinter
+    return _tkinter.ALL_EVENTS | _tkinter.DONT_WAIT
+
+def count_widgets(widget):
+    """Count a widget and all of its descendants"""
+    return 1 + sum(count_widgets(child) for child in widget.winfo_children())
+
+def report_latencies(label, latencies):
+    """Print median/p99/max of a list of latencies in seconds"""
+    latencies = sorted(latencies)
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{label}: median {statistics.median(latencies) * 1e6:.1f} us, "
+          f"p99 {p99 * 1e6:.1f} us, max {latencies[-1] * 1e6:.1f} us")
+
+def bench_toggle(toggles=1000):
+    """Measure mode toggle latency and check the widget count does not grow"""
+    root, calculator = make_calculator()
+    print(f"\n=== Mode Toggle Benchmark ({toggles} toggles) ===")
+
+    widgets_before = count_widgets(root)
+    latencies = []
+    for _ in range(toggles):
+        start = time.perf_counter()
+        calculator.toggle_mode()
+        root.update_idletasks()
+        latencies.append(time.perf_counter() - start)
+    widgets_after = count_widgets(root)
+
+    report_latencies("Toggle latency", latencies)
+    print(f"Widgets before: {widgets_before}, after: {widgets_after} "
+          f"({'no growth' if widgets_after == widgets_before else 'GROWTH'})")
+    root.destroy()
+
+def bench_events(events=10000):
+    """Measure per-event latency of hover and key press handling"""
+    root, calculator = make_calculator()
+    print(f"\n=== Keypad Event Benchmark ({events} events) ===")
+
+    buttons = calculator.standard_keypad.winfo_children()
+    latencies = []
+    for i in range(events):
+        button = buttons[i % len(buttons)]
+        start = time.perf_counter()
+        button.event_generate('<Enter>')
+        button.event_generate('<Leave>')
+        latencies.append(time.perf_counter() - start)
+    report_latencies("Hover enter/leave", latencies)
+
+    keys = ['1', '2', '.', '5', '×', '3', '4', '±', '%', '-', '7', '=', 'C']
+    latencies = []
+    for i in range(events):
+        key = keys[i % len(keys)]
+        start = time.perf_counter()
+        calculator.button_clicked(key)
+        latencies.append(time.perf_counter() - start)
+    report_latencies("Key press", latencies)
+    root.destroy()
+
+def bench_burst(events=10000):
+    """Measure event loop latency while a burst of key events is processed"""
+    root, calculator = make_calculator()
+    print(f"\n=== Key Burst Benchmark ({events} key events) ===")
+
+    keysyms = ['1', '2', 'period', '5', 'asterisk', '3', 'plus', '7', 'Return', 'Escape']
+    display_writes = []
+    calculator.display_var.trace_add('write', lambda *args: display_writes.append(1))
+
+    # A 1 ms heartbeat timer; the gaps between ticks show how long the loop was blocked
+    ticks = [time.perf_counter()]
+    running = [True]
+    def heartbeat():
+        ticks.append(time.perf_counter())
+        if running[0]:
+            root.after(1, heartbeat)
+    root.after(1, heartbeat)
+
+    start = time.perf_counter()
+    for i in range(events):
+        root.event_generate('<Key>', keysym=keysyms[i % len(keysyms)], when='tail')
+    while root.tk.dooneevent(tk_dont_wait()):
+        pass
+    elapsed = time.perf_counter() - start
+    running[0] = False
+
+    gaps = [b - a for a, b in zip(ticks, ticks[1:])]
+    print(f"Processed {events} key events in {elapsed * 1000:.1f} ms "
+          f"({events / elapsed:,.0f} events/s)")
+    print(f"Display updates: {len(display_writes)} for {events} events")
+    if gaps:
+        report_latencies("Event loop heartbeat gap", gaps)
+    root.destroy()
+
+def bench_precision(operations=100000):
+    """Measure the cost of a parse, operate and format cycle in each precision mode"""
+    import random
+    from precision import PRECISION_MODES, parse_number, apply_operation, format_number
+
+    print(f"\n=== Precision Mode Benchmark ({operations} operations) ===")
+    rng = random.Random(42)
+    operands = [(f"{rng.uniform(-1e6, 1e6):.4f}", f"{rng.uniform(1, 1e3):.2f}",
+                 rng.choice('+-×÷')) for _ in range(1000)]
+
+    baseline = None
+    for mode in PRECISION_MODES:
+        start = time.perf_counter()
+        for i in range(operations):
+            a, b, op = operands[i % len(operands)]
+            format_number(apply_operation(op, parse_number(a, mode), parse_number(b, mode), mode))
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f"{mode:<10} {elapsed / operations * 1e6:8.2f} us/op  ({elapsed / baseline:.1f}x float)")
+
+    # Cost of automatic promotion when a float result overflows
+    start = time.perf_counter()
+    for _ in range(operations):
+        format_number(apply_operation('×', 1e200, 1e200))
+    elapsed = time.perf_counter() - start
+    print(f"{'promoted':<10} {elapsed / operations * 1e6:8.2f} us/op  (float overflow to Decimal)")
+
+def bench_line_protocol(points=100000):
+    """Measure points encoded per second, one at a time and into a batch buffer"""
+    import random
+    from line_protocol import encode_point, LineBuffer
+    from calculator_engine import operation_point
+
+    print(f"\n=== Line Protocol Benchmark ({points} points) ===")
+    rng = random.Random(42)
+    samples = [(f"{rng.uniform(-1e6, 1e6):.4f} {rng.choice('+-×÷')} {rng.uniform(1, 1e3):.2f}",
+                f"{rng.uniform(-1e6, 1e6):.6f}") for _ in range(1000)]
+    timestamp = time.time_ns()
+
+    def report(label, elapsed):
+        print(f"{label:<28} {points / elapsed:>12,.0f} points/s  ({elapsed / points * 1e6:.2f} us/point)")
+
+    start = time.perf_counter()
+    for i in range(points):
+        operation, result = samples[i % len(samples)]
+        operation_point(operation, result, timestamp)
+    report("operation_point", time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for i in range(points):
+        encode_point('calculator_bench', {'host': 'bench', 'mode': 'float'},
+                     {'value': i * 0.5, 'count': i, 'ok': True, 'note': 'a "quoted" note'}, timestamp)
+    report("encode_point (4 fields)", time.perf_counter() - start)
+
+    buffer = LineBuffer()
+    start = time.perf_counter()
+    for i in range(points):
+        operation, result = samples[i % len(samples)]
+        buffer.add_line(operation_point(operation, result, timestamp))
+    body = buffer.data()
+    report("LineBuffer batch", time.perf_counter() - start)
+    print(f"Batch size: {len(body) / 1024:.0f} KB for {len(buffer)} points")
+
+def bench_undo(presses=10000, runs=5):
+    """Measure the per-press cost of undo snapshots and their memory per 10k presses"""
+    import random
+    import tracemalloc
+    from calculator_engine import CalculatorEngine
+
+    print(f"\n=== Undo Snapshot Benchmark ({presses} presses) ===")
+    rng = random.Random(42)
+    keys = [rng.choice('0123456789') for _ in range(presses)]
+    for i in range(0, presses, 7):
+        keys[i] = rng.choice(['+', '-', '×', '÷', '=', '±', 'C'])
+
+    def press_all(undo):
+        engine = CalculatorEngine(undo_depth=presses)
+        # Without undo the handlers are called directly, as button_clicked did before
+        press = engine.button_clicked if undo else (lambda key: engine.key_handlers[key](key))
+        start = time.perf_counter()
+        for key in keys:
+            press(key)
+        return time.perf_counter() - start, engine
+
+    base = min(press_all(False)[0] for _ in range(runs))
+    with_undo = min(press_all(True)[0] for _ in range(runs))
+    print(f"Press without undo: {base / presses * 1e6:.2f} us")
+    print(f"Press with undo:    {with_undo / presses * 1e6:.2f} us "
+          f"(+{(with_undo - base) / presses * 1e6:.2f} us per press)")
+
+    engine = CalculatorEngine(undo_depth=presses)
+    tracemalloc.start()
+    for key in keys:
+        engine.button_clicked(key)
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    snapshots = len(engine.undo_stack)
+    print(f"Snapshots: {snapshots}, {used / 1024:.0f} KB for {presses} presses, "
+          f"{used / max(snapshots, 1):.0f} bytes per snapshot")
+
+    start = time.perf_counter()
+    while engine.undo_stack:
+        engine.button_clicked('undo')
+    print(f"Undo all: {(time.perf_counter() - start) / snapshots * 1e6:.2f} us per step")
+
+def bench_history_file(records=1000000):
+    """Measure open, range lookup and NumPy scan times of a large binary history"""
+    import random
+    from history_file import HistoryFile, OPERATOR_CODES
+
+    print(f"\n=== Binary History Benchmark ({records} records) ===")
+    path = os.path.join(tempfile.mkdtemp(prefix='calculator_bench_'), 'history.bin')
+    rng = random.Random(42)
+    base = 1700000000 * 10**9
+    history = HistoryFile(path)
+    start = time.perf_counter()
+    batch = 100000
+    for first in range(0, records, batch):
+        history.append([(base + i * 10**9, i + 1, rng.randrange(1, 5), 0,
+                         rng.uniform(-1e3, 1e3), rng.uniform(1, 1e3), rng.uniform(-1e6, 1e6))
+                        for i in range(first, min(first + batch, records))])
+    print(f"Append: {records / (time.perf_counter() - start):,.0f} records/s, "
+          f"{os.path.getsize(path) / 2**20:.1f} MB")
+    history.close()
+
+    start = time.perf_counter()
+    history = HistoryFile(path)
+    print(f"Open: {(time.perf_counter() - start) * 1000:.3f} ms")
+
+    lookups = 10000
+    start = time.perf_counter()
+    for _ in range(lookups):
+        lo = base + rng.randrange(records) * 10**9
+        history.range(lo, lo + 3600 * 10**9)
+    print(f"Range lookup: {(time.perf_counter() - start) / lookups * 1e6:.2f} us")
+
+    start = time.perf_counter()
+    array = history.to_numpy()
+    multiply = array[array['op'] == OPERATOR_CODES.index('multiply')]
+    mean = multiply['result'].mean()
+    print(f"NumPy scan of all records: {(time.perf_counter() - start) * 1000:.1f} ms "
+          f"(mean multiply result {mean:.1f})")
+    del array, multiply
+    history.close()
+
+def bench_streaming_stats(values=1000000, history_rows=200000):
+    """Measure per-value cost and memory of streaming statistics, and a pass over a history"""
+    import random
+    import tracemalloc
+    from history_store import HistoryStore
+    from streaming_stats import StreamingStats, history_stats
+
+    print(f"\n=== Streaming Statistics Benchmark ({values} values) ===")
+    rng = random.Random(42)
+    data = [rng.lognormvariate(0, 1) for _ in range(values)]
+    stats = StreamingStats()
+    start = time.perf_counter()
+    for x in data:
+        stats.add(x)
+    print(f"Add: {(time.perf_counter() - start) / values * 1e6:.2f} us per value")
+    # Traced separately, as tracing slows every add down
+    traced, subset = StreamingStats(), data[:values // 10]
+    tracemalloc.start()
+    for x in subset:
+        traced.add(x)
+    print(f"Peak memory while adding {len(subset)} values: "
+          f"{tracemalloc.get_traced_memory()[1] / 1024:.1f} KB")
+    tracemalloc.stop()
+    data.sort()
+    for quantile in stats.quantiles:
+        exact = data[int(quantile.p * (values - 1))]
+        print(f"P{quantile.p * 100:g}: {quantile.value():.4f} (exact {exact:.4f}, "
+              f"{abs(quantile.value() - exact) / exact * 100:.2f}% off)")
+
+    path = os.path.join(tempfile.mkdtemp(prefix='calculator_bench_'), 'history.db')
+    store = HistoryStore(path, max_rows=0)
+    store.append([{'timestamp': '2024-01-01 00:00:00', 'operation': f'{i} * 2', 'result': str(i * 2)}
+                  for i in range(history_rows)])
+    start = time.perf_counter()
+    stats = history_stats(store)
+    print(f"History pass: {history_rows / (time.perf_counter() - start):,.0f} rows/s "
+          f"(mean result {stats.mean:,.1f})")
+    store.close()
+
+BENCHMARKS = {
+    'startup': bench_startup,
+    'toggle': bench_toggle,
+    'events': bench_events,
+    'burst': bench_burst,
+    'precision': bench_precision,
+    'lineprotocol': bench_line_protocol,
+    'historyfile': bench_history_file,
+    'undo': bench_undo,
+    'stats': bench_streaming_stats,
+}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calculator performance benchmarks")
+    parser.add_argument('benchmarks', nargs='*',
+                        help=f"Benchmarks to run: {', '.join(BENCHMARKS)} (default: all)")
+    args = parser.parse_args()
+
+    unknown = [name for name in args.benchmarks if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    for name in args.benchmarks or BENCHMARKS:
+        BENCHMARKS[name]()
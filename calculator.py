@@ -1,32 +1,63 @@
 import tkinter as tk
-from tkinter import ttk, messagebox, simpledialog
-import math
-from datetime import datetime
+from tkinter import ttk, messagebox
 import json
 import os
-import csv
-import sqlite3
-from tkinter import filedialog
-import requests
-import urllib.parse
 import logging
 import time
-from dotenv import load_dotenv
+import queue
+import itertools
+import threading
+from contextlib import contextmanager
+from precision import PRECISION_MODES
+from calculator_engine import CalculatorEngine
+from export_policy import ExportPolicy, operator_name
+from circuit_breaker import CircuitBreaker
+from line_protocol import encode_point
+from error_log import setup_error_logging
 
-# Set up logging - only log errors to file
-logging.basicConfig(
-    filename='calculator_errors.log',
-    level=logging.ERROR,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
+# requests, dotenv, csv, sqlite3 and filedialog are imported on first use
+# (history load, export dialog, first InfluxDB write) to keep cold start fast.
+
+# Set up logging - only log errors, written to a rotating file by a
+# background thread with repeated errors limited
+setup_error_logging('calculator_errors.log')
 
 # Disable other loggers
 logging.getLogger('urllib3').setLevel(logging.ERROR)
 logging.getLogger('requests').setLevel(logging.ERROR)
 
-class Calculator:
+def lighten_color(color, amount=20):
+    """Return the hex color with each RGB channel lightened by amount"""
+    rgb = tuple(int(color[1:][i:i+2], 16) for i in (0, 2, 4))
+    lighter_rgb = tuple(min(255, c + amount) for c in rgb)
+    return f"#{lighter_rgb[0]:02x}{lighter_rgb[1]:02x}{lighter_rgb[2]:02x}"
+
+# Keyboard keysyms mapped to button labels; digits are matched on event.char
+KEY_BINDINGS = {
+    'plus': '+', 'KP_Add': '+',
+    'minus': '-', 'KP_Subtract': '-',
+    'asterisk': '×', 'KP_Multiply': '×',
+    'slash': '÷', 'KP_Divide': '÷',
+    'period': '.', 'KP_Decimal': '.',
+    'percent': '%',
+    'equal': '=', 'Return': '=', 'KP_Enter': '=',
+    'Escape': 'C',
+    'BackSpace': '⌫',
+}
+
+# Keys that take a typed number as an operand; in statistics mode that enters it
+STATS_ENTRY_KEYS = ('÷', '×', '-', '+', '=', 'sin', 'cos', 'tan')
+
+# Operators that change the number being entered; statistics mode counts the
+# number once it is used, not after each press
+STATS_OPERAND_OPERATORS = ('negate', 'percent', 'pi')
+
+# History entries indexed per idle step when the history panel first opens
+HISTORY_INDEX_CHUNK = 5000
+
+class Calculator(CalculatorEngine):
     def __init__(self, root):
+        super().__init__()
         self.root = root
         self.root.title("Modern Calculator")
         self.root.geometry("400x600")
@@ -40,17 +71,49 @@ class Calculator:
                        foreground="#ffffff",        # White text
                        font=("Arial", 24, "bold"))  # Bold font for better visibility
         
-        # Calculator state
-        self.current_number = ""
-        self.first_number = None
-        self.operation = None
-        self.should_clear_display = False
-        self.scientific_mode = False
-        
-        # Logging setup
+        # Side effects run off the event-handler path: display updates and
+        # log saves are coalesced on idle, InfluxDB writes go to a worker thread
+        self.pending_display = ""
+        self.display_scheduled = False
+        self.save_scheduled = False
+        self.export_queue = queue.Queue()
+        self.export_thread = None
+        self.influxdb_metadata = None
+        self.export_breaker = CircuitBreaker.from_env()
+        
+        # Which operations are exported, as raw points or interval summaries
+        self.export_policy = ExportPolicy.from_env()
+        if self.export_policy.mode == 'aggregate':
+            self.root.after(int(self.export_policy.interval * 1000), self.flush_export_summary)
+        
+        # Pending InfluxDB lines while batched input is evaluated
+        self.batch_lines = None
+        
+        # Logging setup - history is loaded once the window is shown. It is
+        # shared with other calculator instances through a SQLite store;
+        # calculator_log.json is only read to import older history.
         self.log_file = "calculator_log.json"
         self.max_log_entries = 25
-        self.load_log()
+        self.log = []
+        self.log_loaded = False
+        self.history = None
+        self.pending_history = []
+        # Index of the whole history for the history panel, built when it is first shown
+        self.history_index = None
+        self.history_panel = None
+        # Statistics mode is on while its panel is open
+        self.stats_panel = None
+        # Whether ±, % or π changed the current number since it was last counted
+        self.stats_operand_changed = False
+        self.history_poll_ms = int(float(os.environ.get("CALCULATOR_HISTORY_POLL", 1)) * 1000)
+        self.root.after_idle(self.load_log)
+        
+        # Input events are journaled for replay.py when CALCULATOR_JOURNAL names a file
+        journal_file = os.environ.get("CALCULATOR_JOURNAL")
+        if journal_file:
+            from session_journal import SessionJournal
+            self.journal = SessionJournal(journal_file)
+            self.journal.reset(self.precision_mode, self.decimal_digits)
         
         # InfluxDB settings - try to get from environment variables first
         self.influxdb_url = os.environ.get("INFLUXDB_URL", "")
@@ -71,7 +134,9 @@ class Calculator:
             justify='right',
             bd=5,
             fg='black',  # Set text color to black
-            bg='white'   # Set background to white for better contrast
+            bg='white',  # Set background to white for better contrast
+            readonlybackground='white',
+            state='readonly'  # Typed keys are handled by on_key instead
         )
         self.display.grid(row=0, column=0, columnspan=4, padx=5, pady=5, sticky='nsew')
         
@@ -87,7 +152,21 @@ class Calculator:
                                   bg="#4b4b4b", fg="white",
                                   relief="flat", borderwidth=0,
                                   command=self.export_log)
-        self.export_btn.grid(row=2, column=0, columnspan=4, padx=5, pady=5, sticky="nsew")
+        self.export_btn.grid(row=2, column=0, columnspan=2, padx=5, pady=5, sticky="nsew")
+        
+        # Create history panel button
+        self.history_btn = tk.Button(root, text="History", font=("Arial", 12),
+                                   bg="#4b4b4b", fg="white",
+                                   relief="flat", borderwidth=0,
+                                   command=self.show_history)
+        self.history_btn.grid(row=2, column=2, padx=5, pady=5, sticky="nsew")
+        
+        # Create statistics mode button
+        self.stats_btn = tk.Button(root, text="Stats", font=("Arial", 12),
+                                 bg="#4b4b4b", fg="white",
+                                 relief="flat", borderwidth=0,
+                                 command=self.show_stats)
+        self.stats_btn.grid(row=2, column=3, padx=5, pady=5, sticky="nsew")
         
         # Create InfluxDB settings button
         self.influxdb_btn = tk.Button(root, text="InfluxDB Settings", font=("Arial", 12),
@@ -96,6 +175,13 @@ class Calculator:
                                     command=self.show_influxdb_settings)
         self.influxdb_btn.grid(row=3, column=0, columnspan=4, padx=5, pady=5, sticky="nsew")
         
+        # Create precision mode button
+        self.precision_btn = tk.Button(root, text=self.precision_label(), font=("Arial", 12),
+                                     bg="#4b4b4b", fg="white",
+                                     relief="flat", borderwidth=0,
+                                     command=self.cycle_precision)
+        self.precision_btn.grid(row=4, column=0, columnspan=4, padx=5, pady=5, sticky="nsew")
+        
         # Button layout for standard mode
         self.standard_buttons = [
             ('C', '#a5a5a5'), ('±', '#a5a5a5'), ('%', '#a5a5a5'), ('÷', '#ff9500'),
@@ -117,7 +203,7 @@ class Calculator:
         
         # Create buttons container
         self.buttons_frame = tk.Frame(root, bg="#2b2b2b")
-        self.buttons_frame.grid(row=4, column=0, columnspan=4, sticky="nsew")
+        self.buttons_frame.grid(row=5, column=0, columnspan=4, sticky="nsew")
         
         # Configure grid weights
         for i in range(7):  # Increased for scientific mode
@@ -125,59 +211,162 @@ class Calculator:
         for i in range(4):
             root.grid_columnconfigure(i, weight=1)
         
+        # Hover colors per base color
+        self.hover_colors = {}
+        
         # Create buttons
         self.create_buttons()
         
+        # Keyboard input and paste-driven bulk entry
+        root.bind("<Key>", self.on_key)
+        root.bind("<<Paste>>", self.on_paste)
+        root.bind("<Control-z>", self.on_undo)
+        root.bind("<Control-y>", self.on_redo)
+        root.bind("<Control-Z>", self.on_redo)
+        root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
     def load_log(self):
-        """Load the log from file or create a new one if it doesn't exist"""
-        if os.path.exists(self.log_file):
-            try:
-                with open(self.log_file, 'r') as f:
-                    self.log = json.load(f)
-            except:
-                self.log = []
-        else:
-            self.log = []
+        """Load recent history, keeping any entries added before it was loaded"""
+        if self.log_loaded:
+            return
+        self.log_loaded = True
+        try:
+            from history_store import HistoryStore
+            self.history = HistoryStore.from_env()
+            self.history.import_json(self.log_file)
+            loaded = self.history.recent(self.max_log_entries)
+        except Exception as e:
+            logging.error(f"History not loaded: {str(e)}")
+            self.history = None
+            return
+        self.log = (loaded + self.log)[-self.max_log_entries:]
+        self.root.after(self.history_poll_ms, self.poll_history)
     
     def save_log(self):
-        """Save the log to file"""
-        with open(self.log_file, 'w') as f:
-            json.dump(self.log, f)
+        """Append entries added since the last save to the shared history"""
+        # Never write history that has not been read yet
+        if not self.log_loaded:
+            self.load_log()
+        entries, self.pending_history = self.pending_history, []
+        if self.history is None or not entries:
+            return
+        try:
+            self.history.append(entries)
+        except Exception as e:
+            logging.error(f"Log not saved: {str(e)}")
+    
+    def poll_history(self):
+        """Pick up entries other calculator instances added to the shared history"""
+        try:
+            entries = self.history.new_entries()
+        except Exception as e:
+            logging.error(f"History not read: {str(e)}")
+            entries = []
+        self.merge_history(entries)
+        self.root.after(self.history_poll_ms, self.poll_history)
+    
+    def merge_history(self, entries):
+        """Add entries from other instances to the log and the history index"""
+        if not entries:
+            return
+        self.log = (self.log + entries)[-self.max_log_entries:]
+        if self.history_index is not None:
+            for entry in entries:
+                self.history_index.add(entry)
+            self.refresh_history_panel()
+    
+    def show_history(self):
+        """Open the history panel, indexing the history the first time"""
+        if self.history_panel is not None:
+            self.history_panel.window.lift()
+            return
+        if self.history_index is None:
+            self.build_history_index()
+        from history_panel import HistoryPanel
+        self.history_panel = HistoryPanel(self)
+    
+    def show_stats(self):
+        """Open the statistics panel, starting statistics mode"""
+        if self.stats_panel is not None:
+            self.stats_panel.window.lift()
+            return
+        from stats_panel import StatsPanel
+        self.stats_panel = StatsPanel(self)
+    
+    def build_history_index(self):
+        """Index the whole shared history, archive included, loading it in idle-time chunks"""
+        from history_index import HistoryIndex
+        self.load_log()
+        if self.history is None:
+            self.history_index = HistoryIndex()
+            self.history_index.backfill(self.log)
+            return
+        # Save and pick up everything so far, before the index exists so the
+        # backfill is the only way these entries reach it; later entries
+        # reach it through add_to_log and merge_history while it loads
+        self.save_log()
+        try:
+            self.merge_history(self.history.new_entries())
+        except Exception as e:
+            logging.error(f"History not read: {str(e)}")
+        self.history_index = HistoryIndex()
+        self.history_index.start_backfill()
+        entries = self.history.iter_entries(stop_id=self.history.last_id)
+        self.root.after_idle(self.backfill_history_index, entries)
+    
+    def backfill_history_index(self, entries):
+        """Index the next chunk of the history"""
+        try:
+            chunk = list(itertools.islice(entries, HISTORY_INDEX_CHUNK))
+        except Exception as e:
+            logging.error(f"History not read: {str(e)}")
+            chunk = []
+        self.history_index.backfill(chunk)
+        if len(chunk) == HISTORY_INDEX_CHUNK:
+            self.root.after(1, self.backfill_history_index, entries)
+        else:
+            self.history_index.finish_backfill()
+        self.refresh_history_panel()
+    
+    def refresh_history_panel(self):
+        if self.history_panel is not None:
+            self.history_panel.schedule_refresh()
+    
+    
+    def schedule_save_log(self):
+        """Save the log once the event loop is idle, coalescing repeated saves"""
+        if not self.save_scheduled:
+            self.save_scheduled = True
+            self.root.after_idle(self.flush_log)
+    
+    def flush_log(self):
+        """Save the log if a save is pending"""
+        if self.save_scheduled:
+            self.save_scheduled = False
+            self.save_log()
     
     def add_to_log(self, operation, result):
         """Add an operation to the log and maintain only the last 25 entries"""
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        # Format the operation string
-        operation = str(operation).strip()
-        operation = operation.replace('×', '*')
-        operation = operation.replace('÷', '/')
-        
-        # Format the result
-        if result:
-            result = str(result).strip()
-            try:
-                # Try to convert to float and format
-                result = f"{float(result):g}"
-            except ValueError:
-                # If not a number, keep as is
-                pass
-        else:
-            result = "0"
-        
-        log_entry = {
-            "timestamp": timestamp,
-            "operation": operation,
-            "result": result
-        }
-        
+        log_entry = self.make_log_entry(operation, result)
         self.log.append(log_entry)
+        self.pending_history.append(log_entry)
+        if self.journal is not None:
+            self.journal.log_entry(log_entry)
+        if self.history_index is not None:
+            self.history_index.add(log_entry)
+            self.refresh_history_panel()
+        if operator_name(operation) in STATS_OPERAND_OPERATORS:
+            self.stats_operand_changed = True
+        else:
+            self.stats_operand_changed = False
+            if self.stats_panel is not None:
+                self.stats_panel.add_value(result)
         
         # Keep only the last max_log_entries
         if len(self.log) > self.max_log_entries:
             self.log = self.log[-self.max_log_entries:]
         
-        self.save_log()
+        self.schedule_save_log()
     
     def load_influxdb_settings(self):
         """Load InfluxDB settings from file if they exist"""
@@ -268,6 +457,7 @@ class Calculator:
     
     def test_influxdb_connection(self, url, token, org, bucket):
         """Test the connection to InfluxDB"""
+        import requests
         try:
             # Construct the health check URL
             health_url = f"{url.rstrip('/')}/health"
@@ -294,8 +484,64 @@ class Calculator:
         messagebox.showinfo("Settings Saved", "InfluxDB settings have been saved.")
     
     def export_to_influxdb(self, operation, result):
-        """Export operation data to InfluxDB"""
+        """Export operation data to InfluxDB, or add it to the current batch"""
+        if not self.export_policy.record(operation, result):
+            return
+        line = self.format_influxdb_line(operation, result)
+        if self.batch_lines is not None:
+            self.batch_lines.append(line)
+        else:
+            self.queue_export([line])
+    
+    def flush_export_summary(self, force=False):
+        """Export the summary point of the current interval in aggregate mode"""
+        line = self.export_policy.summary_line(force=force)
+        if line:
+            self.queue_export([line])
+        if not force:
+            self.root.after(int(self.export_policy.interval * 1000), self.flush_export_summary)
+    
+    def queue_export(self, lines):
+        """Hand lines to the background export thread, starting it on first use"""
+        if self.export_thread is None:
+            self.export_thread = threading.Thread(target=self.export_worker, daemon=True)
+            self.export_thread.start()
+        self.export_queue.put(lines)
+    
+    def export_worker(self):
+        """Write queued lines to InfluxDB, combining everything queued since the last write"""
+        while True:
+            lines = self.export_queue.get()
+            if lines is None:
+                return
+            stop = False
+            while True:
+                try:
+                    more = self.export_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if more is None:
+                    stop = True
+                    break
+                lines = lines + more
+            self.write_to_influxdb(lines)
+            if stop:
+                return
+    
+    def export_cache_stats(self):
+        """Export hit/miss/eviction counters of the memoization caches to InfluxDB"""
+        timestamp = time.time_ns()
+        self.queue_export([
+            encode_point('calculator_cache', {'cache': name}, cache.stats(), timestamp)
+            for name, cache in (("functions", self.function_cache), ("operations", self.operation_cache))
+        ])
+    
+    def write_to_influxdb(self, lines):
+        """Write line protocol points to InfluxDB in a single request"""
         try:
+            import requests
+            from dotenv import load_dotenv
+            
             # Force reload environment variables
             load_dotenv(override=True)
             
@@ -309,37 +555,46 @@ class Calculator:
             if not all([url, token, org, bucket]):
                 return
             
-            # Format the operation for better readability
-            if operation is None:
-                operation = "none"
-            else:
-                # Escape special characters and spaces in the operation string
-                operation = operation.replace('×', 'mul').replace('÷', 'div').replace(' ', '\\ ')
-                operation = operation.replace(',', '\\,').replace('=', '\\=')
-            
-            # Format the result - ensure it's a valid float
-            try:
-                result_float = float(result)
-                result_str = f"{result_float}"
-            except (ValueError, TypeError):
-                result_str = "0"
-            
-            # Create line protocol with proper escaping
-            timestamp = int(time.time() * 1e9)  # Current time in nanoseconds
-            line = f"calculator_operation,operation={operation} result={result_str} {timestamp}"
-            
             # Prepare the request
             headers = {
                 'Authorization': f'Token {token}',
                 'Content-Type': 'text/plain; charset=utf-8'
             }
             
+            # While InfluxDB is down, buffer instead of waiting for another connect timeout
+            if not self.export_breaker.allow():
+                self.export_breaker.hold(lines)
+                return
+            
+            # Address the org and bucket by ID when another script has cached them
+            if self.influxdb_metadata is None:
+                from influx_metadata import MetadataCache
+                self.influxdb_metadata = MetadataCache.from_env()
+            params = self.influxdb_metadata.write_params(url, org, bucket)
+            
             # Send data to InfluxDB
-            response = requests.post(
-                f"{url}/api/v2/write?org={org}&bucket={bucket}",
-                headers=headers,
-                data=line.encode('utf-8')
-            )
+            data = '\n'.join(lines).encode('utf-8')
+            try:
+                response = requests.post(f"{url}/api/v2/write", params=params, headers=headers,
+                                         data=data, timeout=5)
+                if response.status_code == 404 and params != {'org': org, 'bucket': bucket}:
+                    # Stale cached IDs, retry by name
+                    self.influxdb_metadata.invalidate(url, 'org', org)
+                    self.influxdb_metadata.invalidate(url, 'bucket', bucket, org)
+                    response = requests.post(f"{url}/api/v2/write", params={'org': org, 'bucket': bucket},
+                                             headers=headers, data=data, timeout=5)
+            except requests.RequestException as e:
+                self.record_export_failure(url, lines, str(e))
+                return
+            
+            if response.status_code >= 500:
+                self.record_export_failure(url, lines, f"{response.status_code} - {response.text}")
+                return
+            
+            # Resend lines kept from earlier failed writes
+            retry = self.export_breaker.record_success()
+            if retry:
+                self.export_queue.put(retry)
             
             if response.status_code != 204:
                 error_msg = f"Data not exported: {response.status_code} - {response.text}"
@@ -351,6 +606,41 @@ class Calculator:
             # Don't raise the exception, just log it and continue
             pass
     
+    def record_export_failure(self, url, lines, error):
+        """Keep the lines of a failed write, and start probing InfluxDB if the circuit opens"""
+        logging.error(f"Data not exported: {error}")
+        if self.export_breaker.record_failure(lines):
+            logging.error("InfluxDB unavailable, buffering exports until /health responds")
+            threading.Thread(target=self.probe_influxdb_health, args=(url,), daemon=True).start()
+    
+    def probe_influxdb_health(self, url):
+        """Probe /health with backoff while the circuit is open, then resend buffered lines"""
+        import requests
+        while True:
+            time.sleep(self.export_breaker.probe_delay())
+            try:
+                healthy = requests.get(f"{url}/health", timeout=5).status_code == 200
+            except requests.RequestException:
+                healthy = False
+            if healthy:
+                dropped = self.export_breaker.dropped
+                lines = self.export_breaker.close()
+                lines.append(encode_point('calculator_export', None,
+                                          {'buffered': len(lines), 'dropped': dropped}))
+                self.export_queue.put(lines)
+                return
+    
+    @contextmanager
+    def batched_output(self):
+        """Export all InfluxDB points from the block as a single write"""
+        self.batch_lines = []
+        try:
+            yield
+        finally:
+            lines, self.batch_lines = self.batch_lines, None
+            if lines:
+                self.queue_export(lines)
+    
     def export_log(self):
         """Export the log in various formats for metrics and searching"""
         if not self.log:
@@ -400,10 +690,14 @@ class Calculator:
     def do_export(self, format_type, export_window):
         """Perform the actual export based on selected format"""
         if format_type == "influxdb":
-            self.export_to_influxdb(self.operation, self.current_number)
+            # An explicit export is written whatever the export policy
+            self.queue_export([self.format_influxdb_line(self.operation, self.current_number)])
+            self.export_cache_stats()
             export_window.destroy()
             return
             
+        from tkinter import filedialog
+        
         # Get save location from user
         file_types = {
             "json": [("JSON files", "*.json")],
@@ -433,20 +727,31 @@ class Calculator:
         except Exception as e:
             messagebox.showerror("Export Error", f"Error exporting log: {str(e)}")
     
+    def export_entries(self):
+        """Entries to export: the whole shared history, archived segments included"""
+        self.save_log()
+        if self.history is None:
+            return iter(self.log)
+        return self.history.iter_entries()
+    
     def export_json(self, file_path):
         """Export log as JSON"""
         with open(file_path, 'w') as f:
-            json.dump(self.log, f, indent=2)
+            json.dump(list(self.export_entries()), f, indent=2)
     
     def export_csv(self, file_path):
         """Export log as CSV"""
+        import csv
+        
         with open(file_path, 'w', newline='') as f:
             writer = csv.DictWriter(f, fieldnames=["timestamp", "operation", "result"])
             writer.writeheader()
-            writer.writerows(self.log)
+            writer.writerows(self.export_entries())
     
     def export_sqlite(self, file_path):
         """Export log as SQLite database"""
+        import sqlite3
+        
         conn = sqlite3.connect(file_path)
         cursor = conn.cursor()
         
@@ -461,230 +766,165 @@ class Calculator:
         ''')
         
         # Insert data
-        for entry in self.log:
-            cursor.execute('''
-            INSERT INTO calculator_log (timestamp, operation, result)
-            VALUES (?, ?, ?)
-            ''', (entry["timestamp"], entry["operation"], entry["result"]))
+        cursor.executemany('''
+        INSERT INTO calculator_log (timestamp, operation, result)
+        VALUES (?, ?, ?)
+        ''', ((entry["timestamp"], entry["operation"], entry["result"])
+              for entry in self.export_entries()))
         
         conn.commit()
         conn.close()
         
     def create_buttons(self):
-        # Clear existing buttons
-        for widget in self.buttons_frame.winfo_children():
-            widget.destroy()
-            
-        # Configure grid weights for buttons frame
-        for i in range(7 if self.scientific_mode else 5):
-            self.buttons_frame.grid_rowconfigure(i, weight=1)
+        """Build the standard and scientific keypads once and show the current one"""
+        self.buttons_frame.grid_rowconfigure(0, weight=1)
+        self.buttons_frame.grid_columnconfigure(0, weight=1)
+        
+        self.standard_keypad = self.create_keypad(self.standard_buttons, rows=5)
+        self.scientific_keypad = self.create_keypad(self.scientific_buttons, rows=7)
+        self.show_keypad()
+    
+    def create_keypad(self, buttons, rows):
+        """Create a frame holding one button layout, with its bindings"""
+        keypad = tk.Frame(self.buttons_frame, bg="#2b2b2b")
+        
+        # Configure grid weights for the keypad
+        for i in range(rows):
+            keypad.grid_rowconfigure(i, weight=1)
         for i in range(4):
-            self.buttons_frame.grid_columnconfigure(i, weight=1)
-            
-        # Select button layout based on mode
-        buttons = self.scientific_buttons if self.scientific_mode else self.standard_buttons
+            keypad.grid_columnconfigure(i, weight=1)
         
         # Create buttons
         row = 0
         col = 0
         for (text, color) in buttons:
+            btn = tk.Button(keypad, text=text, font=("Arial", 18),
+                          bg=color, fg="white" if color != "#a5a5a5" else "black",
+                          relief="flat", borderwidth=0)
             if text == '0':
                 # Make 0 button span 2 columns
-                btn = tk.Button(self.buttons_frame, text=text, font=("Arial", 18),
-                              bg=color, fg="white" if color != "#a5a5a5" else "black",
-                              relief="flat", borderwidth=0)
                 btn.grid(row=row, column=col, columnspan=2, padx=5, pady=5, sticky="nsew")
                 col += 2
             else:
-                btn = tk.Button(self.buttons_frame, text=text, font=("Arial", 18),
-                              bg=color, fg="white" if color != "#a5a5a5" else "black",
-                              relief="flat", borderwidth=0)
                 btn.grid(row=row, column=col, padx=5, pady=5, sticky="nsew")
                 col += 1
             
-            # Bind hover effects
-            btn.bind("<Enter>", lambda e, b=btn, c=color: self.on_hover(b, c))
+            # Bind hover effects, reusing the precomputed hover color
+            if color not in self.hover_colors:
+                self.hover_colors[color] = lighten_color(color)
+            btn.bind("<Enter>", lambda e, b=btn, c=self.hover_colors[color]: self.on_hover(b, c))
             btn.bind("<Leave>", lambda e, b=btn, c=color: self.on_leave(b, c))
             btn.bind("<Button-1>", lambda e, t=text: self.button_clicked(t))
             
             if col > 3:
                 col = 0
                 row += 1
+        
+        return keypad
+    
+    def show_keypad(self):
+        """Swap the visible keypad to match the current mode"""
+        if self.scientific_mode:
+            hidden, shown = self.standard_keypad, self.scientific_keypad
+        else:
+            hidden, shown = self.scientific_keypad, self.standard_keypad
+        hidden.grid_remove()
+        shown.grid(row=0, column=0, sticky="nsew")
     
     def toggle_mode(self):
-        self.scientific_mode = not self.scientific_mode
+        self.set_scientific_mode(not self.scientific_mode)
         self.toggle_btn.config(text="Standard" if self.scientific_mode else "Scientific")
-        self.create_buttons()
-        self.add_to_log(f"Mode changed to {'Scientific' if self.scientific_mode else 'Standard'}", "")
+        self.precision_btn.config(text=self.precision_label())
+        self.show_keypad()
+    
+    def button_clicked(self, text):
+        """Handle a key, first entering a typed number into statistics mode"""
+        if (self.stats_panel is not None and text in STATS_ENTRY_KEYS and self.current_number
+                and (not self.should_clear_display or self.stats_operand_changed)):
+            self.stats_panel.add_value(self.current_number)
+            self.stats_operand_changed = False
+        super().button_clicked(text)
+
+    def state_restored(self):
+        """Match the mode button and keypad to an undone or redone state"""
+        self.toggle_btn.config(text="Standard" if self.scientific_mode else "Scientific")
+        self.precision_btn.config(text=self.precision_label())
+        self.show_keypad()
+
+    def set_display(self, text):
+        """Show text on the display at the next idle point, coalescing rapid updates"""
+        self.display_text = text
+        self.pending_display = text
+        if not self.display_scheduled:
+            self.display_scheduled = True
+            self.root.after_idle(self.flush_display)
+
+    def flush_display(self):
+        self.display_scheduled = False
+        self.display_var.set(self.pending_display)
+
+    def on_close(self):
+        """Finish pending saves and exports before closing the window"""
+        self.flush_log()
+        self.flush_export_summary(force=True)
+        if self.export_thread is not None:
+            self.export_queue.put(None)
+            self.export_thread.join(timeout=5)
+        if self.history is not None:
+            self.history.close()
+        if self.journal is not None:
+            self.journal.close()
+        self.root.destroy()
 
-    def on_hover(self, button, original_color):
-        # Lighten the color on hover
-        rgb = tuple(int(original_color[1:][i:i+2], 16) for i in (0, 2, 4))
-        lighter_rgb = tuple(min(255, c + 20) for c in rgb)
-        lighter_color = f"#{lighter_rgb[0]:02x}{lighter_rgb[1]:02x}{lighter_rgb[2]:02x}"
-        button.configure(bg=lighter_color)
+    def precision_label(self):
+        if self.precision_mode == 'decimal':
+            return f"Precision: Decimal ({self.decimal_digits} digits)"
+        return f"Precision: {self.precision_mode.capitalize()}"
+
+    def cycle_precision(self):
+        """Switch to the next precision mode"""
+        index = PRECISION_MODES.index(self.precision_mode)
+        self.set_precision(PRECISION_MODES[(index + 1) % len(PRECISION_MODES)])
+        self.precision_btn.config(text=self.precision_label())
+
+    def on_hover(self, button, hover_color):
+        button.configure(bg=hover_color)
 
     def on_leave(self, button, original_color):
         button.configure(bg=original_color)
 
-    def button_clicked(self, text):
-        if text.isdigit() or text == '.':
-            if self.should_clear_display:
-                self.current_number = ""
-                self.should_clear_display = False
-            self.current_number += text
-            self.display_var.set(self.current_number)
-        
-        elif text in ['÷', '×', '-', '+']:
-            if self.first_number is None:
-                self.first_number = float(self.current_number or '0')
-            else:
-                self.calculate()
-            self.operation = text
-            self.should_clear_display = True
-        
-        elif text == '=':
-            if self.operation in ['sin', 'cos', 'tan']:
-                try:
-                    angle = float(self.current_number or '0')
-                    if self.operation == 'sin':
-                        result = math.sin(math.radians(angle))
-                    elif self.operation == 'cos':
-                        result = math.cos(math.radians(angle))
-                    else:  # tan
-                        result = math.tan(math.radians(angle))
-                    formatted_result = f"{result:.8f}".rstrip('0').rstrip('.')
-                    self.display_var.set(formatted_result)
-                    self.current_number = formatted_result
-                    self.add_to_log(f"{self.operation}({angle}°)", formatted_result)
-                    self.export_to_influxdb(f"{self.operation}({angle}°)", formatted_result)
-                except ValueError:
-                    self.display_var.set("Error: Invalid angle")
-                    self.current_number = ""
-                    self.add_to_log(f"{self.operation}", "Error")
-                    self.export_to_influxdb(f"{self.operation}", "Error")
-                self.should_clear_display = True
-                self.operation = None
-                self.first_number = None
-            else:
-                self.calculate()
-                self.should_clear_display = True
-                self.operation = None
-                self.first_number = None
-        
-        elif text == 'C':
-            self.display_var.set("")
-            self.current_number = ""
-            self.first_number = None
-            self.operation = None
-            self.should_clear_display = False
-            self.add_to_log("Clear", "")
-            self.export_to_influxdb("Clear", "")
-        
-        elif text == '±':
-            if self.current_number:
-                if self.current_number[0] == '-':
-                    self.current_number = self.current_number[1:]
-                else:
-                    self.current_number = '-' + self.current_number
-                self.display_var.set(self.current_number)
-                operation = f"{self.current_number} ±"
-                self.add_to_log(operation, self.current_number)
-                self.export_to_influxdb(operation, self.current_number)
-                self.should_clear_display = True
-        
-        elif text == '%':
-            if self.current_number:
-                result = str(float(self.current_number) / 100)
-                self.current_number = result
-                self.display_var.set(self.current_number)
-                operation = f"{self.current_number} %"
-                self.add_to_log(operation, result)
-                self.export_to_influxdb(operation, result)
-                self.should_clear_display = True
-                
-        # Scientific calculator functions
-        elif text in ['sin', 'cos', 'tan']:
-            if self.current_number:
-                try:
-                    self.first_number = float(self.current_number)
-                    self.operation = text
-                    self.should_clear_display = True
-                except ValueError:
-                    self.display_var.set("Error: Invalid input")
-                    self.current_number = ""
-                    self.first_number = None
-                    self.operation = None
-                    self.should_clear_display = True
-        
-        elif text == 'π':
-            self.current_number = str(math.pi)
-            self.display_var.set(self.current_number)
-            self.add_to_log("π", self.current_number)
-            self.export_to_influxdb("π", self.current_number)
-            self.should_clear_display = True
+    def on_key(self, event):
+        """Handle a key typed anywhere in the main window"""
+        label = KEY_BINDINGS.get(event.keysym)
+        if label is None and event.char.isdigit():
+            label = event.char
+        if label is not None:
+            self.button_clicked(label)
+            return "break"
 
-    def calculate(self):
-        if self.first_number is not None and self.operation and self.current_number:
-            try:
-                second_number = float(self.current_number)
-                if self.operation == '+':
-                    result = self.first_number + second_number
-                elif self.operation == '-':
-                    result = self.first_number - second_number
-                elif self.operation == '×':
-                    result = self.first_number * second_number
-                elif self.operation == '÷':
-                    if second_number != 0:
-                        result = self.first_number / second_number
-                    else:
-                        result = "Error: Division by zero"
-                        self.display_var.set(result)
-                        self.current_number = ""
-                        self.first_number = None
-                        self.operation = None
-                        self.should_clear_display = True
-                        return
-                
-                # Check for overflow
-                if isinstance(result, float) and (abs(result) > 1e308 or (abs(result) < 1e-308 and result != 0)):
-                    result = "Error: Number too large or small"
-                    self.display_var.set(result)
-                    self.current_number = ""
-                    self.first_number = None
-                    self.operation = None
-                    self.should_clear_display = True
-                    return
-                
-                # Format the result
-                if isinstance(result, float):
-                    if result.is_integer():
-                        result = int(result)
-                    else:
-                        result = f"{result:.8f}".rstrip('0').rstrip('.')
-                
-                # Format the operation string consistently
-                operation_str = f"{self.first_number} {self.operation} {second_number}"
-                self.add_to_log(operation_str, str(result))
-                self.export_to_influxdb(operation_str, str(result))
-                
-                self.display_var.set(str(result))
-                self.current_number = str(result)
-                self.first_number = float(result) if result != "Error" else None
-                
-            except ValueError:
-                self.display_var.set("Error: Invalid input")
-                self.current_number = ""
-                self.first_number = None
-                self.operation = None
-                self.should_clear_display = True
-            except Exception as e:
-                self.display_var.set("Error: Calculation failed")
-                self.current_number = ""
-                self.first_number = None
-                self.operation = None
-                self.should_clear_display = True
-                logging.error(f"Calculation error: {str(e)}")
+    def on_undo(self, event=None):
+        self.button_clicked('undo')
+        return "break"
+    
+    def on_redo(self, event=None):
+        self.button_clicked('redo')
+        return "break"
+    
+    def on_paste(self, event=None):
+        """Evaluate a pasted expression, or one expression per line"""
+        try:
+            text = self.root.clipboard_get()
+        except tk.TclError:
+            return "break"
+        self.evaluate_expressions(text.splitlines())
+        return "break"
+
+    def evaluate_expressions(self, expressions):
+        """Evaluate expressions in one batch, saving history and exporting once"""
+        with self.batched_output():
+            for expression in expressions:
+                if expression.strip():
+                    self.evaluate_expression(expression)
 
 if __name__ == '__main__':
     root = tk.Tk()
@@ -0,0 +1,532 @@
+import os
+import re
+import math
+import logging
+from collections import deque
+from datetime import datetime
+from precision import (PRECISION_MODES, DEFAULT_DECIMAL_DIGITS, parse_number,
+                       apply_operation, format_number)
+from scientific import trig_degrees
+from memo import LRUCache
+from line_protocol import encode_point
+from history_index import result_value
+
+EXPRESSION_TOKEN = re.compile(r"\s*(?:(?P<number>\d+\.?\d*|\.\d+|π|pi)|(?P<func>sin|cos|tan)|(?P<op>[-+*/×÷%=()]))")
+OPERATOR_ALIASES = {'*': '×', '/': '÷'}
+
+def expression_to_keys(expression):
+    """Translate an expression such as "12 × -3 + sin(30)" into calculator input.
+    
+    Returns a list of ('number', text), ('function', (name, text)) and
+    ('key', label) pairs. Evaluation follows the calculator's left-to-right
+    semantics, and a function applies to the number right after it.
+    """
+    expression = expression.strip()
+    tokens = []
+    pos = 0
+    while pos < len(expression):
+        match = EXPRESSION_TOKEN.match(expression, pos)
+        if not match:
+            raise ValueError(f"Invalid expression: {expression}")
+        pos = match.end()
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == 'number' and value in ('π', 'pi'):
+            value = str(math.pi)
+        tokens.append((kind, OPERATOR_ALIASES.get(value, value)))
+    
+    keys = []
+    i = 0
+    
+    def read_number():
+        """Read a number, with an optional unary minus, starting at token i"""
+        nonlocal i
+        sign = ''
+        while i < len(tokens) and tokens[i] == ('op', '-'):
+            sign = '' if sign else '-'
+            i += 1
+        if i >= len(tokens) or tokens[i][0] != 'number':
+            raise ValueError(f"Invalid expression: {expression}")
+        number = sign + tokens[i][1]
+        i += 1
+        return number
+    
+    expect_number = True
+    while i < len(tokens):
+        kind, value = tokens[i]
+        if kind == 'func':
+            i += 1
+            parenthesized = i < len(tokens) and tokens[i] == ('op', '(')
+            if parenthesized:
+                i += 1
+            argument = read_number()
+            if parenthesized:
+                if i >= len(tokens) or tokens[i] != ('op', ')'):
+                    raise ValueError(f"Invalid expression: {expression}")
+                i += 1
+            keys.append(('function', (value, argument)))
+            expect_number = False
+        elif kind == 'number' or (expect_number and value == '-'):
+            keys.append(('number', read_number()))
+            expect_number = False
+        elif value in ('+', '-', '×', '÷'):
+            keys.append(('key', value))
+            expect_number = True
+            i += 1
+        elif value in ('%', '='):
+            keys.append(('key', value))
+            i += 1
+        else:
+            raise ValueError(f"Invalid expression: {expression}")
+    
+    if expect_number and keys:
+        raise ValueError(f"Invalid expression: {expression}")
+    if keys and keys[-1] != ('key', '='):
+        keys.append(('key', '='))
+    return keys
+
+def operation_point(operation, result, timestamp=None):
+    """Encode a completed operation as a calculator_operation point.
+    
+    Numeric results, fractions such as "1/3" included, are written as the
+    float field `result`; anything else (errors, the empty result of Clear)
+    as the string field `text`.
+    """
+    # Keep tag values ASCII for the operators, as existing series expect
+    if operation is None:
+        operation = "none"
+    else:
+        operation = operation.replace('×', 'mul').replace('÷', 'div')
+    
+    try:
+        value = float(result)
+    except (ValueError, TypeError):
+        value = result_value(result) if isinstance(result, str) else None
+    if value is not None and math.isfinite(value):
+        fields = {'result': value}
+    else:
+        fields = {'text': str(result)}
+    return encode_point('calculator_operation', {'operation': operation}, fields, timestamp)
+
+# Labels handled outside the undo history
+UNDO_KEYS = ('undo', 'redo')
+
+class EngineState:
+    """Compact snapshot of the calculator state, for undo and redo"""
+    
+    __slots__ = ('current_number', 'first_number', 'operation', 'should_clear_display',
+                 'scientific_mode', 'precision_mode', 'display_text')
+    
+    def __init__(self, engine):
+        self.current_number = engine.current_number
+        self.first_number = engine.first_number
+        self.operation = engine.operation
+        self.should_clear_display = engine.should_clear_display
+        self.scientific_mode = engine.scientific_mode
+        self.precision_mode = engine.precision_mode
+        self.display_text = engine.display_text
+    
+    def matches(self, engine):
+        return (self.current_number == engine.current_number
+                and self.first_number == engine.first_number
+                and self.operation == engine.operation
+                and self.should_clear_display == engine.should_clear_display
+                and self.scientific_mode == engine.scientific_mode
+                and self.precision_mode == engine.precision_mode
+                and self.display_text == engine.display_text)
+    
+    def restore(self, engine):
+        engine.current_number = self.current_number
+        engine.first_number = self.first_number
+        engine.operation = self.operation
+        engine.should_clear_display = self.should_clear_display
+        engine.scientific_mode = self.scientific_mode
+        engine.precision_mode = self.precision_mode
+        engine.set_display(self.display_text)
+
+class CalculatorEngine:
+    """Calculator state machine driven by button labels, without any UI.
+    
+    The Tk window and the HTTP service both build on this class and override
+    set_display, add_to_log and export_to_influxdb to connect it to their own
+    display, history and InfluxDB export.
+    """
+    
+    def __init__(self, precision_mode=None, decimal_digits=None,
+                 function_cache=None, operation_cache=None, undo_depth=None):
+        # Calculator state
+        self.current_number = ""
+        self.first_number = None
+        self.operation = None
+        self.should_clear_display = False
+        self.scientific_mode = False
+        self.display_text = ""
+        
+        # Precision mode: float (default), decimal or fraction
+        self.precision_mode = precision_mode or os.environ.get("CALCULATOR_PRECISION", "float")
+        if self.precision_mode not in PRECISION_MODES:
+            self.precision_mode = "float"
+        self.decimal_digits = decimal_digits or int(os.environ.get("CALCULATOR_DECIMAL_DIGITS", DEFAULT_DECIMAL_DIGITS))
+        
+        # Memoized results of scientific functions and binary operations
+        if function_cache is None or operation_cache is None:
+            cache_size = int(os.environ.get("CALCULATOR_CACHE_SIZE", 1024))
+            cache_ttl = os.environ.get("CALCULATOR_CACHE_TTL")
+            cache_ttl = float(cache_ttl) if cache_ttl else None
+            function_cache = function_cache or LRUCache(cache_size, cache_ttl)
+            operation_cache = operation_cache or LRUCache(cache_size, cache_ttl)
+        self.function_cache = function_cache
+        self.operation_cache = operation_cache
+        
+        # Handlers per button label
+        self.key_handlers = self.create_key_handlers()
+        
+        # Optional SessionJournal recording input events for replay; keys an
+        # expression is split into are not recorded on their own
+        self.journal = None
+        self.in_expression = False
+        
+        # States before each change, newest last; redo holds undone states
+        if undo_depth is None:
+            undo_depth = int(os.environ.get("CALCULATOR_UNDO_DEPTH", 1000))
+        self.undo_stack = deque(maxlen=undo_depth)
+        self.redo_stack = []
+    
+    def set_display(self, text):
+        self.display_text = text
+    
+    def add_to_log(self, operation, result):
+        """Record a completed operation; the UI or service decides where it goes"""
+        pass
+    
+    def export_to_influxdb(self, operation, result):
+        """Export a completed operation; the UI or service decides how"""
+        pass
+    
+    def make_log_entry(self, operation, result):
+        """Format an operation and its result as a log entry"""
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        
+        # Format the operation string
+        operation = str(operation).strip()
+        operation = operation.replace('×', '*')
+        operation = operation.replace('÷', '/')
+        
+        # Format the result
+        if result:
+            result = str(result).strip()
+            try:
+                # Shorten float results; exact precision modes keep every digit
+                value = float(result)
+                if self.precision_mode == 'float' and math.isfinite(value):
+                    result = f"{value:g}"
+            except ValueError:
+                # If not a number, keep as is
+                pass
+        else:
+            result = "0"
+        
+        log_entry = {
+            "timestamp": timestamp,
+            "operation": operation,
+            "result": result
+        }
+        return log_entry
+    
+    def format_influxdb_line(self, operation, result):
+        """Format an operation as an InfluxDB line protocol point"""
+        return operation_point(operation, result)
+    
+    def create_key_handlers(self):
+        """Map every button label to the method that handles it"""
+        handlers = {digit: self.handle_digit for digit in '0123456789.'}
+        handlers.update({op: self.handle_operator for op in ('÷', '×', '-', '+')})
+        handlers.update({func: self.handle_function for func in ('sin', 'cos', 'tan')})
+        handlers.update({
+            '=': self.handle_equals,
+            'C': self.handle_clear,
+            '±': self.handle_negate,
+            '%': self.handle_percent,
+            'π': self.handle_pi,
+            '⌫': self.handle_backspace,
+            'undo': self.handle_undo,
+            'redo': self.handle_redo,
+        })
+        return handlers
+
+    def button_clicked(self, text):
+        if self.journal is not None and not self.in_expression:
+            self.journal.key(text)
+        handler = self.key_handlers.get(text)
+        if handler is None:
+            return
+        if self.in_expression or text in UNDO_KEYS:
+            handler(text)
+        else:
+            self.with_undo(handler, text)
+    
+    def with_undo(self, action, *args):
+        """Run an action, keeping the state before it for undo if it changed anything"""
+        snapshot = EngineState(self)
+        action(*args)
+        if not snapshot.matches(self):
+            self.push_undo(snapshot)
+    
+    def push_undo(self, snapshot):
+        self.undo_stack.append(snapshot)
+        self.redo_stack.clear()
+    
+    def handle_undo(self, text):
+        if self.undo_stack:
+            self.redo_stack.append(EngineState(self))
+            self.undo_stack.pop().restore(self)
+            self.state_restored()
+    
+    def handle_redo(self, text):
+        if self.redo_stack:
+            self.undo_stack.append(EngineState(self))
+            self.redo_stack.pop().restore(self)
+            self.state_restored()
+    
+    def state_restored(self):
+        """Called after undo or redo; the UI can resync widgets that show the state"""
+        pass
+
+    def handle_digit(self, text):
+        if self.should_clear_display:
+            self.current_number = ""
+            self.should_clear_display = False
+        self.current_number += text
+        self.set_display(self.current_number)
+
+    def handle_backspace(self, text):
+        if not self.should_clear_display and self.current_number:
+            self.current_number = self.current_number[:-1]
+            self.set_display(self.current_number)
+
+    def handle_operator(self, text):
+        if self.first_number is None:
+            self.first_number = self.parse_number(self.current_number or '0')
+        else:
+            self.calculate()
+        self.operation = text
+        self.should_clear_display = True
+
+    def handle_equals(self, text):
+        if self.operation in ['sin', 'cos', 'tan']:
+            try:
+                angle = float(self.parse_number(self.current_number or '0'))
+                key = (self.operation, angle)
+                formatted_result = self.function_cache.get(key)
+                if formatted_result is None:
+                    result = trig_degrees(self.operation, angle)
+                    if result is None:
+                        formatted_result = "Error: Undefined"
+                    else:
+                        formatted_result = f"{result:.8f}".rstrip('0').rstrip('.')
+                    self.function_cache.put(key, formatted_result)
+                self.set_display(formatted_result)
+                if formatted_result.startswith("Error"):
+                    self.current_number = ""
+                    self.add_to_log(f"{self.operation}({angle}°)", "Error")
+                    self.export_to_influxdb(f"{self.operation}({angle}°)", "Error")
+                else:
+                    self.current_number = formatted_result
+                    self.add_to_log(f"{self.operation}({angle}°)", formatted_result)
+                    self.export_to_influxdb(f"{self.operation}({angle}°)", formatted_result)
+            except ValueError:
+                self.set_display("Error: Invalid angle")
+                self.current_number = ""
+                self.add_to_log(f"{self.operation}", "Error")
+                self.export_to_influxdb(f"{self.operation}", "Error")
+            self.should_clear_display = True
+            self.operation = None
+            self.first_number = None
+        else:
+            self.calculate()
+            self.should_clear_display = True
+            self.operation = None
+            self.first_number = None
+
+    def handle_clear(self, text):
+        self.set_display("")
+        self.current_number = ""
+        self.first_number = None
+        self.operation = None
+        self.should_clear_display = False
+        self.add_to_log("Clear", "")
+        self.export_to_influxdb("Clear", "")
+
+    def handle_negate(self, text):
+        if self.current_number:
+            if self.current_number[0] == '-':
+                self.current_number = self.current_number[1:]
+            else:
+                self.current_number = '-' + self.current_number
+            self.set_display(self.current_number)
+            operation = f"{self.current_number} ±"
+            self.add_to_log(operation, self.current_number)
+            self.export_to_influxdb(operation, self.current_number)
+            self.should_clear_display = True
+
+    def handle_percent(self, text):
+        if self.current_number:
+            value = self.parse_number(self.current_number) / 100
+            result = str(value) if isinstance(value, float) else format_number(value, self.decimal_digits)
+            self.current_number = result
+            self.set_display(self.current_number)
+            operation = f"{self.current_number} %"
+            self.add_to_log(operation, result)
+            self.export_to_influxdb(operation, result)
+            self.should_clear_display = True
+
+    # Scientific calculator functions
+    def handle_function(self, text):
+        if self.current_number:
+            try:
+                self.first_number = float(self.parse_number(self.current_number))
+                self.operation = text
+                self.should_clear_display = True
+            except ValueError:
+                self.set_display("Error: Invalid input")
+                self.current_number = ""
+                self.first_number = None
+                self.operation = None
+                self.should_clear_display = True
+
+    def handle_pi(self, text):
+        self.current_number = str(math.pi)
+        self.set_display(self.current_number)
+        self.add_to_log("π", self.current_number)
+        self.export_to_influxdb("π", self.current_number)
+        self.should_clear_display = True
+
+    def evaluate_expression(self, expression):
+        """Evaluate a single expression from a clean calculator state"""
+        if self.journal is not None:
+            self.journal.expression(expression)
+        self.with_undo(self.run_expression, expression)
+    
+    def run_expression(self, expression):
+        self.current_number = ""
+        self.first_number = None
+        self.operation = None
+        self.should_clear_display = False
+        try:
+            keys = expression_to_keys(expression)
+        except ValueError:
+            self.set_display("Error: Invalid expression")
+            self.should_clear_display = True
+            self.add_to_log(expression, "Error")
+            self.export_to_influxdb(expression, "Error")
+            return
+        self.in_expression = True
+        try:
+            for kind, value in keys:
+                if kind == 'number':
+                    self.current_number = value
+                    self.should_clear_display = False
+                    self.set_display(value)
+                elif kind == 'function':
+                    # Apply the function on its own, then use the result as the operand
+                    name, argument = value
+                    pending = (self.first_number, self.operation)
+                    self.first_number, self.operation = None, None
+                    self.current_number = argument
+                    self.button_clicked(name)
+                    self.button_clicked('=')
+                    self.first_number, self.operation = pending
+                    self.should_clear_display = False
+                else:
+                    self.button_clicked(value)
+        finally:
+            self.in_expression = False
+
+    def set_precision(self, mode):
+        """Switch the precision mode, converting a pending first operand"""
+        if self.journal is not None:
+            self.journal.precision(mode)
+        self.push_undo(EngineState(self))
+        self.precision_mode = mode
+        if self.first_number is not None:
+            self.first_number = self.parse_number(str(self.first_number))
+        self.add_to_log(f"Precision changed to {mode.capitalize()}", "")
+    
+    def set_scientific_mode(self, enabled):
+        if self.journal is not None:
+            self.journal.scientific(enabled)
+        self.push_undo(EngineState(self))
+        self.scientific_mode = enabled
+        self.add_to_log(f"Mode changed to {'Scientific' if enabled else 'Standard'}", "")
+    
+    def recall_result(self, result):
+        """Put a result from the history into the display as the current number"""
+        if not result or result.startswith("Error"):
+            return
+        if self.journal is not None:
+            self.journal.recall(result)
+        self.push_undo(EngineState(self))
+        self.current_number = result
+        self.set_display(result)
+        self.should_clear_display = True
+    
+    def parse_number(self, text):
+        """Parse display text as a number in the current precision mode"""
+        return parse_number(text, self.precision_mode, self.decimal_digits)
+
+    def calculate(self):
+        if self.first_number is not None and self.operation and self.current_number:
+            try:
+                second_number = self.parse_number(self.current_number)
+                if self.operation == '÷' and second_number == 0:
+                    result = "Error: Division by zero"
+                    self.set_display(result)
+                    self.current_number = ""
+                    self.first_number = None
+                    self.operation = None
+                    self.should_clear_display = True
+                    return
+                
+                key = (self.operation, self.first_number, second_number,
+                       self.precision_mode, self.decimal_digits)
+                result = self.operation_cache.get(key)
+                if result is None:
+                    # Floats that overflow are promoted to Decimal instead of failing
+                    try:
+                        value = apply_operation(self.operation, self.first_number, second_number,
+                                                self.precision_mode, self.decimal_digits)
+                    except ArithmeticError:
+                        result = "Error: Number too large or small"
+                        self.set_display(result)
+                        self.current_number = ""
+                        self.first_number = None
+                        self.operation = None
+                        self.should_clear_display = True
+                        return
+                    
+                    # Format the result
+                    result = format_number(value, self.decimal_digits)
+                    self.operation_cache.put(key, result)
+                
+                # Format the operation string consistently
+                operation_str = f"{self.first_number} {self.operation} {second_number}"
+                self.add_to_log(operation_str, result)
+                self.export_to_influxdb(operation_str, result)
+                
+                self.set_display(result)
+                self.current_number = result
+                self.first_number = self.parse_number(result)
+                
+            except ValueError:
+                self.set_display("Error: Invalid input")
+                self.current_number = ""
+                self.first_number = None
+                self.operation = None
+                self.should_clear_display = True
+            except Exception as e:
+                self.set_display("Error: Calculation failed")
+                self.current_number = ""
+                self.first_number = None
+                self.operation = None
+                self.should_clear_display = True
+                logging.error(f"Calculation error: {str(e)}")
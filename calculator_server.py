@@ -0,0 +1,357 @@
+import os
+import json
+import asyncio
+import logging
+import argparse
+from aiohttp import web, ClientSession, ClientTimeout, ClientError
+from dotenv import load_dotenv
+from precision import PRECISION_MODES
+from calculator_engine import CalculatorEngine
+from memo import LRUCache
+from influx_metadata import MetadataCache
+from export_policy import ExportPolicy
+from circuit_breaker import CircuitBreaker
+from line_protocol import encode_point
+from history_store import HistoryStore
+from session_journal import SessionJournal
+from error_log import setup_error_logging
+
+# Set up logging - only log errors, written to a rotating file by a
+# background thread with repeated errors limited
+setup_error_logging('calculator_server_errors.log')
+
+# Longest request line /stream accepts, in bytes
+STREAM_LINE_LIMIT = 1024 * 1024
+
+async def iter_request_lines(content, limit=STREAM_LINE_LIMIT):
+    """Yield the lines of a request body as they arrive; one longer than `limit` is yielded as None
+
+    Unlike the body's readline(), an over-long line is skipped cleanly, and
+    never held in memory beyond `limit` bytes.
+    """
+    buffer = bytearray()
+    too_long = False
+    async for chunk in content.iter_any():
+        # Only the new data can hold the end of the pending line
+        search = len(buffer)
+        buffer += chunk
+        start = 0
+        end = buffer.find(b'\n', search)
+        while end >= 0:
+            too_long = too_long or end + 1 - start > limit
+            yield None if too_long else bytes(buffer[start:end + 1])
+            too_long = False
+            start = end + 1
+            end = buffer.find(b'\n', start)
+        del buffer[:start]
+        if len(buffer) > limit:
+            # Only the end of the line is still needed, to know where the next one starts
+            too_long = True
+            buffer.clear()
+    if buffer or too_long:
+        yield None if too_long else bytes(buffer)
+
+class ServiceEngine(CalculatorEngine):
+    """Calculator engine for one request, collecting its log entries for the response"""
+
+    def __init__(self, service, precision_mode=None, decimal_digits=None):
+        super().__init__(precision_mode, decimal_digits,
+                         service.function_cache, service.operation_cache)
+        self.service = service
+        self.entries = []
+
+    def add_to_log(self, operation, result):
+        entry = self.make_log_entry(operation, result)
+        self.entries.append(entry)
+        self.service.record(entry)
+        if self.journal is not None:
+            self.journal.log_entry(entry)
+
+    def export_to_influxdb(self, operation, result):
+        if self.service.export_policy.record(operation, result):
+            self.service.queue_export(self.format_influxdb_line(operation, result))
+
+class CalculatorService:
+    """Headless JSON HTTP API over the calculator engine.
+
+    Every request gets a fresh engine, so clients never share calculator
+    state, while the memoization caches are shared by all requests. Log
+    entries and InfluxDB points are collected in memory and flushed by a
+    background task, so request handlers never wait on disk or network I/O.
+    """
+
+    def __init__(self, history_file="calculator_history.db", log_file="calculator_log.json",
+                 flush_interval=1.0, journal_file=None):
+        load_dotenv()
+        self.influxdb_url = os.getenv('INFLUXDB_URL')
+        self.influxdb_token = os.getenv('INFLUXDB_TOKEN')
+        self.influxdb_org = os.getenv('INFLUXDB_ORG')
+        self.influxdb_bucket = os.getenv('INFLUXDB_BUCKET')
+        self.influxdb_metadata = MetadataCache.from_env()
+        self.export_policy = ExportPolicy.from_env()
+        self.export_breaker = CircuitBreaker.from_env()
+        self.probe_task = None
+
+        cache_size = int(os.getenv("CALCULATOR_CACHE_SIZE", 1024))
+        cache_ttl = os.getenv("CALCULATOR_CACHE_TTL")
+        cache_ttl = float(cache_ttl) if cache_ttl else None
+        self.function_cache = LRUCache(cache_size, cache_ttl)
+        self.operation_cache = LRUCache(cache_size, cache_ttl)
+        # Decimal precision a request may ask for; the cost of an operation grows with it
+        self.max_digits = int(os.getenv("CALCULATOR_MAX_DIGITS", 2000))
+
+        self.history_file = history_file
+        self.log_file = log_file
+        self.history = None
+        self.pending_history = []
+        # Written by the flush task rather than on every request
+        self.journal = SessionJournal(journal_file, line_buffering=False) if journal_file else None
+        self.export_lines = []
+        self.flush_interval = flush_interval
+        self.session = None
+        self.flush_task = None
+
+    def record(self, entry):
+        """Add a log entry; it is saved by the next flush"""
+        self.pending_history.append(entry)
+
+    def queue_export(self, line):
+        """Queue an InfluxDB line; it is written by the next flush"""
+        self.export_lines.append(line)
+
+    def open_history(self):
+        """Open the shared history, importing calculator_log.json the first time"""
+        self.history = HistoryStore(self.history_file,
+                                    int(os.getenv("CALCULATOR_HISTORY_LIMIT", 100000)))
+        self.history.import_json(self.log_file)
+
+    async def write_to_influxdb(self, lines):
+        """Write line protocol points to InfluxDB in a single request"""
+        if not all([self.influxdb_url, self.influxdb_token, self.influxdb_org, self.influxdb_bucket]):
+            return
+        # While InfluxDB is down, buffer instead of waiting for another connect timeout
+        if not self.export_breaker.allow():
+            self.export_breaker.hold(lines)
+            return
+        names = {'org': self.influxdb_org, 'bucket': self.influxdb_bucket}
+        params = self.influxdb_metadata.write_params(self.influxdb_url, self.influxdb_org, self.influxdb_bucket)
+        data = '\n'.join(lines).encode('utf-8')
+        try:
+            status, text = await self.post_write(params, data)
+            if status == 404 and params != names:
+                # Stale cached IDs, retry by name
+                self.influxdb_metadata.invalidate(self.influxdb_url, 'org', self.influxdb_org)
+                self.influxdb_metadata.invalidate(self.influxdb_url, 'bucket', self.influxdb_bucket,
+                                                  self.influxdb_org)
+                status, text = await self.post_write(names, data)
+        except (ClientError, asyncio.TimeoutError) as e:
+            self.record_export_failure(lines, str(e))
+            return
+        if status >= 500:
+            self.record_export_failure(lines, f"{status} - {text}")
+            return
+        # Resend lines kept from earlier failed writes with the next flush
+        self.export_lines[:0] = self.export_breaker.record_success()
+        if status != 204:
+            logging.error(f"Data not exported: {status} - {text}")
+
+    def record_export_failure(self, lines, error):
+        """Keep the lines of a failed write, and start probing InfluxDB if the circuit opens"""
+        logging.error(f"Data not exported: {error}")
+        if self.export_breaker.record_failure(lines):
+            logging.error("InfluxDB unavailable, buffering exports until /health responds")
+            self.probe_task = asyncio.create_task(self.probe_health())
+
+    async def probe_health(self):
+        """Probe /health with backoff while the circuit is open, then resend buffered lines"""
+        while True:
+            await asyncio.sleep(self.export_breaker.probe_delay())
+            try:
+                async with self.session.get(f"{self.influxdb_url}/health") as response:
+                    healthy = response.status == 200
+            except (ClientError, asyncio.TimeoutError):
+                healthy = False
+            if healthy:
+                dropped = self.export_breaker.dropped
+                lines = self.export_breaker.close()
+                lines.append(encode_point('calculator_export', None,
+                                          {'buffered': len(lines), 'dropped': dropped}))
+                self.export_lines[:0] = lines
+                return
+
+    async def post_write(self, params, data):
+        async with self.session.post(
+            f"{self.influxdb_url}/api/v2/write",
+            params=params,
+            headers={
+                'Authorization': f'Token {self.influxdb_token}',
+                'Content-Type': 'text/plain; charset=utf-8'
+            },
+            data=data
+        ) as response:
+            return response.status, await response.text()
+
+    async def flush(self, final=False):
+        """Save the log and export queued points if anything changed"""
+        summary = self.export_policy.summary_line(force=final)
+        if summary:
+            self.export_lines.append(summary)
+        if self.pending_history:
+            entries, self.pending_history = self.pending_history, []
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self.history.append, entries)
+            except Exception as e:
+                logging.error(f"Log not saved: {str(e)}")
+        if self.export_lines:
+            lines, self.export_lines = self.export_lines, []
+            await self.write_to_influxdb(lines)
+        if self.journal is not None:
+            self.journal.flush()
+
+    async def flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def evaluate(self, payload):
+        """Evaluate one request object: {"expression": ...} or {"keys": [...]}"""
+        if not isinstance(payload, dict):
+            raise ValueError("Request must be a JSON object")
+        precision = payload.get('precision')
+        if precision is not None and precision not in PRECISION_MODES:
+            raise ValueError(f"precision must be one of: {', '.join(PRECISION_MODES)}")
+        digits = payload.get('digits')
+        if digits is not None and (isinstance(digits, bool) or not isinstance(digits, int)
+                                   or not 1 <= digits <= self.max_digits):
+            raise ValueError(f"digits must be an integer from 1 to {self.max_digits}")
+
+        engine = ServiceEngine(self, precision, digits)
+        if self.journal is not None:
+            # Each request starts from a fresh engine
+            self.journal.reset(engine.precision_mode, engine.decimal_digits)
+            engine.journal = self.journal
+        if isinstance(payload.get('expression'), str):
+            engine.evaluate_expression(payload['expression'])
+            response = {'expression': payload['expression']}
+        elif isinstance(payload.get('keys'), list) and all(isinstance(k, str) for k in payload['keys']):
+            for key in payload['keys']:
+                engine.button_clicked(key)
+            response = {'keys': payload['keys']}
+        else:
+            raise ValueError("Request needs an 'expression' string or a 'keys' list")
+
+        response['result'] = engine.display_text
+        response['error'] = engine.display_text.startswith("Error")
+        response['entries'] = engine.entries
+        return response
+
+    async def handle_evaluate(self, request):
+        try:
+            return web.json_response(self.evaluate(await request.json()))
+        except ValueError as e:
+            return web.json_response({'error': str(e)}, status=400)
+
+    async def handle_batch(self, request):
+        """Evaluate {"expressions": [...]} or {"requests": [...]} in one call"""
+        try:
+            payload = await request.json()
+            if not isinstance(payload, dict):
+                raise ValueError("Request must be a JSON object")
+            if 'expressions' in payload:
+                if not isinstance(payload['expressions'], list):
+                    raise ValueError("'expressions' must be a list")
+                items = [{'expression': e, 'precision': payload.get('precision'),
+                          'digits': payload.get('digits')} for e in payload['expressions']]
+            else:
+                items = payload.get('requests', [])
+                if not isinstance(items, list):
+                    raise ValueError("'requests' must be a list")
+            results = []
+            for i, item in enumerate(items):
+                try:
+                    results.append(self.evaluate(item))
+                except ValueError as e:
+                    results.append({'error': str(e)})
+                # Let other clients in between large batches
+                if i % 100 == 99:
+                    await asyncio.sleep(0)
+            return web.json_response({'results': results})
+        except ValueError as e:
+            return web.json_response({'error': str(e)}, status=400)
+
+    async def handle_stream(self, request):
+        """Pipelined evaluation: one JSON request per line in, one JSON result per line out"""
+        response = web.StreamResponse(headers={'Content-Type': 'application/x-ndjson'})
+        await response.prepare(request)
+        async for line in iter_request_lines(request.content):
+            if line is None:
+                result = {'error': f"Request line is longer than {STREAM_LINE_LIMIT} bytes"}
+            elif not line.strip():
+                continue
+            else:
+                try:
+                    result = self.evaluate(json.loads(line))
+                except ValueError as e:
+                    result = {'error': str(e)}
+            await response.write(json.dumps(result).encode('utf-8') + b'\n')
+        await response.write_eof()
+        return response
+
+    async def handle_health(self, request):
+        return web.json_response({
+            'status': 'ok',
+            'caches': {
+                'functions': self.function_cache.stats(),
+                'operations': self.operation_cache.stats(),
+            },
+            'export': self.export_breaker.stats(),
+        })
+
+    async def on_startup(self, app):
+        self.open_history()
+        self.session = ClientSession(timeout=ClientTimeout(total=10))
+        self.flush_task = asyncio.create_task(self.flush_loop())
+
+    async def on_cleanup(self, app):
+        self.flush_task.cancel()
+        if self.probe_task:
+            self.probe_task.cancel()
+        try:
+            await self.flush_task
+        except asyncio.CancelledError:
+            pass
+        await self.flush(final=True)
+        await self.session.close()
+        self.history.close()
+        if self.journal is not None:
+            self.journal.close()
+
+    def create_app(self, client_max_size=16 * 1024 * 1024):
+        app = web.Application(client_max_size=client_max_size)
+        app.add_routes([
+            web.post('/evaluate', self.handle_evaluate),
+            web.post('/batch', self.handle_batch),
+            web.post('/stream', self.handle_stream),
+            web.get('/health', self.handle_health),
+        ])
+        app.on_startup.append(self.on_startup)
+        app.on_cleanup.append(self.on_cleanup)
+        return app
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless calculator HTTP service")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--history-db', default=os.getenv('CALCULATOR_HISTORY_DB', 'calculator_history.db'),
+                        help="Shared SQLite history, also used by calculator windows")
+    parser.add_argument('--log-file', default='calculator_log.json',
+                        help="Older JSON history, imported once into an empty history")
+    parser.add_argument('--flush-interval', type=float, default=1.0,
+                        help="Seconds between log saves and InfluxDB writes")
+    parser.add_argument('--journal', default=os.getenv('CALCULATOR_JOURNAL'),
+                        help="Record request input events to this file for replay.py")
+    args = parser.parse_args()
+
+    service = CalculatorService(args.history_db, args.log_file, flush_interval=args.flush_interval,
+                                journal_file=args.journal)
+    web.run_app(service.create_app(), host=args.host, port=args.port)
@@ -0,0 +1,92 @@
+import os
+import threading
+from collections import deque
+
+class CircuitBreaker:
+    """Circuit breaker for InfluxDB writes.
+
+    Lines of failed writes are kept in a bounded buffer (the oldest are
+    dropped and counted once it is full) and handed back by the next
+    successful write. After `failure_threshold` consecutive failures the
+    circuit opens: writes are short-circuited into the buffer, and the owner
+    probes /health in the background, waiting `probe_delay()` seconds
+    between attempts with exponential backoff. A successful probe closes the
+    circuit and hands back the buffered lines. Thread-safe, so the GUI export
+    worker and its probe thread can share one breaker.
+    """
+
+    def __init__(self, failure_threshold=3, buffer_size=10000, base_delay=1.0, max_delay=60.0):
+        self.failure_threshold = failure_threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.buffer = deque(maxlen=buffer_size)
+        self.failures = 0
+        self.dropped = 0
+        self.probes = 0
+        self.is_open = False
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """Create a breaker from INFLUXDB_BREAKER_THRESHOLD and INFLUXDB_BREAKER_BUFFER"""
+        return cls(int(os.environ.get("INFLUXDB_BREAKER_THRESHOLD", 3)),
+                   int(os.environ.get("INFLUXDB_BREAKER_BUFFER", 10000)))
+
+    def allow(self):
+        """Whether a write should be attempted"""
+        return not self.is_open
+
+    def record_success(self):
+        """Reset the failure count; return lines buffered by earlier failures for resending"""
+        with self.lock:
+            self.failures = 0
+            return self.drain_locked()
+
+    def record_failure(self, lines):
+        """Count a failed write and buffer its lines; return True if the circuit just opened"""
+        with self.lock:
+            self.failures += 1
+            self.hold_locked(lines)
+            if self.is_open or self.failures < self.failure_threshold:
+                return False
+            self.is_open = True
+            self.probes = 0
+            return True
+
+    def hold(self, lines):
+        """Buffer lines while the circuit is open"""
+        with self.lock:
+            self.hold_locked(lines)
+
+    def hold_locked(self, lines):
+        overflow = len(self.buffer) + len(lines) - self.buffer.maxlen
+        if overflow > 0:
+            self.dropped += overflow
+        self.buffer.extend(lines)
+
+    def probe_delay(self):
+        """Seconds to wait before the next health probe"""
+        with self.lock:
+            delay = min(self.base_delay * 2 ** self.probes, self.max_delay)
+            self.probes += 1
+            return delay
+
+    def close(self):
+        """Close the circuit after a healthy probe and return the buffered lines"""
+        with self.lock:
+            self.is_open = False
+            self.failures = 0
+            return self.drain_locked()
+
+    def drain_locked(self):
+        lines = list(self.buffer)
+        self.buffer.clear()
+        return lines
+
+    def stats(self):
+        return {
+            'state': 'open' if self.is_open else 'closed',
+            'failures': self.failures,
+            'buffered': len(self.buffer),
+            'dropped': self.dropped,
+        }
@@ -1,53 +1,202 @@
 import os
-import requests
-from dotenv import load_dotenv
-
-def cleanup_influxdb():
-    # Load environment variables
-    load_dotenv()
-    
-    # Get InfluxDB settings from environment variables
-    url = os.getenv('INFLUXDB_URL', 'http://localhost:8086')
-    token = os.getenv('INFLUXDB_TOKEN')
-    org = os.getenv('INFLUXDB_ORG', 'calculator')
-    bucket = os.getenv('INFLUXDB_BUCKET', 'calculator_logs')
-    
-    print(f"Preparing to clean up all calculator operations from InfluxDB...")
-    print(f"Organization: {org}")
-    print(f"Bucket: {bucket}")
-    
-    # Prepare the request
-    url = f"{url}/api/v2/delete"
-    headers = {
-        'Authorization': f"Token {token}",
-        'Content-Type': 'application/json'
-    }
-    params = {
-        'org': org,
-        'bucket': bucket
-    }
-    data = {
-        'start': '1970-01-01T00:00:00Z',
-        'stop': '2030-01-01T00:00:00Z',
-        'predicate': '_measurement="calculator_operation"'
-    }
-    
+import re
+import json
+import asyncio
+import argparse
+from datetime import datetime, timedelta, timezone
+from influxdb_async import AsyncInfluxDBClient, InfluxDBError
+from query_cache import QueryCache, rfc3339_to_ns
+
+DURATION_UNITS = {'s': 'seconds', 'm': 'minutes', 'h': 'hours', 'd': 'days', 'w': 'weeks'}
+
+def parse_duration(text):
+    """Parse a duration such as 30m, 12h, 7d or 2w"""
+    match = re.fullmatch(r'(\d+)([smhdw])', text)
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f"Invalid duration: {text}")
+    return timedelta(**{DURATION_UNITS[match.group(2)]: int(match.group(1))})
+
+def parse_time(text):
+    """Parse an RFC3339 time; one without an offset is taken as UTC"""
+    dt = datetime.fromisoformat(text.replace('Z', '+00:00'))
+    return dt if dt.tzinfo is not None else dt.replace(tzinfo=timezone.utc)
+
+def format_time(dt):
+    return dt.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+def parse_concurrency(text):
+    """Parse a number of concurrent requests, at least 1"""
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError("concurrency must be at least 1")
+    return value
+
+def split_range(start, stop, chunk=None):
+    """Split [start, stop) into (start, stop) RFC3339 pairs of at most `chunk` each"""
+    start, stop = parse_time(start), parse_time(stop)
+    if chunk is None:
+        return [(format_time(start), format_time(stop))]
+    chunks = []
+    while start < stop:
+        end = min(start + chunk, stop)
+        chunks.append((format_time(start), format_time(end)))
+        start = end
+    return chunks
+
+def load_checkpoint(path, settings):
+    """Return the chunks already deleted by an earlier run with the same settings
+
+    The checkpoint is a JSON line with the settings followed by one JSON line
+    per completed chunk; a line cut short by a crash is ignored.
+    """
+    done = set()
+    try:
+        with open(path, 'r') as f:
+            header = json.loads(f.readline())
+            if header.get('settings') != settings:
+                return set()
+            done.update(tuple(chunk) for chunk in header.get('done', []))
+            for line in f:
+                try:
+                    done.add(tuple(json.loads(line)))
+                except ValueError:
+                    continue
+    except (OSError, ValueError, AttributeError):
+        return set()
+    return done
+
+def start_checkpoint(path, settings, done):
+    """Rewrite the checkpoint once, then return it open for appending completed chunks"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(json.dumps({'settings': settings}) + '\n')
+        for chunk in sorted(done):
+            f.write(json.dumps(chunk) + '\n')
+    os.replace(tmp_path, path)
+    return open(path, 'a')
+
+def record_checkpoint(f, chunk):
+    f.write(json.dumps(chunk) + '\n')
+    f.flush()
+
+def invalidate_query_cache(path, bucket, start, stop):
+    """Drop the query cache's windows for the deleted range, so queries fetch them again"""
+    if not path or not os.path.exists(path):
+        return
+    cache = QueryCache(path)
     try:
-        # Ask for confirmation
-        confirm = input("Are you sure you want to delete all calculator operations? (yes/no): ")
-        if confirm.lower() != 'yes':
+        count = cache.invalidate(bucket, rfc3339_to_ns(format_time(parse_time(start))),
+                                 rfc3339_to_ns(format_time(parse_time(stop))))
+    finally:
+        cache.close()
+    if count:
+        print(f"Dropped {count} cached query windows.")
+
+async def cleanup_influxdb_async(start='1970-01-01T00:00:00Z', stop='2030-01-01T00:00:00Z',
+                                 predicate='_measurement="calculator_operation"', chunk=None,
+                                 concurrency=4, checkpoint='.cleanup_checkpoint.json', confirm=True,
+                                 cache_file='.query_cache.db'):
+    """Delete points matching `predicate` in [start, stop), optionally in parallel chunks.
+
+    Each chunk is a separate delete request, sent by `concurrency` workers.
+    Completed chunks are appended to the checkpoint file, so running the same
+    cleanup again after a failure only deletes the remaining chunks. Cached
+    query windows overlapping the range are dropped, even after a partial
+    failure, since some of their points may already be gone.
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+    client = AsyncInfluxDBClient.from_env(concurrency=concurrency)
+    chunks = split_range(start, stop, chunk)
+    settings = {'org': client.org, 'bucket': client.bucket, 'start': start, 'stop': stop,
+                'predicate': predicate, 'chunks': len(chunks)}
+    done = load_checkpoint(checkpoint, settings)
+    remaining = [c for c in chunks if c not in done]
+
+    print(f"Preparing to clean up all calculator operations from InfluxDB...")
+    print(f"Organization: {client.org}")
+    print(f"Bucket: {client.bucket}")
+    print(f"Range: {start} to {stop}")
+    print(f"Predicate: {predicate}")
+    if len(chunks) > 1:
+        print(f"Chunks: {len(chunks)} ({len(done)} already deleted, {len(remaining)} remaining)")
+
+    if not remaining:
+        print("Nothing left to delete.")
+        return
+
+    # Ask for confirmation
+    if confirm:
+        answer = input("Are you sure you want to delete all calculator operations? (yes/no): ")
+        if answer.lower() != 'yes':
             print("Operation cancelled.")
             return
-        
-        response = requests.post(url, json=data, headers=headers, params=params)
-        if response.status_code == 204:
-            print("Successfully cleaned up InfluxDB data!")
-        else:
-            print(f"Error cleaning up InfluxDB: {response.status_code}")
-            print(response.text)
-    
+
+    failed = []
+    checkpoint_file = start_checkpoint(checkpoint, settings, done) if len(chunks) > 1 else None
+
+    async def delete_chunk(chunk_start, chunk_stop):
+        try:
+            await client.delete(chunk_start, chunk_stop, predicate)
+        except InfluxDBError as e:
+            failed.append((chunk_start, chunk_stop))
+            print(f"Error cleaning up {chunk_start} to {chunk_stop}: {e.status}")
+            print(e.text)
+            return
+        except Exception as e:
+            failed.append((chunk_start, chunk_stop))
+            print(f"Error cleaning up {chunk_start} to {chunk_stop}: {str(e)}")
+            return
+        done.add((chunk_start, chunk_stop))
+        if checkpoint_file is not None:
+            record_checkpoint(checkpoint_file, (chunk_start, chunk_stop))
+            print(f"[{len(done)}/{len(chunks)}] Deleted {chunk_start} to {chunk_stop}")
+
+    # A fixed pool of workers takes chunks in turn, so a long range does not
+    # create a coroutine per chunk up front
+    pending = iter(remaining)
+
+    async def worker():
+        for chunk_range in pending:
+            await delete_chunk(*chunk_range)
+
+    try:
+        async with client:
+            await asyncio.gather(*(worker() for _ in range(min(concurrency, len(remaining)))))
+    finally:
+        if checkpoint_file is not None:
+            checkpoint_file.close()
+        invalidate_query_cache(cache_file, client.bucket, start, stop)
+
+    if failed:
+        print(f"{len(failed)} of {len(chunks)} chunks failed; run the same command again to resume.")
+    else:
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        print("Successfully cleaned up InfluxDB data!")
+
+def cleanup_influxdb(*args, **kwargs):
+    try:
+        asyncio.run(cleanup_influxdb_async(*args, **kwargs))
     except Exception as e:
         print(f"Error: {str(e)}")
 
 if __name__ == "__main__":
-    cleanup_influxdb() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Delete calculator operations from InfluxDB")
+    parser.add_argument('--start', default='1970-01-01T00:00:00Z', help="Start of the range (RFC3339)")
+    parser.add_argument('--stop', default='2030-01-01T00:00:00Z', help="End of the range (RFC3339)")
+    parser.add_argument('--predicate', default='_measurement="calculator_operation"',
+                        help='Delete predicate, e.g. \'_measurement="calculator_operation" AND operation="none"\'')
+    parser.add_argument('--chunk', type=parse_duration,
+                        help="Split the range into chunks of this size, e.g. 1d or 12h (default: one request)")
+    parser.add_argument('--concurrency', type=parse_concurrency, default=4,
+                        help="Maximum number of delete requests in flight at once")
+    parser.add_argument('--checkpoint', default='.cleanup_checkpoint.json',
+                        help="File recording completed chunks, used to resume")
+    parser.add_argument('--cache-file', default='.query_cache.db',
+                        help="Query cache whose windows in the range are dropped")
+    parser.add_argument('--yes', action='store_true', help="Do not ask for confirmation")
+    args = parser.parse_args()
+
+    cleanup_influxdb(args.start, args.stop, args.predicate, args.chunk,
+                     args.concurrency, args.checkpoint, not args.yes, args.cache_file)
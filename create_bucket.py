@@ -1,77 +1,133 @@
-import requests
-import os
-from dotenv import load_dotenv
+import asyncio
+import argparse
+from influxdb_async import AsyncInfluxDBClient, InfluxDBError
 
-def create_bucket():
+RETENTION_SECONDS = 30 * 24 * 60 * 60  # 30 days retention
+
+# Tiered layout: raw points are kept briefly, per-minute and per-hour rollups for long
+RAW_RETENTION_SECONDS = 7 * 24 * 60 * 60  # 7 days retention
+ROLLUP_RETENTION_SECONDS = 2 * 365 * 24 * 60 * 60  # 2 years retention
+ROLLUP_INTERVALS = ('1m', '1h')
+
+def rollup_bucket_name(bucket):
+    return f"{bucket}_rollup"
+
+def rollup_measurement(interval):
+    return f"calculator_operation_{interval}"
+
+def rollup_task_flux(task_name, interval, bucket, rollup_bucket, org):
+    """Flux task downsampling calculator_operation results into count/sum/mean/min/max per interval"""
+    measurement = rollup_measurement(interval)
+    return f'''option task = {{name: "{task_name}", every: {interval}, offset: 10s}}
+
+data = from(bucket: "{bucket}")
+    |> range(start: -task.every)
+    |> filter(fn: (r) => r["_measurement"] == "calculator_operation" and r["_field"] == "result")
+    |> group()
+
+union(tables: [
+    data |> aggregateWindow(every: {interval}, fn: count, createEmpty: false) |> toFloat() |> set(key: "_field", value: "count"),
+    data |> aggregateWindow(every: {interval}, fn: sum, createEmpty: false) |> set(key: "_field", value: "sum"),
+    data |> aggregateWindow(every: {interval}, fn: mean, createEmpty: false) |> set(key: "_field", value: "mean"),
+    data |> aggregateWindow(every: {interval}, fn: min, createEmpty: false) |> set(key: "_field", value: "min"),
+    data |> aggregateWindow(every: {interval}, fn: max, createEmpty: false) |> set(key: "_field", value: "max"),
+])
+    |> set(key: "_measurement", value: "{measurement}")
+    |> to(bucket: "{rollup_bucket}", org: "{org}")
+'''
+
+async def ensure_bucket(client, name, org_id, retention_seconds):
+    """Create a bucket unless it already exists; return True if it was created"""
+    if await client.find_bucket(name):
+        return False
+    await client.create_bucket(name, org_id, retention_seconds)
+    return True
+
+async def ensure_task(client, name, flux, org_id):
+    """Create a task unless one with the same name exists; return True if it was created"""
+    if await client.find_task(name):
+        return False
+    await client.create_task(flux, org_id)
+    return True
+
+async def create_tiered_layout(client, org_id):
+    """Provision the raw bucket, the rollup bucket and the downsampling tasks"""
+    org, bucket = client.org, client.bucket
+    rollup_bucket = rollup_bucket_name(bucket)
+
+    # Both buckets are independent, so they are checked and created concurrently
+    created = await asyncio.gather(
+        ensure_bucket(client, bucket, org_id, RAW_RETENTION_SECONDS),
+        ensure_bucket(client, rollup_bucket, org_id, ROLLUP_RETENTION_SECONDS)
+    )
+    for name, was_created, retention in zip((bucket, rollup_bucket), created,
+                                            (RAW_RETENTION_SECONDS, ROLLUP_RETENTION_SECONDS)):
+        if was_created:
+            print(f"- Bucket {name}: Created (retention: {retention // (24 * 60 * 60)} days)")
+        else:
+            print(f"- Bucket {name}: Already exists")
+
+    task_names = [f"{bucket}_rollup_{interval}" for interval in ROLLUP_INTERVALS]
+    created = await asyncio.gather(*(
+        ensure_task(client, name, rollup_task_flux(name, interval, bucket, rollup_bucket, org), org_id)
+        for name, interval in zip(task_names, ROLLUP_INTERVALS)
+    ))
+    for name, was_created in zip(task_names, created):
+        print(f"- Task {name}: {'Created' if was_created else 'Already exists'}")
+
+async def create_bucket_async(tiered=False):
     """Create a new calculator_logs bucket in InfluxDB"""
-    try:
-        # Load settings from .env file
-        load_dotenv()
-        
-        # Get settings from environment variables
-        url = os.getenv('INFLUXDB_URL')
-        token = os.getenv('INFLUXDB_TOKEN')
-        org = os.getenv('INFLUXDB_ORG')
-        bucket = os.getenv('INFLUXDB_BUCKET')
-        
-        if not all([url, token, org, bucket]):
-            print("InfluxDB settings not found in .env file")
+    client = AsyncInfluxDBClient.from_env()
+    url, org, bucket = client.url, client.org, client.bucket
+    
+    if not all([url, client.token, org, bucket]):
+        print("InfluxDB settings not found in .env file")
+        return
+    
+    async with client:
+        # First, get the organization ID (cached after the first run)
+        try:
+            org_id = await client.org_id(org)
+        except InfluxDBError as e:
+            print(f"Error getting organization info: {e}")
             return
-        
-        # Prepare the request
-        headers = {
-            'Authorization': f'Token {token}',
-            'Content-Type': 'application/json'
-        }
-        
-        # First, get the organization ID
-        response = requests.get(
-            f"{url}/api/v2/orgs",
-            headers=headers,
-            params={'org': org}
-        )
-        
-        if response.status_code != 200:
-            print(f"Error getting organization info: {response.status_code} - {response.text}")
-            return
-            
-        orgs = response.json().get('orgs', [])
-        if not orgs:
+    
+        if not org_id:
             print(f"Organization {org} not found")
             return
-            
-        org_id = orgs[0]['id']
-        
-        # Bucket configuration
-        data = {
-            'orgID': org_id,
-            'name': bucket,
-            'retentionRules': [
-                {
-                    'type': 'expire',
-                    'everySeconds': 30 * 24 * 60 * 60  # 30 days retention
-                }
-            ]
-        }
-        
+    
+        if tiered:
+            print(f"Provisioning tiered layout in organization {org}:")
+            try:
+                await create_tiered_layout(client, org_id)
+            except InfluxDBError as e:
+                print(f"Error provisioning tiered layout: {e}")
+            return
+    
         # Create the bucket
-        response = requests.post(
-            f"{url}/api/v2/buckets",
-            headers=headers,
-            json=data
-        )
-        
-        if response.status_code == 201:
-            print(f"Successfully created bucket: {bucket}")
-            print("Bucket settings:")
-            print(f"- Name: {bucket}")
-            print(f"- Organization: {org}")
-            print("- Retention: 30 days")
-        else:
-            print(f"Error creating bucket: {response.status_code} - {response.text}")
-            
+        try:
+            await client.create_bucket(bucket, org_id, RETENTION_SECONDS)
+        except InfluxDBError as e:
+            print(f"Error creating bucket: {e}")
+            return
+    
+        print(f"Successfully created bucket: {bucket}")
+        print("Bucket settings:")
+        print(f"- Name: {bucket}")
+        print(f"- Organization: {org}")
+        print("- Retention: 30 days")
+
+def create_bucket(tiered=False):
+    """Create a new calculator_logs bucket in InfluxDB"""
+    try:
+        asyncio.run(create_bucket_async(tiered))
     except Exception as e:
         print(f"Error: {str(e)}")
 
 if __name__ == "__main__":
-    create_bucket() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Create the calculator bucket in InfluxDB")
+    parser.add_argument('--tiered', action='store_true',
+                        help="Also create a rollup bucket and per-minute/per-hour downsampling tasks")
+    args = parser.parse_args()
+
+    create_bucket(args.tiered)
@@ -1,60 +1,53 @@
-import requests
-import os
-from dotenv import load_dotenv
+import asyncio
+from influxdb_async import AsyncInfluxDBClient, InfluxDBError
 
-def delete_bucket():
+async def delete_bucket_async():
     """Delete the calculator_logs bucket from InfluxDB"""
-    try:
-        # Load settings from .env file
-        load_dotenv()
-        
-        # Get settings from environment variables
-        url = os.getenv('INFLUXDB_URL')
-        token = os.getenv('INFLUXDB_TOKEN')
-        org = os.getenv('INFLUXDB_ORG')
-        bucket = os.getenv('INFLUXDB_BUCKET')
-        
-        if not all([url, token, org, bucket]):
-            print("InfluxDB settings not found in .env file")
+    client = AsyncInfluxDBClient.from_env()
+    url, org, bucket = client.url, client.org, client.bucket
+    
+    if not all([url, client.token, org, bucket]):
+        print("InfluxDB settings not found in .env file")
+        return
+    
+    async with client:
+        # First, get the bucket ID (cached after the first lookup)
+        try:
+            bucket_id = await client.bucket_id(bucket, org)
+        except InfluxDBError as e:
+            print(f"Error getting bucket info: {e}")
             return
         
-        # Prepare the request
-        headers = {
-            'Authorization': f'Token {token}',
-            'Content-Type': 'application/json'
-        }
-        
-        # First, get the bucket ID
-        response = requests.get(
-            f"{url}/api/v2/buckets",
-            headers=headers,
-            params={'org': org, 'name': bucket}
-        )
-        
-        if response.status_code != 200:
-            print(f"Error getting bucket info: {response.status_code} - {response.text}")
-            return
-            
-        buckets = response.json().get('buckets', [])
-        if not buckets:
+        if not bucket_id:
             print(f"Bucket {bucket} not found")
             return
-            
-        bucket_id = buckets[0]['id']
         
         # Now delete the bucket using its ID
-        response = requests.delete(
-            f"{url}/api/v2/buckets/{bucket_id}",
-            headers=headers
-        )
+        try:
+            try:
+                await client.delete_bucket(bucket_id, bucket, org)
+            except InfluxDBError as e:
+                if e.status != 404:
+                    raise
+                # The cached ID is stale, so look the bucket up again
+                client.forget('bucket', bucket, org)
+                bucket_id = await client.bucket_id(bucket, org)
+                if not bucket_id:
+                    print(f"Bucket {bucket} not found")
+                    return
+                await client.delete_bucket(bucket_id, bucket, org)
+        except InfluxDBError as e:
+            print(f"Error deleting bucket: {e}")
+            return
         
-        if response.status_code == 204:
-            print(f"Successfully deleted bucket: {bucket}")
-        else:
-            print(f"Error deleting bucket: {response.status_code} - {response.text}")
-            
+        print(f"Successfully deleted bucket: {bucket}")
+
+def delete_bucket():
+    """Delete the calculator_logs bucket from InfluxDB"""
+    try:
+        asyncio.run(delete_bucket_async())
     except Exception as e:
         print(f"Error: {str(e)}")
 
 if __name__ == "__main__":
-    delete_bucket() 
\ No newline at end of file
+    delete_bucket() 
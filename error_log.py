@@ -0,0 +1,113 @@
+import os
+import re
+import queue
+import atexit
+import logging
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from log_segments import SegmentedLog, SegmentHandler
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+LOG_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Numbers and addresses vary between otherwise identical errors
+VARIABLE_PARTS = re.compile(r'0x[0-9a-fA-F]+|\d+')
+
+class ErrorLogLimiter(logging.Filter):
+    """Drop repeated errors and cap the overall rate during error storms.
+
+    Records whose messages only differ in numbers are treated as the same
+    error: after one is logged, the others are counted instead of logged
+    for `window` seconds. The next one after that carries the suppressed
+    count. Independently, at most `rate` records per second are logged.
+    Runs on the thread that logs, so it has to stay cheap. `clock` returns
+    the current time in seconds.
+    """
+
+    def __init__(self, window=60.0, rate=20.0, clock=time.monotonic):
+        super().__init__()
+        self.window = window
+        self.rate = rate
+        self.clock = clock
+        self.tokens = rate
+        self.last_refill = clock()
+        self.seen = {}
+        self.dropped = 0
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        now = self.clock()
+        key = (record.levelno, VARIABLE_PARTS.sub('#', record.getMessage()))
+        with self.lock:
+            last, suppressed = self.seen.get(key, (None, 0))
+            if last is not None and now - last < self.window:
+                self.seen[key] = (last, suppressed + 1)
+                return False
+            self.tokens = min(self.rate, self.tokens + (now - self.last_refill) * self.rate)
+            self.last_refill = now
+            if self.tokens < 1:
+                self.dropped += 1
+                return False
+            self.tokens -= 1
+            if len(self.seen) > 1000:
+                self.seen = {k: v for k, v in self.seen.items() if now - v[0] < self.window}
+            self.seen[key] = (now, 0)
+            dropped, self.dropped = self.dropped, 0
+        notes = []
+        if suppressed:
+            notes.append(f"{suppressed} similar messages suppressed")
+        if dropped:
+            notes.append(f"{dropped} messages dropped by rate limit")
+        if notes:
+            record.msg = f"{record.getMessage()} ({', '.join(notes)})"
+            record.args = None
+        return True
+
+    def pending_summary(self):
+        """Messages for suppressed errors not reported yet"""
+        with self.lock:
+            lines = [f"{count} similar messages suppressed: {key[1]}"
+                     for key, (_, count) in self.seen.items() if count]
+            if self.dropped:
+                lines.append(f"{self.dropped} messages dropped by rate limit")
+            self.seen.clear()
+            self.dropped = 0
+        return lines
+
+def setup_error_logging(filename, level=logging.ERROR):
+    """Log to compressed, rotating segments from a background thread.
+
+    The calling thread only filters the record and puts it on a queue; a
+    QueueListener formats and writes it. Segments rotate and are retained per
+    the CALCULATOR_LOG_* variables of SegmentedLog.from_env; every calculator
+    process may share the file. Repeats are limited by
+    CALCULATOR_LOG_DEDUP_SECONDS (default 60) and CALCULATOR_LOG_RATE records
+    per second (default 20). Returns the listener, which is also stopped at
+    exit.
+    """
+    file_handler = SegmentHandler(SegmentedLog.from_env(filename, shared=True))
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT, LOG_DATE_FORMAT))
+
+    limiter = ErrorLogLimiter(float(os.environ.get("CALCULATOR_LOG_DEDUP_SECONDS", 60)),
+                              float(os.environ.get("CALCULATOR_LOG_RATE", 20)))
+    log_queue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.addFilter(limiter)
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(queue_handler)
+    listener = QueueListener(log_queue, file_handler)
+    listener.start()
+
+    def stop():
+        listener.stop()
+        root.removeHandler(queue_handler)
+        # Written directly, so the summary is not limited itself
+        for line in limiter.pending_summary():
+            file_handler.handle(root.makeRecord(root.name, level, __file__, 0, line, None, None))
+        file_handler.close()
+
+    atexit.register(stop)
+    return listener
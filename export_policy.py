@@ -0,0 +1,150 @@
+import os
+import math
+import time
+import random
+from fractions import Fraction
+from line_protocol import encode_point
+
+EXPORT_MODES = ('raw', 'aggregate')
+
+# Operator names used in settings and summary fields
+OPERATOR_NAMES = {
+    '+': 'add', '-': 'subtract', '×': 'multiply', '÷': 'divide',
+    '±': 'negate', '%': 'percent', 'π': 'pi', 'Clear': 'clear',
+    'sin': 'sin', 'cos': 'cos', 'tan': 'tan',
+}
+
+# Operator codes, as stored in binary history records
+OPERATOR_CODES = ('none', 'add', 'subtract', 'multiply', 'divide', 'negate', 'percent',
+                  'pi', 'clear', 'sin', 'cos', 'tan', 'expression')
+
+# Log entries write × and ÷ as * and /
+LOG_OPERATORS = {'*': '×', '/': '÷'}
+
+def operator_name(operation):
+    """Name of the operator that produced a log operation string"""
+    if operation is None:
+        return 'none'
+    if operation in OPERATOR_NAMES:
+        return OPERATOR_NAMES[operation]
+    parts = operation.split(' ')
+    if len(parts) == 2 and parts[1] in ('±', '%'):
+        return OPERATOR_NAMES[parts[1]]
+    if len(parts) == 3 and parts[1] in OPERATOR_NAMES:
+        return OPERATOR_NAMES[parts[1]]
+    function = operation.split('(', 1)[0]
+    if function in ('sin', 'cos', 'tan'):
+        return function
+    return 'expression'
+
+def log_operator_name(operation):
+    """Name of the operator of a history log operation string"""
+    parts = operation.split(' ')
+    if len(parts) == 3 and parts[1] in LOG_OPERATORS:
+        parts[1] = LOG_OPERATORS[parts[1]]
+        operation = ' '.join(parts)
+    return operator_name(operation)
+
+def parse_names(text):
+    return {name.strip() for name in text.split(',') if name.strip()} if text else set()
+
+def parse_sample_rates(text):
+    """Parse per-operator sampling rates such as "clear=0,negate=0.1,*=1" """
+    rates = {}
+    for item in parse_names(text):
+        name, _, rate = item.partition('=')
+        rate = float(rate)
+        if not 0 <= rate <= 1:
+            raise ValueError(f"Sample rate for {name} must be between 0 and 1")
+        rates[name.strip()] = rate
+    return rates
+
+class ExportPolicy:
+    """Decides which operations are exported to InfluxDB and in what form.
+
+    In raw mode every accepted operation is written as its own point. In
+    aggregate mode operations are counted in-process and one
+    calculator_summary point per interval carries the counts per operator,
+    the error count and the sum, min and max of numeric results. Operators
+    can be left out entirely with `include`/`exclude`, and `sample_rates`
+    sets the fraction of raw points still written per operator ('*' for
+    all others; the default is every point in raw mode and none in
+    aggregate mode).
+    """
+
+    def __init__(self, mode='raw', interval=60.0, include=None, exclude=None, sample_rates=None):
+        if mode not in EXPORT_MODES:
+            raise ValueError(f"Export mode must be one of: {', '.join(EXPORT_MODES)}")
+        self.mode = mode
+        self.interval = interval
+        self.include = set(include or ())
+        self.exclude = set(exclude or ())
+        self.sample_rates = dict(sample_rates or {})
+        self.default_rate = self.sample_rates.pop('*', 1.0 if mode == 'raw' else 0.0)
+        self.random = random.Random()
+        self.reset(time.time())
+
+    @classmethod
+    def from_env(cls):
+        """Create a policy from the CALCULATOR_EXPORT_* environment variables"""
+        return cls(
+            os.environ.get("CALCULATOR_EXPORT_MODE", "raw"),
+            float(os.environ.get("CALCULATOR_EXPORT_INTERVAL", 60)),
+            parse_names(os.environ.get("CALCULATOR_EXPORT_INCLUDE")),
+            parse_names(os.environ.get("CALCULATOR_EXPORT_EXCLUDE")),
+            parse_sample_rates(os.environ.get("CALCULATOR_EXPORT_SAMPLE")),
+        )
+
+    def reset(self, now):
+        self.interval_start = now
+        self.counts = {}
+        self.errors = 0
+        self.result_count = 0
+        self.result_sum = 0.0
+        self.result_min = math.inf
+        self.result_max = -math.inf
+
+    def record(self, operation, result):
+        """Count an operation; return whether it should also be written as a raw point"""
+        name = operator_name(operation)
+        if (self.include and name not in self.include) or name in self.exclude:
+            return False
+        if self.mode == 'aggregate':
+            self.counts[name] = self.counts.get(name, 0) + 1
+            if isinstance(result, str) and result.startswith("Error"):
+                self.errors += 1
+            else:
+                try:
+                    value = float(result)
+                except (TypeError, ValueError):
+                    # Fraction-mode results such as "1/3"
+                    try:
+                        value = float(Fraction(result))
+                    except (TypeError, ValueError, ZeroDivisionError):
+                        value = None
+                if value is not None and math.isfinite(value):
+                    self.result_count += 1
+                    self.result_sum += value
+                    self.result_min = min(self.result_min, value)
+                    self.result_max = max(self.result_max, value)
+        rate = self.sample_rates.get(name, self.default_rate)
+        return rate >= 1 or (rate > 0 and self.random.random() < rate)
+
+    def summary_line(self, now=None, force=False):
+        """Return the summary point once the interval has elapsed (or when forced), else None"""
+        if self.mode != 'aggregate':
+            return None
+        now = time.time() if now is None else now
+        if not force and now - self.interval_start < self.interval:
+            return None
+        total = sum(self.counts.values())
+        fields = {'count': total, 'errors': self.errors}
+        if self.result_count:
+            fields.update(result_sum=self.result_sum, result_min=self.result_min,
+                          result_max=self.result_max)
+        fields.update((f"count_{name}", count) for name, count in sorted(self.counts.items()))
+        fields['interval'] = now - self.interval_start
+        self.reset(now)
+        if not total:
+            return None
+        return encode_point('calculator_summary', None, fields, int(now * 1e9))
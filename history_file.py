@@ -0,0 +1,286 @@
+import os
+import sys
+import mmap
+import math
+import bisect
+import struct
+import argparse
+import itertools
+from contextlib import contextmanager
+from datetime import datetime
+from fractions import Fraction
+from export_policy import OPERATOR_CODES, log_operator_name
+from history_store import HistoryStore
+
+# numpy is imported on first use of to_numpy(), so reading the file does not need it
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+MAGIC = b'CALCHIST'
+VERSION = 1
+HEADER = struct.Struct('<8sIII12x')
+# time (ns), source row id, operator code, flags, first operand, second operand, result
+RECORD = struct.Struct('<qqBB6xddd')
+TIME = struct.Struct('<q')
+RECORD_FIELDS = ('time', 'source_id', 'op', 'flags', 'a', 'b', 'result')
+FLAG_ERROR = 1
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+def record_dtype():
+    import numpy as np
+    return np.dtype({
+        'names': list(RECORD_FIELDS),
+        'formats': ['<i8', '<i8', 'u1', 'u1', '<f8', '<f8', '<f8'],
+        'offsets': [0, 8, 16, 17, 24, 32, 40],
+        'itemsize': RECORD.size,
+    })
+
+def parse_operand(text):
+    """Parse a logged operand (float, decimal or fraction text); NaN if it is not a number"""
+    try:
+        return float(Fraction(text.rstrip('°')))
+    except (ValueError, ZeroDivisionError):
+        return math.nan
+
+def encode_entry(entry, source_id=0):
+    """Convert a log entry into a record tuple"""
+    operation = entry["operation"]
+    parts = operation.split(' ')
+    name = log_operator_name(operation)
+    a = b = math.nan
+    if name in ('add', 'subtract', 'multiply', 'divide'):
+        a, b = parse_operand(parts[0]), parse_operand(parts[2])
+    elif name in ('negate', 'percent'):
+        a = parse_operand(parts[0])
+    elif name in ('sin', 'cos', 'tan') and '(' in operation:
+        a = parse_operand(operation.split('(', 1)[1].rstrip(')'))
+    code = OPERATOR_CODES.index(name)
+    result = str(entry["result"])
+    flags = FLAG_ERROR if result.startswith("Error") else 0
+    timestamp = datetime.strptime(entry["timestamp"], TIMESTAMP_FORMAT).timestamp()
+    return (int(timestamp) * 1000000000, source_id, code, flags, a, b, parse_operand(result))
+
+@contextmanager
+def exclusive_lock(path):
+    """Hold an exclusive lock on the file at `path`, created if missing, across processes"""
+    with open(path, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+def format_record(record):
+    time_ns, _, code, flags, a, b, result = record
+    timestamp = datetime.fromtimestamp(time_ns / 1e9).strftime(TIMESTAMP_FORMAT)
+    value = "Error" if flags & FLAG_ERROR else f"{result:g}"
+    operands = ' '.join(f"{x:g}" for x in (a, b) if not math.isnan(x))
+    return f"{timestamp}  {OPERATOR_CODES[code]:<10} {operands:<30} {value}"
+
+class TimeColumn:
+    """Sequence view of the record timestamps, for bisect"""
+
+    def __init__(self, history):
+        self.history = history
+
+    def __len__(self):
+        return len(self.history)
+
+    def __getitem__(self, index):
+        return TIME.unpack_from(self.history.map, HEADER.size + index * RECORD.size)[0]
+
+class HistoryFile:
+    """Very large calculation histories as fixed-width binary records.
+
+    Records are appended in time order and read through mmap, so opening a
+    file costs the same whatever its size. A sparse index in `<path>.idx`
+    holds the time of every `stride`-th record; range lookups bisect the
+    index and then one block of records, touching O(log n) pages.
+    `to_numpy()` returns a zero-copy NumPy structured array over the mapped
+    records. The file is filled from the shared history, archive included,
+    by `sync()`; each record keeps the id of its source row, so syncing
+    resumes after the last record. Appends hold an exclusive lock on
+    `<path>.lock`, so processes syncing at once do not interleave records.
+
+    Records hold the operator, numeric operands and result; the full
+    operation text stays in the SQLite history.
+    """
+
+    def __init__(self, path='calculator_history.bin', stride=1024):
+        self.path = path
+        self.index_path = path + '.idx'
+        self.lock_path = path + '.lock'
+        if not os.path.exists(path) or os.path.getsize(path) < HEADER.size:
+            with open(path, 'wb') as f:
+                f.write(HEADER.pack(MAGIC, VERSION, RECORD.size, stride))
+        self.map = self.index_map = None
+        self.index = []
+        self.refresh()
+        magic, version, record_size, self.stride = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+            raise ValueError(f"{path} is not a version {VERSION} history file")
+
+    def refresh(self):
+        """Map records appended since the file was opened"""
+        self.close()
+        with open(self.path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        # A partly written last record is ignored
+        self.count = (size - HEADER.size) // RECORD.size
+        self.index = []
+        if os.path.exists(self.index_path) and os.path.getsize(self.index_path):
+            with open(self.index_path, 'rb') as f:
+                self.index_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.index = memoryview(self.index_map).cast('q')
+
+    def close(self):
+        if isinstance(self.index, memoryview):
+            self.index.release()
+        for mapped in (self.map, self.index_map):
+            if mapped is not None:
+                try:
+                    mapped.close()
+                except BufferError:
+                    # NumPy arrays from to_numpy() still use it; freed with them
+                    pass
+        self.map = self.index_map = None
+        self.index = []
+
+    def __len__(self):
+        return self.count
+
+    def record(self, index):
+        return RECORD.unpack_from(self.map, HEADER.size + index * RECORD.size)
+
+    def last_source_id(self):
+        return self.record(self.count - 1)[1] if self.count else 0
+
+    def find_time(self, time_ns):
+        """Index of the first record at or after time_ns"""
+        times = TimeColumn(self)
+        # The index gives the block; only the block's records are searched
+        blocks = min(bisect.bisect_left(self.index, time_ns), len(self.index))
+        lo = max(blocks - 1, 0) * self.stride
+        hi = min(blocks * self.stride, self.count) if blocks < len(self.index) else self.count
+        return bisect.bisect_left(times, time_ns, lo, max(lo, hi))
+
+    def range(self, start_ns=None, stop_ns=None):
+        """Record indexes [lo, hi) with start_ns <= time < stop_ns"""
+        lo = 0 if start_ns is None else self.find_time(start_ns)
+        hi = self.count if stop_ns is None else self.find_time(stop_ns)
+        return lo, max(lo, hi)
+
+    def iter_range(self, start_ns=None, stop_ns=None):
+        lo, hi = self.range(start_ns, stop_ns)
+        return RECORD.iter_unpack(self.map[HEADER.size + lo * RECORD.size:HEADER.size + hi * RECORD.size])
+
+    def to_numpy(self, start_ns=None, stop_ns=None):
+        """Structured array of the records in a time range, without copying them"""
+        import numpy as np
+        lo, hi = self.range(start_ns, stop_ns)
+        return np.frombuffer(self.map, dtype=record_dtype(), count=hi - lo,
+                             offset=HEADER.size + lo * RECORD.size)
+
+    def append(self, records):
+        """Append records, keeping times non-decreasing, and extend the sparse index"""
+        if not records:
+            return
+        with exclusive_lock(self.lock_path):
+            # Pick up records another process appended
+            self.refresh()
+            self.append_locked(records)
+
+    def append_locked(self, records):
+        last_time = self.record(self.count - 1)[0] if self.count else None
+        data = bytearray()
+        index = bytearray()
+        # Index entries an interrupted append did not write are rebuilt first
+        indexed = len(self.index)
+        for block in range(indexed, -(-self.count // self.stride)):
+            index += TIME.pack(self.record(block * self.stride)[0])
+        position = self.count
+        for record in records:
+            if last_time is not None and record[0] < last_time:
+                record = (last_time,) + tuple(record[1:])
+            last_time = record[0]
+            data += RECORD.pack(*record)
+            if position % self.stride == 0:
+                index += TIME.pack(record[0])
+            position += 1
+        with open(self.path, 'ab') as f:
+            # Drop a partly written record left by an interrupted append
+            f.truncate(HEADER.size + self.count * RECORD.size)
+            f.write(data)
+        with open(self.index_path, 'ab') as f:
+            f.truncate(indexed * TIME.size)
+            f.write(index)
+        self.refresh()
+
+    def sync(self, store, batch=10000):
+        """Append history rows added since the last sync, archived ones included; return how many"""
+        total = 0
+        with exclusive_lock(self.lock_path):
+            self.refresh()
+            rows = store.iter_rows(self.last_source_id(), batch)
+            while True:
+                chunk = list(itertools.islice(rows, batch))
+                if not chunk:
+                    return total
+                self.append_locked([encode_entry(entry, row_id) for row_id, entry in chunk])
+                total += len(chunk)
+
+def parse_local_time(text):
+    return int(datetime.strptime(text, TIMESTAMP_FORMAT).timestamp()) * 1000000000 if text else None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Indexed binary calculator history")
+    parser.add_argument('command', choices=('sync', 'range', 'stats'))
+    parser.add_argument('--file', default='calculator_history.bin')
+    parser.add_argument('--db', default=os.getenv('CALCULATOR_HISTORY_DB', 'calculator_history.db'),
+                        help="SQLite history to sync from")
+    parser.add_argument('--start', help="Local time, e.g. '2024-01-01 00:00:00'")
+    parser.add_argument('--stop', help="Local time, exclusive")
+    args = parser.parse_args()
+
+    history = HistoryFile(args.file)
+    start, stop = parse_local_time(args.start), parse_local_time(args.stop)
+    if args.command == 'sync':
+        store = HistoryStore(args.db, max_rows=0)
+        added = history.sync(store)
+        store.close()
+        print(f"Added {added} records, {len(history)} in total")
+    elif args.command == 'range':
+        for record in history.iter_range(start, stop):
+            print(format_record(record))
+    else:
+        records = history.to_numpy(start, stop)
+        if not len(records):
+            print("No records in range")
+            sys.exit(0)
+        import numpy as np
+        print(f"Records: {len(records)}")
+        print(f"From {datetime.fromtimestamp(records['time'][0] / 1e9)} "
+              f"to {datetime.fromtimestamp(records['time'][-1] / 1e9)}")
+        print(f"Errors: {int(np.count_nonzero(records['flags'] & FLAG_ERROR))}")
+        results = records['result'][np.isfinite(records['result'])]
+        if len(results):
+            print(f"Results: mean {results.mean():g}, min {results.min():g}, max {results.max():g}")
+        counts = np.bincount(records['op'], minlength=len(OPERATOR_CODES))
+        for code, count in enumerate(counts):
+            if count:
+                print(f"  {OPERATOR_CODES[code]:<10} {count}")
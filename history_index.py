@@ -0,0 +1,117 @@
+import math
+import bisect
+from array import array
+from fractions import Fraction
+from export_policy import OPERATOR_CODES, log_operator_name
+
+# Log entries that record a setting change rather than a calculation
+NOTICE_PREFIXES = ("Precision changed", "Mode changed")
+
+def is_calculation(operation):
+    """Whether a logged operation produced a result, rather than clearing or changing a setting"""
+    return operation != "Clear" and not operation.startswith(NOTICE_PREFIXES)
+
+def result_value(text):
+    """Numeric value of a logged result (float, decimal or fraction text); NaN if there is none"""
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    try:
+        return float(Fraction(text))
+    except (ValueError, ZeroDivisionError):
+        return math.nan
+
+class HistoryIndex:
+    """In-memory index of the history for the history panel.
+
+    Entries are kept as columns: timestamp, operation and result text, plus
+    operator codes and numeric results in compact arrays, and a list of
+    positions per operator. Entries added while older history is still being
+    loaded (`start_backfill()` ... `finish_backfill()`) are held back and
+    appended afterwards, so positions stay in history order.
+    """
+
+    def __init__(self):
+        self.timestamps = []
+        self.operations = []
+        self.results = []
+        self.codes = array('B')
+        self.values = array('d')
+        self.by_code = [array('l') for _ in OPERATOR_CODES]
+        self.pending = None
+
+    def __len__(self):
+        return len(self.operations)
+
+    def add(self, entry):
+        if self.pending is not None:
+            self.pending.append(entry)
+        else:
+            self.append(entry)
+
+    def append(self, entry):
+        code = OPERATOR_CODES.index(log_operator_name(entry["operation"]))
+        self.by_code[code].append(len(self.operations))
+        self.timestamps.append(entry["timestamp"])
+        self.operations.append(entry["operation"])
+        self.results.append(entry["result"])
+        self.codes.append(code)
+        self.values.append(result_value(entry["result"]))
+
+    def start_backfill(self):
+        self.pending = []
+
+    def backfill(self, entries):
+        for entry in entries:
+            self.append(entry)
+
+    def finish_backfill(self):
+        pending, self.pending = self.pending or [], None
+        self.backfill(pending)
+
+    def entry(self, position):
+        return {"timestamp": self.timestamps[position], "operation": self.operations[position],
+                "result": self.results[position]}
+
+class HistoryFilter:
+    """Positions of the indexed entries matching an operator, text and result range.
+
+    Matches are found incrementally: `update()` only checks entries added to
+    the index since the last call, at most `limit` candidates at a time, so a
+    filter over a very large history can be applied in idle-time steps.
+    """
+
+    def __init__(self, operator=None, text='', low=None, high=None):
+        self.code = OPERATOR_CODES.index(operator) if operator else None
+        self.text = text.lower()
+        self.low = -math.inf if low is None else low
+        self.high = math.inf if high is None else high
+        self.ranged = low is not None or high is not None
+        self.matches = array('l')
+        self.checked = 0
+
+    def is_empty(self):
+        return self.code is None and not self.text and not self.ranged
+
+    def update(self, index, limit=None):
+        """Check entries added since the last update; return True once all are checked"""
+        stop = len(index)
+        if limit is not None:
+            stop = min(stop, self.checked + limit)
+        if self.code is None:
+            candidates = range(self.checked, stop)
+        else:
+            positions = index.by_code[self.code]
+            candidates = positions[bisect.bisect_left(positions, self.checked):
+                                   bisect.bisect_left(positions, stop)]
+        text, low, high = self.text, self.low, self.high
+        operations, results, values = index.operations, index.results, index.values
+        for position in candidates:
+            if self.ranged and not low <= values[position] <= high:
+                continue
+            if text and text not in operations[position].lower() and text not in results[position].lower():
+                continue
+            self.matches.append(position)
+        self.checked = stop
+        return stop == len(index)
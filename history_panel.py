@@ -0,0 +1,205 @@
+import tkinter as tk
+from tkinter import ttk
+from export_policy import OPERATOR_CODES
+from history_index import HistoryFilter, is_calculation
+
+ROW_HEIGHT = 22
+FILTER_DELAY_MS = 150
+# Candidates checked per idle step when a filter is applied to a large history
+FILTER_CHUNK = 200000
+
+class HistoryPanel:
+    """Window listing the calculator history, newest first.
+
+    The list is virtualized: only the rows that fit in the window exist as
+    canvas text items, and scrolling rewrites their text from the history
+    index, so the cost of drawing does not depend on the history size.
+    Filters by operator, text and result range are applied incrementally
+    through a HistoryFilter. Clicking a row recalls its result into the
+    display, unless the row is a Clear or a setting change.
+    """
+
+    def __init__(self, calculator):
+        self.calculator = calculator
+        self.index = calculator.history_index
+        self.filter = None
+        self.filter_done = True
+        self.filter_job = None
+        self.refresh_scheduled = False
+        self.first = 0
+        self.shown_count = 0
+        self.rows = []
+
+        self.window = tk.Toplevel(calculator.root)
+        self.window.title("History")
+        self.window.geometry("520x480")
+        self.window.configure(bg="#2b2b2b")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        filters = tk.Frame(self.window, bg="#2b2b2b")
+        filters.pack(fill=tk.X, padx=5, pady=5)
+        self.operator_var = tk.StringVar(value='all')
+        self.text_var = tk.StringVar()
+        self.low_var = tk.StringVar()
+        self.high_var = tk.StringVar()
+        operator_box = ttk.Combobox(filters, textvariable=self.operator_var, width=10,
+                                    values=('all',) + OPERATOR_CODES, state='readonly')
+        operator_box.pack(side=tk.LEFT, padx=2)
+        operator_box.bind("<<ComboboxSelected>>", self.schedule_filter)
+        for label, var, width in (("Text", self.text_var, 12), ("Min", self.low_var, 8),
+                                  ("Max", self.high_var, 8)):
+            tk.Label(filters, text=label, bg="#2b2b2b", fg="white").pack(side=tk.LEFT, padx=2)
+            tk.Entry(filters, textvariable=var, width=width).pack(side=tk.LEFT, padx=2)
+            var.trace_add('write', self.schedule_filter)
+
+        self.status = tk.Label(self.window, anchor=tk.W, bg="#2b2b2b", fg="white")
+        self.status.pack(fill=tk.X, padx=5)
+
+        body = tk.Frame(self.window, bg="#2b2b2b")
+        body.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.scrollbar = tk.Scrollbar(body, orient=tk.VERTICAL, command=self.on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas = tk.Canvas(body, bg="#1a1a1a", highlightthickness=0)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.canvas.bind("<Configure>", self.on_resize)
+        self.canvas.bind("<Button-1>", self.on_click)
+        self.canvas.bind("<MouseWheel>", self.on_wheel)
+        self.canvas.bind("<Button-4>", self.on_wheel)
+        self.canvas.bind("<Button-5>", self.on_wheel)
+        self.resize(self.canvas.winfo_width(), self.canvas.winfo_height())
+
+    def close(self):
+        self.window.destroy()
+        self.calculator.history_panel = None
+
+    def row_count(self):
+        return len(self.filter.matches) if self.filter is not None else len(self.index)
+
+    def position(self, row):
+        """Index position shown in a row, newest first"""
+        if self.filter is not None:
+            return self.filter.matches[len(self.filter.matches) - 1 - row]
+        return len(self.index) - 1 - row
+
+    def resize(self, width, height):
+        """Create or remove row items so they just fill the canvas"""
+        needed = max(1, height // ROW_HEIGHT + 1)
+        while len(self.rows) < needed:
+            y = len(self.rows) * ROW_HEIGHT + ROW_HEIGHT // 2
+            self.rows.append((
+                self.canvas.create_text(5, y, anchor=tk.W, fill="#a5a5a5", font=("Arial", 10)),
+                self.canvas.create_text(150, y, anchor=tk.W, fill="white", font=("Arial", 11)),
+                self.canvas.create_text(width - 5, y, anchor=tk.E, fill="#ff9500", font=("Arial", 11)),
+            ))
+        while len(self.rows) > needed:
+            for item in self.rows.pop():
+                self.canvas.delete(item)
+        for i, (_, _, result_item) in enumerate(self.rows):
+            self.canvas.coords(result_item, width - 5, i * ROW_HEIGHT + ROW_HEIGHT // 2)
+        self.render()
+
+    def render(self):
+        """Write the visible rows and update the scrollbar"""
+        count = self.row_count()
+        visible = len(self.rows)
+        self.first = max(0, min(self.first, count - visible + 1))
+        index = self.index
+        for i, items in enumerate(self.rows):
+            row = self.first + i
+            if row < count:
+                position = self.position(row)
+                texts = (index.timestamps[position], index.operations[position], index.results[position])
+            else:
+                texts = ('', '', '')
+            for item, text in zip(items, texts):
+                self.canvas.itemconfigure(item, text=text)
+        if count:
+            self.scrollbar.set(self.first / count, min(1.0, (self.first + visible) / count))
+        else:
+            self.scrollbar.set(0, 1)
+        self.shown_count = count
+
+        status = f"{count:,} entries" if self.filter is None else f"{count:,} of {len(index):,} entries"
+        if index.pending is not None:
+            status += " (loading older history...)"
+        elif self.filter is not None and self.filter.checked < len(index):
+            status += " (filtering...)"
+        self.status.config(text=status)
+
+    def schedule_refresh(self):
+        """Show entries added to the index, once the event loop is idle"""
+        if not self.refresh_scheduled:
+            self.refresh_scheduled = True
+            self.window.after_idle(self.refresh)
+
+    def refresh(self):
+        self.refresh_scheduled = False
+        # A filter still being applied in steps reaches new entries by itself
+        if self.filter is not None and self.filter_done:
+            self.filter.update(self.index)
+        # Keep a scrolled view on the same entries while new ones arrive on top
+        if self.first:
+            self.first += self.row_count() - self.shown_count
+        self.render()
+
+    def schedule_filter(self, *args):
+        """Apply the filters once typing pauses"""
+        if self.filter_job is not None:
+            self.window.after_cancel(self.filter_job)
+        self.filter_job = self.window.after(FILTER_DELAY_MS, self.apply_filter)
+
+    def apply_filter(self):
+        self.filter_job = None
+        operator = self.operator_var.get()
+        history_filter = HistoryFilter(None if operator == 'all' else operator, self.text_var.get().strip(),
+                                       self.parse_bound(self.low_var.get()),
+                                       self.parse_bound(self.high_var.get()))
+        self.filter = None if history_filter.is_empty() else history_filter
+        self.first = 0
+        self.filter_done = self.filter is None
+        if self.filter is None:
+            self.render()
+        else:
+            self.apply_filter_step(self.filter)
+
+    def apply_filter_step(self, history_filter):
+        """Check the next chunk of entries, leaving the event loop free in between"""
+        if history_filter is not self.filter:
+            return
+        self.filter_done = history_filter.update(self.index, FILTER_CHUNK)
+        self.render()
+        if not self.filter_done:
+            self.window.after(1, self.apply_filter_step, history_filter)
+
+    def parse_bound(self, text):
+        try:
+            return float(text)
+        except ValueError:
+            return None
+
+    def on_resize(self, event):
+        self.resize(event.width, event.height)
+
+    def on_scrollbar(self, action, amount, unit=None):
+        if action == 'moveto':
+            self.first = int(float(amount) * self.row_count())
+        else:
+            step = max(1, len(self.rows) - 1) if unit == 'pages' else 1
+            self.first += int(amount) * step
+        self.render()
+
+    def on_wheel(self, event):
+        # Button-4/5 on X11, MouseWheel with a delta on Windows and macOS
+        if event.num == 4 or getattr(event, 'delta', 0) > 0:
+            self.first -= 3
+        else:
+            self.first += 3
+        self.render()
+
+    def on_click(self, event):
+        row = self.first + event.y // ROW_HEIGHT
+        if row >= self.row_count():
+            return
+        position = self.position(row)
+        if is_calculation(self.index.operations[position]):
+            self.calculator.recall_result(self.index.results[position])
@@ -0,0 +1,178 @@
+import os
+import json
+import uuid
+import sqlite3
+import threading
+from log_segments import SegmentedLog, read_lines
+
+HISTORY_FIELDS = ('timestamp', 'operation', 'result')
+
+class HistoryStore:
+    """Calculation history shared by every calculator process on a machine.
+
+    Entries are appended to a SQLite database in WAL mode, so any number of
+    windows and services can write at once without rewriting the history, and
+    readers never block writers. Each instance tags its rows with its own id;
+    `new_entries()` returns only rows other instances added since the last
+    call, so a window can pick up their history incrementally. The oldest
+    rows are pruned once there are more than `max_rows`; unless `archive` is
+    empty, they are first appended as JSON lines to that SegmentedLog
+    (by default `<name>_archive.jsonl` next to the database), which keeps
+    them in compressed segments. The archive is exempt from log retention,
+    so `iter_entries()` always covers the whole history.
+    """
+
+    def __init__(self, path='calculator_history.db', max_rows=100000, archive=None):
+        self.path = path
+        self.max_rows = max_rows
+        self.archive_path = os.path.splitext(path)[0] + '_archive.jsonl' if archive is None else archive
+        self.archive = None
+        self.instance = uuid.uuid4().hex
+        self.last_id = 0
+        # The service appends from executor threads
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        with self.conn:
+            self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT,
+                operation TEXT,
+                result TEXT,
+                instance TEXT
+            )
+            ''')
+
+    @classmethod
+    def from_env(cls):
+        """Open the store named by CALCULATOR_HISTORY_DB, limited to CALCULATOR_HISTORY_LIMIT rows"""
+        return cls(os.environ.get("CALCULATOR_HISTORY_DB", "calculator_history.db"),
+                   int(os.environ.get("CALCULATOR_HISTORY_LIMIT", 100000)),
+                   os.environ.get("CALCULATOR_HISTORY_ARCHIVE"))
+
+    def import_json(self, log_file):
+        """Import a calculator_log.json history once, if the store is still empty"""
+        if not os.path.exists(log_file):
+            return 0
+        try:
+            with open(log_file, 'r') as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        # Check and insert under one write lock, so two instances starting
+        # together cannot both import the file
+        with self.lock, self.conn:
+            self.conn.execute('BEGIN IMMEDIATE')
+            if self.conn.execute('SELECT 1 FROM history LIMIT 1').fetchone():
+                return 0
+            self.insert(entries)
+        return len(entries)
+
+    def append(self, entries):
+        """Append log entries in one transaction"""
+        if not entries:
+            return
+        with self.lock, self.conn:
+            self.insert(entries)
+
+    def insert(self, entries):
+        self.conn.executemany(
+            'INSERT INTO history (timestamp, operation, result, instance) VALUES (?, ?, ?, ?)',
+            [(entry["timestamp"], entry["operation"], entry["result"], self.instance)
+             for entry in entries])
+        last_id = self.conn.execute('SELECT MAX(id) FROM history').fetchone()[0]
+        if self.max_rows and last_id and last_id > self.max_rows:
+            self.archive_rows(last_id - self.max_rows)
+            self.conn.execute('DELETE FROM history WHERE id <= ?', (last_id - self.max_rows,))
+
+    def archive_rows(self, last_id):
+        """Append the rows about to be pruned to the archive.
+
+        Runs inside the pruning transaction, whose write lock keeps processes
+        sharing the archive from writing it at the same time.
+        """
+        if not self.archive_path:
+            return
+        rows = self.conn.execute(
+            'SELECT id, timestamp, operation, result FROM history WHERE id <= ? ORDER BY id',
+            (last_id,)).fetchall()
+        if not rows:
+            return
+        if self.archive is None:
+            self.archive = SegmentedLog.from_env(self.archive_path, keep=None, max_days=None, shared=True)
+        self.archive.write(''.join(json.dumps(dict(zip(('id',) + HISTORY_FIELDS, row))) + '\n'
+                                   for row in rows))
+        self.archive.flush()
+
+    def recent(self, limit):
+        """Return the newest `limit` entries, oldest first, and start following from there"""
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT id, timestamp, operation, result FROM history ORDER BY id DESC LIMIT ?',
+                (limit,)).fetchall()
+            if rows:
+                self.last_id = max(self.last_id, rows[0][0])
+            else:
+                self.last_id = self.conn.execute(
+                    'SELECT COALESCE(MAX(id), 0) FROM history').fetchone()[0]
+        return [dict(zip(HISTORY_FIELDS, row[1:])) for row in reversed(rows)]
+
+    def new_entries(self):
+        """Return entries other instances appended since the last call"""
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT id, timestamp, operation, result, instance FROM history WHERE id > ? ORDER BY id',
+                (self.last_id,)).fetchall()
+        if not rows:
+            return []
+        self.last_id = rows[-1][0]
+        return [dict(zip(HISTORY_FIELDS, row[1:4])) for row in rows if row[4] != self.instance]
+
+    def rows_after(self, row_id, limit=10000):
+        """Return up to `limit` (id, entry) pairs with ids above `row_id`, from every instance"""
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT id, timestamp, operation, result FROM history WHERE id > ? ORDER BY id LIMIT ?',
+                (row_id, limit)).fetchall()
+        return [(row[0], dict(zip(HISTORY_FIELDS, row[1:]))) for row in rows]
+
+    def iter_entries(self, chunk=10000, stop_id=None):
+        """Yield every entry, oldest first: the archived ones, then those in the database
+
+        With `stop_id`, rows appended after it are left out.
+        """
+        for _, entry in self.iter_rows(0, chunk, stop_id):
+            yield entry
+
+    def iter_rows(self, row_id=0, chunk=10000, stop_id=None):
+        """Yield (id, entry) for every row with an id above `row_id`, archived ones included"""
+        with self.lock:
+            first_id = self.conn.execute('SELECT MIN(id) FROM history').fetchone()[0]
+        # Archived rows all precede the database's; skip the archive when none are wanted
+        if self.archive_path and (first_id is None or first_id > row_id + 1):
+            try:
+                for line in read_lines(self.archive_path):
+                    entry = json.loads(line)
+                    archived_id = entry.pop('id')
+                    # Rows archived twice by an interrupted prune are read once
+                    if archived_id > row_id:
+                        row_id = archived_id
+                        yield archived_id, entry
+            except FileNotFoundError:
+                pass
+        while True:
+            rows = self.rows_after(row_id, chunk)
+            if stop_id is not None:
+                rows = [(i, entry) for i, entry in rows if i <= stop_id]
+            if not rows:
+                return
+            row_id = rows[-1][0]
+            yield from rows
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+            if self.archive is not None:
+                self.archive.close()
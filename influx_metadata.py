@@ -0,0 +1,86 @@
+import os
+import json
+import time
+import tempfile
+
+DEFAULT_PATH = '.influxdb_metadata.json'
+DEFAULT_TTL = 24 * 60 * 60  # 1 day
+
+class MetadataCache:
+    """Persisted cache of InfluxDB organization and bucket IDs by name.
+
+    Entries are keyed by server URL, so one file can serve several servers,
+    and expire after `ttl` seconds. IDs are only learned from real lookups or
+    bucket creation; a caller that gets a 404 for a cached ID should
+    `invalidate` it and fall back to names.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, ttl=DEFAULT_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.entries = None
+        self.dirty = False
+
+    @classmethod
+    def from_env(cls):
+        """Create a cache from INFLUXDB_METADATA_CACHE and INFLUXDB_METADATA_TTL"""
+        return cls(os.getenv('INFLUXDB_METADATA_CACHE', DEFAULT_PATH),
+                   float(os.getenv('INFLUXDB_METADATA_TTL', DEFAULT_TTL)))
+
+    def load(self):
+        if self.entries is not None:
+            return
+        try:
+            with open(self.path, 'r') as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def save(self):
+        """Write the cache to disk if it changed"""
+        if not self.dirty:
+            return
+        # A unique temporary file, so processes saving at once do not clobber each other's
+        directory, name = os.path.split(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix=name + '.', suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self.entries, f)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        self.dirty = False
+
+    @staticmethod
+    def key(kind, name, org=None):
+        # Bucket names are only unique within an organization
+        return f"{kind}:{org}/{name}" if org else f"{kind}:{name}"
+
+    def get(self, url, kind, name, org=None):
+        """Return the cached ID, or None if it is unknown or expired"""
+        self.load()
+        entry = self.entries.get(url, {}).get(self.key(kind, name, org))
+        if entry is None or time.time() - entry['time'] > self.ttl:
+            return None
+        return entry['id']
+
+    def put(self, url, kind, name, id, org=None):
+        self.load()
+        self.entries.setdefault(url, {})[self.key(kind, name, org)] = {'id': id, 'time': time.time()}
+        self.dirty = True
+
+    def invalidate(self, url, kind, name, org=None):
+        self.load()
+        if self.entries.get(url, {}).pop(self.key(kind, name, org), None) is not None:
+            self.dirty = True
+
+    def write_params(self, url, org, bucket):
+        """Query parameters for /api/v2/write, using cached IDs where known"""
+        org_id = self.get(url, 'org', org)
+        bucket_id = self.get(url, 'bucket', bucket, org)
+        return {
+            **({'orgID': org_id} if org_id else {'org': org}),
+            # The bucket parameter accepts a bucket ID as well as a name
+            'bucket': bucket_id or bucket,
+        }
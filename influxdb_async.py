@@ -0,0 +1,247 @@
+import os
+import asyncio
+from aiohttp import ClientSession, ClientTimeout
+from dotenv import load_dotenv
+from influx_metadata import MetadataCache
+from line_protocol import LineBuffer
+
+class InfluxDBError(Exception):
+    """An InfluxDB API call returned an unexpected status"""
+
+    def __init__(self, status, text):
+        super().__init__(f"{status} - {text}")
+        self.status = status
+        self.text = text
+
+class AsyncInfluxDBClient:
+    """asyncio client for the InfluxDB v2 HTTP API.
+
+    Independent calls can be issued concurrently with asyncio.gather; at most
+    `concurrency` requests are in flight at once, however many are awaited.
+    Use as `async with AsyncInfluxDBClient.from_env() as client: ...`.
+
+    With a MetadataCache, organization and bucket IDs found by lookups are
+    remembered across runs, and writes, queries and deletes address them by
+    ID instead of by name.
+    """
+
+    def __init__(self, url, token, org=None, bucket=None, concurrency=8, timeout=30, metadata=None):
+        self.url = url.rstrip('/')
+        self.token = token
+        self.org = org
+        self.bucket = bucket
+        self.metadata = metadata
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.timeout = ClientTimeout(total=timeout)
+        self.session = None
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        """Create a client from the INFLUXDB_* settings in the environment or .env file"""
+        load_dotenv()
+        return cls(
+            os.getenv('INFLUXDB_URL', 'http://localhost:8086'),
+            os.getenv('INFLUXDB_TOKEN', ''),
+            os.getenv('INFLUXDB_ORG', 'calculator'),
+            os.getenv('INFLUXDB_BUCKET', 'calculator_logs'),
+            **{'metadata': MetadataCache.from_env(), **kwargs}
+        )
+
+    async def __aenter__(self):
+        self.session = ClientSession(
+            headers={'Authorization': f'Token {self.token}'},
+            timeout=self.timeout
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.session.close()
+        if self.metadata:
+            self.metadata.save()
+
+    async def request(self, method, path, expected=(200,), **kwargs):
+        """Make an API call and return the response body (JSON when available)"""
+        async with self.semaphore:
+            async with self.session.request(method, f"{self.url}{path}", **kwargs) as response:
+                if response.content_type == 'application/json':
+                    body = await response.json()
+                else:
+                    body = await response.text()
+                if response.status not in expected:
+                    raise InfluxDBError(response.status, body)
+                return body
+
+    async def health(self):
+        """Return (status code, body text) of the /health endpoint"""
+        async with self.semaphore:
+            async with self.session.get(f"{self.url}/health") as response:
+                return response.status, await response.text()
+
+    async def list_orgs(self, name=None):
+        params = {'org': name} if name else {}
+        body = await self.request('GET', '/api/v2/orgs', params=params)
+        return body.get('orgs', [])
+
+    async def find_org(self, name=None):
+        """Return the organization with the given name, or None"""
+        name = name or self.org
+        for org in await self.list_orgs(name):
+            if org['name'] == name:
+                self.remember('org', name, org['id'])
+                return org
+        return None
+
+    async def list_buckets(self, org=None, name=None):
+        params = {'org': org or self.org}
+        if name:
+            params['name'] = name
+        body = await self.request('GET', '/api/v2/buckets', params=params)
+        return body.get('buckets', [])
+
+    async def find_bucket(self, name=None, org=None):
+        """Return the bucket with the given name, or None"""
+        name = name or self.bucket
+        for bucket in await self.list_buckets(org, name):
+            if bucket['name'] == name:
+                self.remember('bucket', name, bucket['id'], org or self.org)
+                return bucket
+        return None
+
+    def remember(self, kind, name, id, org=None):
+        if self.metadata:
+            self.metadata.put(self.url, kind, name, id, org)
+
+    def forget(self, kind, name, org=None):
+        if self.metadata:
+            self.metadata.invalidate(self.url, kind, name, org)
+
+    def cached_id(self, kind, name, org=None):
+        return self.metadata.get(self.url, kind, name, org) if self.metadata else None
+
+    async def org_id(self, name=None):
+        """Return the ID of an organization, from the metadata cache when known"""
+        name = name or self.org
+        org_id = self.cached_id('org', name)
+        if org_id is None:
+            org = await self.find_org(name)
+            org_id = org['id'] if org else None
+        return org_id
+
+    async def bucket_id(self, name=None, org=None):
+        """Return the ID of a bucket, from the metadata cache when known"""
+        name = name or self.bucket
+        bucket_id = self.cached_id('bucket', name, org or self.org)
+        if bucket_id is None:
+            bucket = await self.find_bucket(name, org)
+            bucket_id = bucket['id'] if bucket else None
+        return bucket_id
+
+    async def request_target(self, method, path, org=None, bucket=None, bucket_param='bucket', **kwargs):
+        """Make an API call addressed to an organization (and bucket), by cached ID where known
+
+        A 404 for a cached ID means the organization or bucket was recreated,
+        so the IDs are forgotten and the call is retried by name.
+        """
+        org = org or self.org
+        org_id = self.cached_id('org', org)
+        bucket_id = self.cached_id('bucket', bucket, org) if bucket else None
+        params = {'orgID': org_id} if org_id else {'org': org}
+        if bucket:
+            params[bucket_param if bucket_id else 'bucket'] = bucket_id or bucket
+        try:
+            return await self.request(method, path, params=params, **kwargs)
+        except InfluxDBError as e:
+            if e.status != 404 or not (org_id or bucket_id):
+                raise
+        self.forget('org', org)
+        if bucket:
+            self.forget('bucket', bucket, org)
+        params = {'org': org, 'bucket': bucket} if bucket else {'org': org}
+        return await self.request(method, path, params=params, **kwargs)
+
+    async def create_bucket(self, name, org_id, retention_seconds):
+        data = {
+            'orgID': org_id,
+            'name': name,
+            'retentionRules': [{'type': 'expire', 'everySeconds': retention_seconds}]
+        }
+        bucket = await self.request('POST', '/api/v2/buckets', expected=(201,), json=data)
+        if org_id == self.cached_id('org', self.org):
+            self.remember('bucket', name, bucket['id'], self.org)
+        return bucket
+
+    async def delete_bucket(self, bucket_id, name=None, org=None):
+        await self.request('DELETE', f'/api/v2/buckets/{bucket_id}', expected=(204,))
+        if name:
+            self.forget('bucket', name, org or self.org)
+
+    async def list_tasks(self, org=None, name=None):
+        params = {'org': org or self.org}
+        if name:
+            params['name'] = name
+        body = await self.request('GET', '/api/v2/tasks', params=params)
+        return body.get('tasks', [])
+
+    async def find_task(self, name, org=None):
+        """Return the task with the given name, or None"""
+        for task in await self.list_tasks(org, name):
+            if task['name'] == name:
+                return task
+        return None
+
+    async def create_task(self, flux, org_id):
+        """Create a task from a Flux script; its name and schedule come from `option task`"""
+        data = {'orgID': org_id, 'flux': flux, 'status': 'active'}
+        return await self.request('POST', '/api/v2/tasks', expected=(201,), json=data)
+
+    async def delete(self, start, stop, predicate, bucket=None, org=None):
+        """Delete points in [start, stop) matching the predicate"""
+        data = {'start': start, 'stop': stop, 'predicate': predicate}
+        await self.request_target('POST', '/api/v2/delete', org, bucket or self.bucket, 'bucketID',
+                                  expected=(204,), json=data)
+
+    async def query(self, flux, org=None):
+        """Run a Flux query and return the CSV response"""
+        return await self.request_target(
+            'POST', '/api/v2/query', org,
+            headers={'Accept': 'application/csv'},
+            json={'query': flux, 'type': 'flux'}
+        )
+
+    async def query_lines(self, flux, org=None):
+        """Run a Flux query and yield the lines of its CSV response as they arrive
+
+        Unlike query(), the response is never held in memory as a whole, and
+        the request timeout only limits the wait for each chunk.
+        """
+        org = org or self.org
+        org_id = self.cached_id('org', org)
+        params = {'orgID': org_id} if org_id else {'org': org}
+        async with self.semaphore:
+            async with self.session.post(
+                f"{self.url}/api/v2/query", params=params,
+                headers={'Accept': 'application/csv'},
+                json={'query': flux, 'type': 'flux'},
+                timeout=ClientTimeout(sock_read=self.timeout.total)
+            ) as response:
+                if response.status != 200:
+                    if response.status == 404 and org_id:
+                        # Recreated organization; the next query looks it up by name
+                        self.forget('org', org)
+                    raise InfluxDBError(response.status, await response.text())
+                async for line in response.content:
+                    yield line.decode('utf-8')
+
+    async def query_many(self, queries, org=None):
+        """Run several Flux queries concurrently; failures are returned as exceptions"""
+        return await asyncio.gather(*(self.query(q, org) for q in queries), return_exceptions=True)
+
+    async def write(self, lines, bucket=None, org=None):
+        """Write line protocol points (a list of lines or a LineBuffer) in a single request"""
+        data = lines.data() if isinstance(lines, LineBuffer) else '\n'.join(lines).encode('utf-8')
+        # The write API takes a bucket ID in the bucket parameter
+        await self.request_target(
+            'POST', '/api/v2/write', org, bucket or self.bucket, expected=(204,),
+            headers={'Content-Type': 'text/plain; charset=utf-8'},
+            data=data
+        )
@@ -0,0 +1,113 @@
+import re
+import math
+import time
+from decimal import Decimal
+from fractions import Fraction
+
+# Escapes per the line protocol spec; backslashes are escaped first so a
+# trailing backslash cannot swallow the following separator, and newlines
+# (which would end the line) are written as \n. Most names need no escaping,
+# so a precompiled search skips the replacements for them.
+MEASUREMENT_SPECIAL = re.compile(r'[\\, \n]')
+KEY_SPECIAL = re.compile(r'[\\, =\n]')
+STRING_SPECIAL = re.compile(r'[\\"\n]')
+
+def escape_measurement(name):
+    if not MEASUREMENT_SPECIAL.search(name):
+        return name
+    return (name.replace('\\', '\\\\').replace(',', '\\,').replace(' ', '\\ ')
+            .replace('\n', '\\n'))
+
+def escape_key(key):
+    """Escape a tag key, tag value or field key"""
+    if not KEY_SPECIAL.search(key):
+        return key
+    return (key.replace('\\', '\\\\').replace(',', '\\,').replace('=', '\\=')
+            .replace(' ', '\\ ').replace('\n', '\\n'))
+
+def escape_string(value):
+    if not STRING_SPECIAL.search(value):
+        return value
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_field_value(value):
+    """Format a field value with its line protocol type: float, integer, boolean or string"""
+    # floats are by far the most common, so they are checked first; bool is
+    # checked before int, since it is a subclass
+    if type(value) is float:
+        if not math.isfinite(value):
+            raise ValueError(f"Field value must be finite: {value}")
+        return repr(value)
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, int):
+        return f"{value}i"
+    if isinstance(value, (float, Decimal, Fraction)):
+        value = float(value)
+        if not math.isfinite(value):
+            raise ValueError(f"Field value must be finite: {value}")
+        return repr(value)
+    if isinstance(value, str):
+        return f'"{escape_string(value)}"'
+    raise TypeError(f"Unsupported field type: {type(value).__name__}")
+
+def encode_point(measurement, tags=None, fields=None, timestamp=None):
+    """Encode one point as a line of line protocol.
+
+    Tags with empty values are left out, since line protocol does not allow
+    them, and tags are sorted by key as InfluxDB recommends. `timestamp` is
+    in nanoseconds; None means now.
+    """
+    if not fields:
+        raise ValueError("A point needs at least one field")
+    parts = [escape_measurement(measurement)]
+    if tags:
+        for key in sorted(tags):
+            value = tags[key]
+            if value is not None and value != '':
+                parts.append(f",{escape_key(key)}={escape_key(str(value))}")
+    parts.append(' ')
+    parts.append(','.join(f"{escape_key(key)}={format_field_value(value)}"
+                          for key, value in fields.items()))
+    if timestamp is None:
+        timestamp = time.time_ns()
+    parts.append(f" {int(timestamp)}")
+    return ''.join(parts)
+
+class LineBuffer:
+    """A batch of points encoded into one growing UTF-8 buffer.
+
+    Lines are appended to a single bytearray as they are encoded, instead of
+    collecting strings and joining them at the end. Use `data()` for the
+    request body; it is a view on the buffer, not a copy, so no lines can be
+    added while it is in use. `clear()` starts a new buffer, leaving the
+    view of a request still in flight intact.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def add(self, measurement, tags=None, fields=None, timestamp=None):
+        self.add_line(encode_point(measurement, tags, fields, timestamp))
+
+    def add_line(self, line):
+        """Append an already encoded line"""
+        if self.count:
+            self.buffer += b'\n'
+        self.buffer += line.encode('utf-8')
+        self.count += 1
+
+    def extend(self, lines):
+        for line in lines:
+            self.add_line(line)
+
+    def data(self):
+        return memoryview(self.buffer)
+
+    def clear(self):
+        self.buffer = bytearray()
+        self.count = 0
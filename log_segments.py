@@ -0,0 +1,198 @@
+import os
+import glob
+import gzip
+import time
+import shutil
+import logging
+import threading
+from datetime import datetime
+
+SEGMENT_TIME_FORMAT = '%Y%m%d-%H%M%S-%f'
+# Seconds a rotated segment is left uncompressed, so a process that has not
+# noticed the rotation yet can still finish its write to it
+COMPRESS_DELAY = 2.0
+
+def segment_paths(path):
+    """Rotated segments of a log, oldest first; a segment still being compressed is listed once"""
+    stem, ext = os.path.splitext(path)
+    pattern = f"{glob.escape(stem)}.*{ext}"
+    plain = set(glob.glob(pattern))
+    compressed = {name[:-3] for name in glob.glob(pattern + '.gz')}
+    return [name if name in plain else name + '.gz' for name in sorted(plain | compressed)]
+
+def read_lines(path):
+    """Yield the lines of a log across its rotated segments, compressed or not, then the current file"""
+    segments = segment_paths(path)
+    if not segments and not os.path.exists(path):
+        raise FileNotFoundError(f"No such log: {path}")
+    for name in segments + [path]:
+        candidates = [name]
+        if name != path and not name.endswith('.gz'):
+            # A segment compressed since it was listed is read from its .gz
+            candidates.append(name + '.gz')
+        for candidate in candidates:
+            opener = gzip.open if candidate.endswith('.gz') else open
+            try:
+                with opener(candidate, 'rt', encoding='utf-8') as f:
+                    yield from f
+                break
+            except FileNotFoundError:
+                # Removed by retention, or renamed by a rotation, while reading
+                continue
+
+def compress_segment(name):
+    """Gzip a rotated segment; the plain file is removed once the .gz is complete"""
+    # Per-process temporary name, as two processes may compress the same segment
+    temporary = f"{name}.gz.{os.getpid()}.tmp"
+    with open(name, 'rb') as source, gzip.open(temporary, 'wb') as target:
+        shutil.copyfileobj(source, target)
+    os.replace(temporary, name + '.gz')
+    os.remove(name)
+
+class SegmentedLog:
+    """Append-only text log split into rotated, compressed segments.
+
+    Lines go to `path` until it holds `max_bytes` or has been written for
+    `max_seconds`; it is then renamed to `<stem>.<time><ext>` and a fresh
+    file is started, so a write never costs more than an append. Rotated
+    segments are gzip-compressed in a background thread, which also deletes
+    all but the newest `keep` segments and any older than `max_days`; with
+    both None, every segment is kept.
+    `read_lines()` reads them back in order.
+
+    With `shared`, several processes may append to the same log: each write
+    first reopens the file if another process rotated it. Writes must then
+    be flushed, and should not race to rotate, as when they are serialized
+    by a database lock or are rare.
+    """
+
+    def __init__(self, path, max_bytes=1024 * 1024, max_seconds=None, keep=5, max_days=None,
+                 line_buffering=False, shared=False):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.keep = keep
+        self.max_days = max_days
+        self.line_buffering = line_buffering
+        self.shared = shared
+        self.lock = threading.Lock()
+        self.maintenance_lock = threading.Lock()
+        self.file = None
+        self.open()
+        # Finish work an earlier process left, e.g. segments it did not compress
+        self.start_maintenance()
+
+    @classmethod
+    def from_env(cls, path, **kwargs):
+        """Create a log rotated and retained per the CALCULATOR_LOG_* environment variables"""
+        seconds = os.environ.get("CALCULATOR_LOG_ROTATE_SECONDS")
+        days = os.environ.get("CALCULATOR_LOG_RETENTION_DAYS")
+        settings = {
+            'max_bytes': int(os.environ.get("CALCULATOR_LOG_MAX_BYTES", 1024 * 1024)),
+            'max_seconds': float(seconds) if seconds else None,
+            'keep': int(os.environ.get("CALCULATOR_LOG_BACKUPS", 5)),
+            'max_days': float(days) if days else None,
+        }
+        return cls(path, **{**settings, **kwargs})
+
+    def open(self):
+        self.file = open(self.path, 'a', encoding='utf-8', buffering=1 if self.line_buffering else -1)
+        self.size = self.file.tell()
+        self.started = time.time()
+
+    def follow(self):
+        """Reopen the current file if another process rotated it, and take its size"""
+        try:
+            current = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            current = None
+        if current != os.fstat(self.file.fileno()).st_ino:
+            self.file.close()
+            self.open()
+        else:
+            self.size = os.fstat(self.file.fileno()).st_size
+
+    def due(self):
+        if self.size >= self.max_bytes:
+            return True
+        return self.max_seconds is not None and self.size and time.time() - self.started >= self.max_seconds
+
+    def rotate_if_due(self):
+        """Start a new segment if the current one is full or old enough; return whether it did"""
+        with self.lock:
+            if self.shared:
+                self.follow()
+            if not self.due():
+                return False
+            self.rotate_locked()
+            return True
+
+    def rotate_locked(self):
+        self.file.close()
+        stem, ext = os.path.splitext(self.path)
+        os.replace(self.path, f"{stem}.{datetime.now().strftime(SEGMENT_TIME_FORMAT)}{ext}")
+        self.open()
+        self.start_maintenance(COMPRESS_DELAY)
+
+    def write(self, text):
+        """Append text (whole lines), rotating first if the segment is due"""
+        with self.lock:
+            if self.shared:
+                self.follow()
+            if self.due():
+                self.rotate_locked()
+            self.file.write(text)
+            # max_bytes limits the file size, so count bytes, not characters
+            self.size += len(text.encode('utf-8'))
+
+    def flush(self):
+        with self.lock:
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+    def start_maintenance(self, delay=0):
+        timer = threading.Timer(delay, self.maintain)
+        timer.daemon = True
+        timer.start()
+
+    def maintain(self):
+        """Compress rotated segments and delete those beyond the retention policy"""
+        with self.maintenance_lock:
+            self.maintain_locked()
+
+    def maintain_locked(self):
+        segments = segment_paths(self.path)
+        expired = segments[:max(0, len(segments) - self.keep)] if self.keep is not None else []
+        cutoff = time.time() - self.max_days * 86400 if self.max_days is not None else None
+        for name in segments:
+            try:
+                if name in expired or (cutoff is not None and os.path.getmtime(name) < cutoff):
+                    os.remove(name)
+                elif not name.endswith('.gz') and time.time() - os.path.getmtime(name) >= COMPRESS_DELAY:
+                    compress_segment(name)
+            except FileNotFoundError:
+                # Another process maintaining the same log got there first
+                continue
+            except OSError as e:
+                logging.error(f"Log segment {name} not maintained: {str(e)}")
+
+class SegmentHandler(logging.Handler):
+    """Logging handler writing formatted records to a SegmentedLog"""
+
+    def __init__(self, log):
+        super().__init__()
+        self.log = log
+
+    def emit(self, record):
+        try:
+            self.log.write(self.format(record) + '\n')
+            self.log.flush()
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        self.log.close()
+        super().close()
@@ -0,0 +1,95 @@
+import sys
+import math
+import operator
+from decimal import Decimal, InvalidOperation, localcontext
+from fractions import Fraction
+
+# Precision modes: float is the fast default, decimal uses a configurable number
+# of significant digits and fraction keeps results exact
+PRECISION_MODES = ('float', 'decimal', 'fraction')
+DEFAULT_DECIMAL_DIGITS = 28
+
+OPERATIONS = {
+    '+': operator.add,
+    '-': operator.sub,
+    '×': operator.mul,
+    '÷': operator.truediv,
+}
+
+def to_decimal(value):
+    """Convert a float, Fraction, Decimal or numeric string to Decimal"""
+    if isinstance(value, Decimal):
+        return value
+    if isinstance(value, Fraction):
+        return Decimal(value.numerator) / Decimal(value.denominator)
+    if isinstance(value, float):
+        # Use the shortest repr so 0.1 stays 0.1 rather than its binary expansion
+        return Decimal(repr(value))
+    if '/' in value:
+        return to_decimal(Fraction(value))
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f"Invalid number: {value}")
+
+def parse_number(text, mode='float', digits=DEFAULT_DECIMAL_DIGITS):
+    """Parse display text as a number for the given precision mode"""
+    if mode == 'fraction':
+        return Fraction(text)
+    if mode == 'decimal':
+        with localcontext() as ctx:
+            ctx.prec = digits
+            return +to_decimal(text)
+    try:
+        value = float(text)
+    except ValueError:
+        # Fractions such as "1/3" left on the display by fraction mode
+        return float(Fraction(text))
+    if math.isinf(value) and 'inf' not in text.lower():
+        # Beyond float range, keep the value exact instead
+        return parse_number(text, 'decimal', digits)
+    return value
+
+def needs_promotion(operation, a, b, result):
+    """Whether a float result overflowed or underflowed and must be redone exactly"""
+    if math.isinf(result):
+        return True
+    if result == 0:
+        # A zero factor gives an exact zero; only a nonzero product or quotient underflows
+        if operation == '×':
+            return a != 0 and b != 0
+        return a != 0 and operation == '÷'
+    return abs(result) < sys.float_info.min
+
+def apply_operation(operation, a, b, mode='float', digits=DEFAULT_DECIMAL_DIGITS):
+    """Apply a binary operation, promoting float results to Decimal only when needed"""
+    func = OPERATIONS[operation]
+    if mode == 'float' and type(a) is float and type(b) is float:
+        result = func(a, b)
+        if not needs_promotion(operation, a, b, result):
+            return result
+    if mode == 'fraction':
+        return func(Fraction(a), Fraction(b))
+    with localcontext() as ctx:
+        ctx.prec = digits
+        return func(to_decimal(a), to_decimal(b))
+
+def format_number(value, digits=DEFAULT_DECIMAL_DIGITS):
+    """Format a result for the display"""
+    if isinstance(value, float):
+        if value.is_integer():
+            return str(int(value))
+        return f"{value:.8f}".rstrip('0').rstrip('.')
+    if isinstance(value, Fraction):
+        if value.denominator == 1:
+            return str(value.numerator)
+        return f"{value.numerator}/{value.denominator}"
+    # Normalized at the mode's precision, not the 28 digits of the default context
+    with localcontext() as ctx:
+        ctx.prec = digits
+        value = value.normalize()
+    if value.is_zero():
+        return "0"
+    if abs(value.adjusted()) < digits:
+        return format(value, 'f')
+    return str(value)
@@ -0,0 +1,196 @@
+import os
+import json
+import time
+import sqlite3
+from datetime import datetime, timezone
+
+NS_PER_SECOND = 1_000_000_000
+
+# Seconds after its end before a window is cached. Lines held by the export
+# circuit breaker during an InfluxDB outage are written late with their
+# original timestamps, so this must outlast the longest outage the breaker
+# is expected to buffer through, not just the normal flush delay.
+DEFAULT_SETTLE_SECONDS = 2 * 24 * 60 * 60
+
+# Fields kept from each query row; everything else in the CSV is dropped
+RECORD_FIELDS = ('_time', '_field', '_value', 'operation')
+
+def ns_to_rfc3339(ns):
+    """Format epoch nanoseconds as an RFC3339 timestamp for Flux"""
+    seconds, fraction = divmod(ns, NS_PER_SECOND)
+    base = datetime.fromtimestamp(seconds, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S')
+    return f"{base}.{fraction:09d}Z"
+
+def rfc3339_to_ns(value):
+    """Convert an RFC3339 timestamp with up to nanosecond precision to epoch nanoseconds"""
+    value = value.replace('Z', '+00:00')
+    fraction = 0
+    if '.' in value:
+        base, rest = value.split('.', 1)
+        digits = rest[:len(rest) - 6]
+        fraction = int(digits.ljust(9, '0')[:9])
+        value = base + rest[len(digits):]
+    return int(datetime.fromisoformat(value).timestamp()) * NS_PER_SECOND + fraction
+
+class QueryCache:
+    """On-disk cache of query results, split into fixed time windows.
+
+    Historical data is immutable, so a window that ended more than `settle`
+    seconds ago is stored in SQLite once fetched and served locally from then
+    on, until `invalidate()` drops it (after a delete, for example). Windows that are missing or still receiving points are fetched from
+    InfluxDB, with adjacent windows combined into a single range query. When
+    the cache grows beyond `max_bytes`, the least recently used windows are
+    evicted.
+    """
+
+    def __init__(self, path='.query_cache.db', window_seconds=24 * 60 * 60,
+                 max_bytes=256 * 1024 * 1024, settle=DEFAULT_SETTLE_SECONDS):
+        self.path = path
+        self.window_ns = window_seconds * NS_PER_SECOND
+        self.max_bytes = max_bytes
+        self.settle_ns = int(settle * NS_PER_SECOND)
+        self.hits = 0
+        self.misses = 0
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('''
+        CREATE TABLE IF NOT EXISTS segments (
+            bucket TEXT,
+            measurement TEXT,
+            window_start INTEGER,
+            window_end INTEGER,
+            last_used REAL,
+            size INTEGER,
+            records TEXT,
+            PRIMARY KEY (bucket, measurement, window_start, window_end)
+        )
+        ''')
+        self.conn.commit()
+
+    @classmethod
+    def from_env(cls, path='.query_cache.db', **kwargs):
+        """Create a cache whose settle delay comes from CALCULATOR_QUERY_SETTLE_SECONDS"""
+        settle = os.environ.get("CALCULATOR_QUERY_SETTLE_SECONDS")
+        if settle:
+            kwargs.setdefault('settle', float(settle))
+        return cls(path, **kwargs)
+
+    def close(self):
+        self.conn.close()
+
+    def windows(self, start_ns, stop_ns):
+        """Split [start_ns, stop_ns) into windows aligned to the window size"""
+        window = start_ns - start_ns % self.window_ns
+        while window < stop_ns:
+            yield window, window + self.window_ns
+            window += self.window_ns
+
+    def load(self, bucket, measurement, window_start, window_end):
+        """Return cached records for a window, or None if it is not cached"""
+        row = self.conn.execute(
+            'SELECT records FROM segments WHERE bucket = ? AND measurement = ? '
+            'AND window_start = ? AND window_end = ?',
+            (bucket, measurement, window_start, window_end)
+        ).fetchone()
+        if row is None:
+            return None
+        self.conn.execute(
+            'UPDATE segments SET last_used = ? WHERE bucket = ? AND measurement = ? '
+            'AND window_start = ? AND window_end = ?',
+            (time.time(), bucket, measurement, window_start, window_end)
+        )
+        return json.loads(row[0])
+
+    def store(self, bucket, measurement, window_start, window_end, records):
+        payload = json.dumps(records)
+        self.conn.execute(
+            'INSERT OR REPLACE INTO segments VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (bucket, measurement, window_start, window_end, time.time(), len(payload), payload)
+        )
+
+    def invalidate(self, bucket, start_ns, stop_ns):
+        """Drop cached windows of a bucket that overlap [start_ns, stop_ns); return how many"""
+        cursor = self.conn.execute(
+            'DELETE FROM segments WHERE bucket = ? AND window_start < ? AND window_end > ?',
+            (bucket, stop_ns, start_ns)
+        )
+        self.conn.commit()
+        return cursor.rowcount
+
+    def evict(self):
+        """Delete least recently used windows until the cache fits in max_bytes"""
+        total = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM segments').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self.conn.execute(
+            'SELECT rowid, size FROM segments ORDER BY last_used'
+        ).fetchall()
+        for rowid, size in rows:
+            if total <= self.max_bytes:
+                break
+            self.conn.execute('DELETE FROM segments WHERE rowid = ?', (rowid,))
+            total -= size
+
+    def stats(self):
+        count, total = self.conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM segments'
+        ).fetchone()
+        return {'hits': self.hits, 'misses': self.misses, 'windows': count, 'bytes': total}
+
+    async def get_records(self, client, bucket, measurement, start_ns, stop_ns, parse_records):
+        """Return all records in [start_ns, stop_ns), newest first.
+
+        `parse_records(text)` turns a CSV query response into record dicts
+        with a '_time' key, and `client` is an AsyncInfluxDBClient used for
+        the windows that cannot be served from the cache.
+        """
+        now = time.time_ns()
+        records = []
+        missing = []
+        for window_start, window_end in self.windows(start_ns, stop_ns):
+            cached = self.load(bucket, measurement, window_start, window_end)
+            if cached is not None:
+                self.hits += 1
+                records.extend(cached)
+            else:
+                self.misses += 1
+                missing.append((window_start, window_end))
+
+        # Combine adjacent missing windows into one range query each
+        runs = []
+        for window_start, window_end in missing:
+            if runs and runs[-1][-1][1] == window_start:
+                runs[-1].append((window_start, window_end))
+            else:
+                runs.append([(window_start, window_end)])
+        queries = [range_query(bucket, measurement, run[0][0], run[-1][1]) for run in runs]
+        responses = await client.query_many(queries)
+
+        for run, response in zip(runs, responses):
+            if isinstance(response, Exception):
+                raise response
+            by_window = {window: [] for window in run}
+            for record in parse_records(response):
+                record = {k: record.get(k, '') for k in RECORD_FIELDS}
+                ns = rfc3339_to_ns(record['_time'])
+                window_start = ns - ns % self.window_ns
+                by_window[(window_start, window_start + self.window_ns)].append(record)
+            for (window_start, window_end), window_records in by_window.items():
+                records.extend(window_records)
+                # Only windows that can no longer change are kept
+                if window_end <= now - self.settle_ns:
+                    self.store(bucket, measurement, window_start, window_end, window_records)
+
+        self.evict()
+        self.conn.commit()
+
+        records = [r for r in records if start_ns <= rfc3339_to_ns(r['_time']) < stop_ns]
+        records.sort(key=lambda r: rfc3339_to_ns(r['_time']), reverse=True)
+        return records
+
+def range_query(bucket, measurement, start_ns, stop_ns):
+    """Flux query for one measurement over an absolute time range"""
+    return f'''
+    from(bucket: "{bucket}")
+      |> range(start: time(v: "{ns_to_rfc3339(start_ns)}"), stop: time(v: "{ns_to_rfc3339(stop_ns)}"))
+      |> filter(fn: (r) => r["_measurement"] == "{measurement}")
+    '''
@@ -1,8 +1,16 @@
-import requests
+import io
+import sys
+import csv
 import json
+import time
+import asyncio
+import argparse
 from datetime import datetime, timedelta
 import os
 from dotenv import load_dotenv
+from influxdb_async import AsyncInfluxDBClient, InfluxDBError
+from query_cache import QueryCache, rfc3339_to_ns
+from create_bucket import RAW_RETENTION_SECONDS, rollup_bucket_name, rollup_measurement
 
 def load_influxdb_settings():
     """Load InfluxDB settings from environment variables"""
@@ -45,8 +53,9 @@ def format_result(result):
         return result
 
 def query_calculator_operations():
-    settings = load_influxdb_settings()
-    
+    asyncio.run(query_calculator_operations_async())
+
+async def query_calculator_operations_async():
     # Prepare the Flux query
     flux_query = '''
     from(bucket: "calculator_logs")
@@ -59,77 +68,68 @@ def query_calculator_operations():
         |> yield(name: "results")
     '''
     
-    # Prepare the request
-    url = f"{settings['url']}/api/v2/query"
-    headers = {
-        'Authorization': f"Token {settings['token']}",
-        'Content-Type': 'application/json',
-        'Accept': 'application/csv'
-    }
-    params = {
-        'org': settings['org']
-    }
-    data = {
-        'query': flux_query,
-        'type': 'flux'
-    }
+    try:
+        async with AsyncInfluxDBClient.from_env() as client:
+            text = await client.query(flux_query)
+    except InfluxDBError as e:
+        print(f"Error querying InfluxDB: {e.status}")
+        print(e.text)
+        return
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return
     
     try:
-        response = requests.post(url, json=data, headers=headers, params=params)
-        if response.status_code == 200:
-            print("\nRaw Response:")
-            print(response.text)
-            print("\nRecent Calculator Operations:")
-            print("-" * 100)
-            print(f"{'Timestamp':<20} {'Operation':<30} {'Result':<20}")
-            print("-" * 100)
-            
-            # Parse CSV response
-            lines = response.text.split('\n')
-            data_lines = [line for line in lines if line and not line.startswith('#')]
-            
-            if len(data_lines) < 2:  # No data if less than header + 1 row
-                print("No calculator operations found in the last 24 hours.")
-                return
-                
-            # Get header line to find column positions
-            header = data_lines[0].split(',')
-            print("\nHeader columns:", header)
-            
-            try:
-                time_index = header.index('_time')
-                operation_index = header.index('operation')
-                value_index = header.index('_value')
-                print(f"\nIndices - Time: {time_index}, Operation: {operation_index}, Value: {value_index}")
-            except ValueError as e:
-                print(f"\nError finding column: {e}")
-                return
+        print("\nRaw Response:")
+        print(text)
+        print("\nRecent Calculator Operations:")
+        print("-" * 100)
+        print(f"{'Timestamp':<20} {'Operation':<30} {'Result':<20}")
+        print("-" * 100)
+        
+        # Parse CSV response
+        lines = text.split('\n')
+        data_lines = [line for line in lines if line and not line.startswith('#')]
+        
+        if len(data_lines) < 2:  # No data if less than header + 1 row
+            print("No calculator operations found in the last 24 hours.")
+            return
             
-            # Process data lines
-            records_found = 0
-            for line in data_lines[1:]:
-                parts = line.split(',')
-                print(f"\nProcessing line: {parts}")
-                if len(parts) <= max(time_index, operation_index, value_index):
-                    print(f"Skipping line - not enough parts ({len(parts)} <= {max(time_index, operation_index, value_index)})")
-                    continue
-                    
-                timestamp = datetime.fromisoformat(parts[time_index].replace('Z', '+00:00'))
-                operation = parts[operation_index]
-                result = parts[value_index]
+        # Get header line to find column positions
+        header = data_lines[0].split(',')
+        print("\nHeader columns:", header)
+        
+        try:
+            time_index = header.index('_time')
+            operation_index = header.index('operation')
+            value_index = header.index('_value')
+            print(f"\nIndices - Time: {time_index}, Operation: {operation_index}, Value: {value_index}")
+        except ValueError as e:
+            print(f"\nError finding column: {e}")
+            return
+        
+        # Process data lines
+        records_found = 0
+        for line in data_lines[1:]:
+            parts = line.split(',')
+            print(f"\nProcessing line: {parts}")
+            if len(parts) <= max(time_index, operation_index, value_index):
+                print(f"Skipping line - not enough parts ({len(parts)} <= {max(time_index, operation_index, value_index)})")
+                continue
                 
-                # Format timestamp to show only local time
-                local_time = timestamp.astimezone().strftime('%H:%M:%S')
-                formatted_operation = format_operation(operation)
-                formatted_result = format_result(result)
-                print(f"{local_time:<20} {formatted_operation:<30} {formatted_result:<20}")
-                records_found += 1
+            timestamp = datetime.fromisoformat(parts[time_index].replace('Z', '+00:00'))
+            operation = parts[operation_index]
+            result = parts[value_index]
             
-            print("-" * 100)
-            print(f"\nTotal non-Clear operations found: {records_found}")
-        else:
-            print(f"Error querying InfluxDB: {response.status_code}")
-            print(response.text)
+            # Format timestamp to show only local time
+            local_time = timestamp.astimezone().strftime('%H:%M:%S')
+            formatted_operation = format_operation(operation)
+            formatted_result = format_result(result)
+            print(f"{local_time:<20} {formatted_operation:<30} {formatted_result:<20}")
+            records_found += 1
+        
+        print("-" * 100)
+        print(f"\nTotal non-Clear operations found: {records_found}")
     
     except Exception as e:
         print(f"Error: {str(e)}")
@@ -146,92 +146,361 @@ def clean_operation(operation):
         return f"{num1} {op} {num2}"
     return operation
 
-def query_calculator_data():
-    # Load environment variables
-    load_dotenv()
-    
-    # Get InfluxDB settings from environment variables
-    url = os.getenv('INFLUXDB_URL', 'http://localhost:8086')
-    token = os.getenv('INFLUXDB_TOKEN')
-    org = os.getenv('INFLUXDB_ORG', 'calculator')
-    bucket = os.getenv('INFLUXDB_BUCKET', 'calculator_logs')
-    
-    print(f"Querying InfluxDB for all calculator operations...")
-    print(f"URL: {url}")
-    print(f"Organization: {org}")
-    print(f"Bucket: {bucket}")
+def print_calculator_data(text):
+    """Print calculator operations from an annotated CSV query response"""
+    print_calculator_records(list(iter_csv_records(text)))
+
+def print_calculator_records(records):
+    """Print calculator operation records, as parsed by iter_csv_records"""
+    print("\nCalculator operations:")
+    print("=" * 100)
     
-    # Prepare the Flux query - no limit, show all records
-    query = f'''
+    if records:
+        record_count = 0
+        
+        # Print column headers
+        print(f"{'Timestamp':<25} {'Operation':<30} {'Result':<20}")
+        print("-" * 100)
+        
+        for record in records:
+            try:
+                time_str = record['_time']
+                result = record['_value']
+                
+                # Clean up and format the operation
+                operation = clean_operation(record.get('operation', ''))
+                
+                print(f"{time_str:<25} {operation:<30} {result:<20}")
+                record_count += 1
+            except Exception as e:
+                print(f"Error processing row: {e}")
+        
+        print("-" * 100)
+        print(f"\nTotal records found: {record_count}")
+    else:
+        print("No calculator operations found.")
+
+def calculator_data_query(bucket):
+    """Flux query for all calculator operations in a bucket - no limit, show all records"""
+    return f'''
     from(bucket: "{bucket}")
       |> range(start: -365d)
       |> filter(fn: (r) => r["_measurement"] == "calculator_operation")
       |> sort(columns: ["_time"], desc: true)
     '''
+
+async def query_calculator_data_async(buckets=None, concurrency=8, cache=None, days=365):
+    async with AsyncInfluxDBClient.from_env(concurrency=concurrency) as client:
+        buckets = buckets or [client.bucket]
+        
+        print(f"Querying InfluxDB for all calculator operations...")
+        print(f"URL: {client.url}")
+        print(f"Organization: {client.org}")
+        print(f"Bucket: {', '.join(buckets)}")
+        
+        # Buckets are queried in parallel, at most `concurrency` at a time
+        if cache:
+            stop = time.time_ns()
+            start = stop - days * 24 * 60 * 60 * 1_000_000_000
+            responses = await asyncio.gather(*(
+                cache.get_records(client, b, 'calculator_operation', start, stop, iter_csv_records)
+                for b in buckets
+            ), return_exceptions=True)
+        else:
+            responses = await client.query_many([calculator_data_query(b) for b in buckets])
     
-    headers = {
-        'Authorization': f'Token {token}',
-        'Content-Type': 'application/json'
-    }
+    for bucket, response in zip(buckets, responses):
+        if len(buckets) > 1:
+            print(f"\n### Bucket: {bucket}")
+        if isinstance(response, InfluxDBError):
+            print(f"Error querying InfluxDB: {response.status}")
+            print(response.text)
+        elif isinstance(response, Exception):
+            print(f"Error querying InfluxDB: {str(response)}")
+        elif cache:
+            print_calculator_records(response)
+        else:
+            print_calculator_data(response)
+    
+    if cache:
+        stats = cache.stats()
+        print(f"\nCache: {stats['hits']} windows from cache, {stats['misses']} fetched "
+              f"({stats['windows']} windows, {stats['bytes'] / 1024:.0f} KB on disk)")
+
+def query_calculator_data(buckets=None, concurrency=8, cache_file='.query_cache.db',
+                          cache_size_mb=256):
+    """Query all calculator operations, serving settled days from the local cache.
     
+    Pass cache_file=None to always query InfluxDB for the full range.
+    """
+    cache = QueryCache.from_env(cache_file, max_bytes=cache_size_mb * 1024 * 1024) if cache_file else None
     try:
-        # Send the query to InfluxDB
-        response = requests.post(
-            f"{url}/api/v2/query?org={org}",
-            headers=headers,
-            json={"query": query}
-        )
-        
-        if response.status_code == 200:
-            print("\nCalculator operations:")
-            print("=" * 100)
-            
-            # Parse the CSV response
-            lines = response.text.strip().split('\n')
-            if len(lines) > 1:  # Check if we have data (header + at least one row)
-                headers = lines[0].split(',')
-                record_count = 0
-                
-                # Print column headers
-                print(f"{'Timestamp':<25} {'Operation':<30} {'Result':<20}")
-                print("-" * 100)
-                
-                for line in lines[1:]:
-                    values = line.split(',')
-                    if len(values) >= len(headers):
-                        try:
-                            # Get indices for the columns we need
-                            time_idx = headers.index('_time')
-                            value_idx = headers.index('_value')
-                            operation_str = values[-1]  # Operation is always the last column
-                            
-                            # Parse the timestamp
-                            time_str = values[time_idx]
-                            #dt = datetime.fromisoformat(time_str.replace('Z', '+00:00'))
-                            #formatted_time = dt.strftime('%Y-%m-%d %H:%M:%S')
-                            
-                            # Get the result value
-                            result = values[value_idx]
-                            
-                            # Clean up and format the operation
-                            operation = clean_operation(operation_str)
-                            
-                            #print(f"{formatted_time:<25} {operation:<30} {result:<20}")
-                            print(f"{time_str:<25} {operation:<30} {result:<20}")
-                            record_count += 1
-                        except Exception as e:
-                            print(f"Error processing row: {e}")
-                
-                print("-" * 100)
-                print(f"\nTotal records found: {record_count}")
+        asyncio.run(query_calculator_data_async(buckets, concurrency, cache))
+    except Exception as e:
+        print(f"Error querying InfluxDB: {str(e)}")
+    finally:
+        if cache:
+            cache.close()
+
+def summary_query(bucket, days, every, rollup=False):
+    """Flux query for count/sum/min/max of results per `every` window over the last `days`"""
+    if rollup:
+        # Hourly rollups are combined into larger windows
+        data = f'''from(bucket: "{bucket}")
+      |> range(start: -{days}d)
+      |> filter(fn: (r) => r["_measurement"] == "{rollup_measurement('1h')}")'''
+        count = f'data |> filter(fn: (r) => r["_field"] == "count" or r["_field"] == "sum") |> aggregateWindow(every: {every}, fn: sum, createEmpty: false)'
+        low = f'data |> filter(fn: (r) => r["_field"] == "min") |> aggregateWindow(every: {every}, fn: min, createEmpty: false)'
+        high = f'data |> filter(fn: (r) => r["_field"] == "max") |> aggregateWindow(every: {every}, fn: max, createEmpty: false)'
+        tables = [count, low, high]
+    else:
+        data = f'''from(bucket: "{bucket}")
+      |> range(start: -{days}d)
+      |> filter(fn: (r) => r["_measurement"] == "calculator_operation" and r["_field"] == "result")
+      |> group()'''
+        tables = [
+            f'data |> aggregateWindow(every: {every}, fn: {fn}, createEmpty: false) |> toFloat() |> set(key: "_field", value: "{fn}")'
+            for fn in ('count', 'sum', 'min', 'max')
+        ]
+    tables = ',\n        '.join(tables)
+    return f'''
+    data = {data}
+    
+    union(tables: [
+        {tables}
+    ])
+      |> pivot(rowKey: ["_time"], columnKey: ["_field"], valueColumn: "_value")
+      |> group()
+      |> sort(columns: ["_time"])
+    '''
+
+def print_calculator_summary(records):
+    """Print per-window operation counts and result statistics"""
+    print("\nCalculator operation summary:")
+    print("=" * 100)
+    if not records:
+        print("No calculator operations found.")
+        return
+    
+    print(f"{'Window end':<25} {'Count':>10} {'Mean':>16} {'Min':>16} {'Max':>16}")
+    print("-" * 100)
+    total = 0
+    for record in records:
+        count = float(record.get('count') or 0)
+        mean = float(record.get('sum') or 0) / count if count else 0
+        print(f"{record['_time']:<25} {count:>10.0f} {format_result(str(mean)):>16} "
+              f"{format_result(record.get('min', '')):>16} {format_result(record.get('max', '')):>16}")
+        total += count
+    print("-" * 100)
+    print(f"\nTotal operations: {total:.0f}")
+
+async def query_calculator_summary_async(days=365, every='1d'):
+    """Summarize the last `days` of operations, reading rollups when raw data has expired.
+    
+    Ranges longer than the raw bucket's retention are served from the hourly
+    rollups written by the tasks that `create_bucket.py --tiered` provisions,
+    so a year-long report reads thousands of rows instead of every point.
+    """
+    async with AsyncInfluxDBClient.from_env() as client:
+        bucket = client.bucket
+        rollup = False
+        if days * 24 * 60 * 60 > RAW_RETENTION_SECONDS:
+            if await client.find_bucket(rollup_bucket_name(client.bucket)):
+                bucket, rollup = rollup_bucket_name(client.bucket), True
             else:
-                print("No calculator operations found.")
-        else:
-            print(f"Error querying InfluxDB: {response.status_code}")
-            print(response.text)
-            
+                print(f"Rollup bucket {rollup_bucket_name(client.bucket)} not found; "
+                      f"summarizing raw points (see create_bucket.py --tiered)")
+        
+        print(f"Summarizing the last {days} days per {every} from {bucket}...")
+        text = await client.query(summary_query(bucket, days, every, rollup))
+    
+    print_calculator_summary(list(iter_csv_records(text)))
+
+def query_calculator_summary(days=365, every='1d'):
+    try:
+        asyncio.run(query_calculator_summary_async(days, every))
+    except InfluxDBError as e:
+        print(f"Error querying InfluxDB: {e.status}")
+        print(e.text)
     except Exception as e:
         print(f"Error querying InfluxDB: {str(e)}")
 
+def iter_csv_records(text):
+    """Yield each data row of a CSV query response as a dict keyed by column name"""
+    header = None
+    for row in csv.reader(io.StringIO(text)):
+        if not row or row[0].startswith('#'):
+            # Blank lines separate tables, each with its own header
+            header = None
+            continue
+        if header is None:
+            header = row
+            continue
+        yield dict(zip(header, row))
+
+async def iter_query_records(client, flux):
+    """Yield each data row of a query as iter_csv_records does, while the response streams in"""
+    header = None
+    async for line in client.query_lines(flux):
+        row = next(csv.reader([line]), None)
+        if not row or row[0].startswith('#'):
+            header = None
+            continue
+        if header is None:
+            header = row
+            continue
+        yield dict(zip(header, row))
+
+def stats_query(bucket, days):
+    """Flux query for every numeric result of the last `days`"""
+    return f'''
+    from(bucket: "{bucket}")
+      |> range(start: -{days}d)
+      |> filter(fn: (r) => r["_measurement"] == "calculator_operation" and r["_field"] == "result")
+    '''
+
+async def query_calculator_stats_async(days=365):
+    """Print streaming statistics of the results of the last `days`, one record at a time"""
+    from streaming_stats import StreamingStats, print_stats
+    stats = StreamingStats()
+    async with AsyncInfluxDBClient.from_env() as client:
+        print(f"Computing statistics of the last {days} days from {client.bucket}...")
+        async for record in iter_query_records(client, stats_query(client.bucket, days)):
+            if record.get('_field') == 'result':
+                stats.add_text(record.get('_value'))
+    print_stats(stats)
+
+def query_calculator_stats(days=365):
+    try:
+        asyncio.run(query_calculator_stats_async(days))
+    except InfluxDBError as e:
+        print(f"Error querying InfluxDB: {e.status}")
+        print(e.text)
+    except Exception as e:
+        print(f"Error querying InfluxDB: {str(e)}")
+
+def load_checkpoint(path, source):
+    """Return the last seen _time saved by follow mode for the same source, or None
+
+    `source` identifies what is followed (server, organization and bucket);
+    a checkpoint saved while following anything else is ignored.
+    """
+    try:
+        with open(path, 'r') as f:
+            checkpoint = json.load(f)
+        if checkpoint.get('source') != source:
+            return None
+        return checkpoint.get('last_time')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def save_checkpoint(path, source, last_time):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({'source': source, 'last_time': last_time}, f)
+    os.replace(tmp_path, path)
+
+def follow_query(bucket, since):
+    """Flux query for calculator operations newer than `since`"""
+    if since.startswith('-'):
+        return f'''
+    from(bucket: "{bucket}")
+      |> range(start: {since})
+      |> filter(fn: (r) => r["_measurement"] == "calculator_operation")
+      |> sort(columns: ["_time"])
+    '''
+    return f'''
+    from(bucket: "{bucket}")
+      |> range(start: time(v: "{since}"))
+      |> filter(fn: (r) => r["_measurement"] == "calculator_operation")
+      |> filter(fn: (r) => r._time > time(v: "{since}"))
+      |> sort(columns: ["_time"])
+    '''
+
+async def follow_calculator_operations_async(bucket=None, interval=5.0, output=None,
+                                             checkpoint='.query_checkpoint.json', since='-1h'):
+    """Poll for operations newer than the last one seen and stream them as they arrive.
+    
+    The last seen _time is saved to the checkpoint file after every poll, so a
+    restarted follower continues where it stopped. The checkpoint records the
+    server, organization and bucket, and only resumes the same ones. Without
+    a matching checkpoint it starts from `since` (a relative duration such
+    as -1h).
+    """
+    out = open(output, 'a') if output else sys.stdout
+    
+    try:
+        async with AsyncInfluxDBClient.from_env() as client:
+            bucket = bucket or client.bucket
+            source = {'url': client.url, 'org': client.org, 'bucket': bucket}
+            last_time = load_checkpoint(checkpoint, source) or since
+            print(f"Following calculator operations in {bucket} every {interval}s "
+                  f"(from {last_time})...", file=sys.stderr)
+            while True:
+                try:
+                    text = await client.query(follow_query(bucket, last_time))
+                except Exception as e:
+                    print(f"Error querying InfluxDB: {str(e)}", file=sys.stderr)
+                    await asyncio.sleep(interval)
+                    continue
+                
+                records = sorted(iter_csv_records(text), key=lambda r: rfc3339_to_ns(r['_time']))
+                for record in records:
+                    operation = clean_operation(record.get('operation', ''))
+                    out.write(f"{record['_time']:<32} {operation:<30} {record['_value']:<20}\n")
+                if records:
+                    out.flush()
+                    last_time = records[-1]['_time']
+                    save_checkpoint(checkpoint, source, last_time)
+                
+                await asyncio.sleep(interval)
+    finally:
+        if output:
+            out.close()
+
+def follow_calculator_operations(bucket=None, interval=5.0, output=None,
+                                 checkpoint='.query_checkpoint.json', since='-1h'):
+    try:
+        asyncio.run(follow_calculator_operations_async(bucket, interval, output, checkpoint, since))
+    except KeyboardInterrupt:
+        print("\nStopped following.", file=sys.stderr)
+
 if __name__ == "__main__":
-    query_calculator_data() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Query calculator operations from InfluxDB")
+    parser.add_argument('buckets', nargs='*',
+                        help="Buckets to query in parallel (default: INFLUXDB_BUCKET)")
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help="Maximum number of queries in flight at once")
+    parser.add_argument('--follow', action='store_true',
+                        help="Stream new operations as they arrive instead of querying once")
+    parser.add_argument('--interval', type=float, default=5.0,
+                        help="Seconds between polls in follow mode")
+    parser.add_argument('--output', help="File to append followed operations to (default: stdout)")
+    parser.add_argument('--checkpoint', default='.query_checkpoint.json',
+                        help="File storing the last seen _time in follow mode")
+    parser.add_argument('--since', default='-1h',
+                        help="Where follow mode starts when there is no checkpoint")
+    parser.add_argument('--cache-file', default='.query_cache.db',
+                        help="SQLite file caching settled days of query results")
+    parser.add_argument('--cache-size-mb', type=int, default=256,
+                        help="Size above which least recently used cached days are evicted")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Always query InfluxDB for the full range")
+    parser.add_argument('--summary', action='store_true',
+                        help="Print counts and result statistics per window instead of every operation")
+    parser.add_argument('--stats', action='store_true',
+                        help="Print count, mean, variance and quantiles of all results, streamed")
+    parser.add_argument('--days', type=int, default=365, help="Days covered by --summary and --stats")
+    parser.add_argument('--every', default='1d', help="Window size for --summary, e.g. 1h or 1d")
+    args = parser.parse_args()
+    
+    if args.summary:
+        query_calculator_summary(args.days, args.every)
+    elif args.stats:
+        query_calculator_stats(args.days)
+    elif args.follow:
+        follow_calculator_operations(args.buckets[0] if args.buckets else None, args.interval,
+                                     args.output, args.checkpoint, args.since)
+    else:
+        query_calculator_data(args.buckets, args.concurrency,
+                              None if args.no_cache else args.cache_file, args.cache_size_mb)
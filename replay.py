@@ -0,0 +1,112 @@
+import sys
+import time
+import argparse
+from collections import deque
+from calculator_engine import CalculatorEngine
+from session_journal import (read_journal, RESET, KEY, EXPRESSION, PRECISION, SCIENTIFIC,
+                             RECALL, LOG)
+
+class ReplayEngine(CalculatorEngine):
+    """Headless engine for replays, collecting the log entries it produces"""
+
+    def __init__(self, precision_mode=None, decimal_digits=None):
+        super().__init__(precision_mode, decimal_digits)
+        self.produced = deque()
+
+    def add_to_log(self, operation, result):
+        self.produced.append(self.make_log_entry(operation, result))
+
+class ReplayReport:
+    def __init__(self):
+        self.events = 0
+        self.sessions = 0
+        self.checked = 0
+        self.mismatches = []
+        self.elapsed = 0.0
+
+    def mismatch(self, line, expected, actual):
+        self.mismatches.append((line, expected, actual))
+
+    def print_summary(self, limit=20):
+        rate = self.events / self.elapsed if self.elapsed else 0
+        print(f"Replayed {self.events} events in {self.sessions} sessions "
+              f"in {self.elapsed:.3f} s ({rate:,.0f} events/s)")
+        print(f"Checked {self.checked} log entries, {len(self.mismatches)} mismatches")
+        for line, expected, actual in self.mismatches[:limit]:
+            print(f"  line {line}: expected {expected}, got {actual}")
+        if len(self.mismatches) > limit:
+            print(f"  ... {len(self.mismatches) - limit} more")
+
+def describe(entry):
+    return f"{entry['operation']} = {entry['result']}" if entry else "nothing"
+
+def replay(path, realtime=False, speed=1.0, stop_on_mismatch=False):
+    """Re-drive the calculator engine with a journal, checking each recorded log entry.
+
+    By default events are replayed as fast as possible; with `realtime` they
+    keep their recorded spacing, divided by `speed`.
+    """
+    report = ReplayReport()
+    engine = None
+    started = time.perf_counter()
+
+    def check_leftovers(line):
+        while engine is not None and engine.produced:
+            report.mismatch(line, "nothing", describe(engine.produced.popleft()))
+
+    for line, offset, kind, fields in read_journal(path):
+        if realtime:
+            delay = offset / speed - (time.perf_counter() - started)
+            if delay > 0:
+                time.sleep(delay)
+        if kind == LOG:
+            if engine is None:
+                # Produced by an event in a segment that has been deleted
+                continue
+            report.checked += 1
+            expected = {'operation': fields[0], 'result': fields[1]}
+            actual = engine.produced.popleft() if engine.produced else None
+            if actual is None or (actual['operation'], actual['result']) != (fields[0], fields[1]):
+                report.mismatch(line, describe(expected), describe(actual))
+                if stop_on_mismatch:
+                    break
+            continue
+        # Entries of the previous event that the journal did not record
+        check_leftovers(line)
+        report.events += 1
+        if kind == RESET:
+            engine = ReplayEngine(fields[0], int(fields[1]))
+            report.sessions += 1
+            continue
+        if engine is None:
+            # A journal cut before its first reset starts from the defaults
+            engine = ReplayEngine()
+            report.sessions += 1
+        if kind == KEY:
+            engine.button_clicked(fields[0])
+        elif kind == EXPRESSION:
+            engine.evaluate_expression(fields[0])
+        elif kind == PRECISION:
+            engine.set_precision(fields[0])
+        elif kind == SCIENTIFIC:
+            engine.set_scientific_mode(fields[0] == '1')
+        elif kind == RECALL:
+            engine.recall_result(fields[0])
+        else:
+            raise ValueError(f"{path}:{line}: unknown journal record {kind!r}")
+    else:
+        check_leftovers('end')
+    report.elapsed = time.perf_counter() - started
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a calculator session journal and verify its results")
+    parser.add_argument('journal')
+    parser.add_argument('--realtime', action='store_true', help="Keep the recorded timing between events")
+    parser.add_argument('--speed', type=float, default=1.0, help="Speed-up factor for --realtime")
+    parser.add_argument('--stop-on-mismatch', action='store_true')
+    args = parser.parse_args()
+
+    report = replay(args.journal, args.realtime, args.speed, args.stop_on_mismatch)
+    report.print_summary()
+    sys.exit(1 if report.mismatches else 0)
@@ -0,0 +1,33 @@
+import math
+
+_HALF_SQRT2 = math.sqrt(2) / 2
+_HALF_SQRT3 = math.sqrt(3) / 2
+_SQRT3 = math.sqrt(3)
+
+# Exact sine and cosine at standard angles, so sin(180) is 0 rather than 1.2e-16
+EXACT_SIN = {
+    0: 0.0, 30: 0.5, 45: _HALF_SQRT2, 60: _HALF_SQRT3, 90: 1.0,
+    120: _HALF_SQRT3, 135: _HALF_SQRT2, 150: 0.5, 180: 0.0,
+    210: -0.5, 225: -_HALF_SQRT2, 240: -_HALF_SQRT3, 270: -1.0,
+    300: -_HALF_SQRT3, 315: -_HALF_SQRT2, 330: -0.5,
+}
+EXACT_COS = {angle: EXACT_SIN[(90 - angle) % 360] for angle in EXACT_SIN}
+# tan is undefined (None) at 90 and 270
+EXACT_TAN = {
+    0: 0.0, 30: _SQRT3 / 3, 45: 1.0, 60: _SQRT3, 90: None,
+    120: -_SQRT3, 135: -1.0, 150: -_SQRT3 / 3, 180: 0.0,
+    210: _SQRT3 / 3, 225: 1.0, 240: _SQRT3, 270: None,
+    300: -_SQRT3, 315: -1.0, 330: -_SQRT3 / 3,
+}
+
+EXACT_VALUES = {'sin': EXACT_SIN, 'cos': EXACT_COS, 'tan': EXACT_TAN}
+FUNCTIONS = {'sin': math.sin, 'cos': math.cos, 'tan': math.tan}
+
+def trig_degrees(func, angle):
+    """Return sin, cos or tan of an angle in degrees, or None where it is undefined"""
+    if float(angle).is_integer():
+        standard = int(angle) % 360
+        exact = EXACT_VALUES[func]
+        if standard in exact:
+            return exact[standard]
+    return FUNCTIONS[func](math.radians(angle))
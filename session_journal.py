@@ -0,0 +1,105 @@
+import re
+import time
+from log_segments import SegmentedLog, read_lines
+
+JOURNAL_HEADER = '#calculator-journal'
+JOURNAL_VERSION = 1
+
+# Record kinds: engine reset (precision, digits), key label, pasted
+# expression, precision change, scientific mode (1/0), recalled value, and
+# the log entry (operation, result) the session produced, used to verify
+# replays
+RESET, KEY, EXPRESSION, PRECISION, SCIENTIFIC, RECALL, LOG = 'r', 'k', 'e', 'p', 's', 'v', 'l'
+
+ESCAPED = re.compile(r'\\(.)')
+UNESCAPES = {'t': '\t', 'n': '\n'}
+
+def escape_field(text):
+    return str(text).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+
+def unescape_field(text):
+    return ESCAPED.sub(lambda m: UNESCAPES.get(m.group(1), m.group(1)), text) if '\\' in text else text
+
+class SessionJournal:
+    """Append-only journal of calculator input events.
+
+    Each line is the milliseconds since the previous record, a one-letter
+    kind and its tab-separated fields, e.g. `120\tk\t7`. Every session and
+    every segment of the journal starts with a header holding its wall-clock
+    start time. Besides the inputs that drive the engine, each log entry the
+    session produces is recorded, so `replay.py` can check a replay against
+    the original results. Use one journal file per calculator process; it is
+    rotated into compressed segments like the other logs, but none are ever
+    deleted, since a replay needs the whole session from its first reset.
+    """
+
+    def __init__(self, path, line_buffering=True):
+        self.path = path
+        self.log = SegmentedLog.from_env(path, keep=None, max_days=None, line_buffering=line_buffering)
+        self.write_header()
+
+    def write_header(self):
+        self.log.write(f"{JOURNAL_HEADER} {JOURNAL_VERSION} {time.time_ns() // 1000000}\n")
+        self.last = time.monotonic()
+
+    def write(self, kind, *fields):
+        # Timing stays readable once the segments before this one are deleted
+        if self.log.rotate_if_due():
+            self.write_header()
+        now = time.monotonic()
+        delta = int((now - self.last) * 1000)
+        # Carry the rounding over, so long sessions do not drift
+        self.last += delta / 1000
+        self.log.write('\t'.join((str(delta), kind) + tuple(escape_field(f) for f in fields)) + '\n')
+
+    def reset(self, precision_mode, decimal_digits):
+        self.write(RESET, precision_mode, decimal_digits)
+
+    def key(self, label):
+        self.write(KEY, label)
+
+    def expression(self, expression):
+        self.write(EXPRESSION, expression)
+
+    def precision(self, mode):
+        self.write(PRECISION, mode)
+
+    def scientific(self, enabled):
+        self.write(SCIENTIFIC, int(enabled))
+
+    def recall(self, value):
+        self.write(RECALL, value)
+
+    def log_entry(self, entry):
+        self.write(LOG, entry["operation"], entry["result"])
+
+    def flush(self):
+        self.log.flush()
+
+    def close(self):
+        self.log.close()
+
+def read_journal(path):
+    """Yield (line number, seconds since the first session started, kind, fields) for each record.
+
+    Rotated segments are read first, so line numbers count across the journal.
+    """
+    first_start = None
+    elapsed = 0.0
+    for number, line in enumerate(read_lines(path), 1):
+        line = line.rstrip('\n')
+        if not line:
+            continue
+        if line.startswith(JOURNAL_HEADER):
+            _, version, start_ms = line.split(' ')
+            if int(version) != JOURNAL_VERSION:
+                raise ValueError(f"{path}:{number}: unsupported journal version {version}")
+            start = int(start_ms) / 1000
+            if first_start is None:
+                first_start = start
+            # Later sessions and segments keep their offset from the first one
+            elapsed = max(elapsed, start - first_start)
+            continue
+        delta, kind, *fields = line.split('\t')
+        elapsed += int(delta) / 1000
+        yield number, elapsed, kind, [unescape_field(field) for field in fields]
@@ -0,0 +1,107 @@
+import itertools
+import tkinter as tk
+from streaming_stats import StreamingStats, format_stat
+
+# History entries summarized per idle step
+HISTORY_CHUNK = 10000
+
+class StatsPanel:
+    """Window for the statistics mode.
+
+    While it is open, the calculator adds every number entered and every
+    result to a StreamingStats, and the Session column shows the updated
+    count, mean, variance, min, max and quantiles after each press. The
+    History column summarizes the whole shared history, read in idle-time
+    chunks. Neither keeps the values themselves.
+    """
+
+    def __init__(self, calculator):
+        self.calculator = calculator
+        self.stats = StreamingStats()
+        self.history_stats = None
+        self.history_entries = None
+        self.refresh_scheduled = False
+
+        self.window = tk.Toplevel(calculator.root)
+        self.window.title("Statistics")
+        self.window.geometry("360x340")
+        self.window.configure(bg="#2b2b2b")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        table = tk.Frame(self.window, bg="#2b2b2b")
+        table.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        for column, title in enumerate(("", "Session", "History")):
+            tk.Label(table, text=title, bg="#2b2b2b", fg="#a5a5a5",
+                     font=("Arial", 11, "bold")).grid(row=0, column=column, sticky="e", padx=5)
+        self.session_labels = []
+        self.history_labels = []
+        for row, (label, _) in enumerate(self.stats.rows(), 1):
+            tk.Label(table, text=label, bg="#2b2b2b", fg="white",
+                     font=("Arial", 11)).grid(row=row, column=0, sticky="w", padx=5)
+            for column, labels in ((1, self.session_labels), (2, self.history_labels)):
+                value = tk.Label(table, bg="#2b2b2b", fg="#ff9500", font=("Arial", 11))
+                value.grid(row=row, column=column, sticky="e", padx=5)
+                labels.append(value)
+        table.grid_columnconfigure(1, weight=1)
+        table.grid_columnconfigure(2, weight=1)
+
+        buttons = tk.Frame(self.window, bg="#2b2b2b")
+        buttons.pack(fill=tk.X, padx=10, pady=5)
+        for text, command in (("Clear", self.clear), ("Summarize History", self.summarize_history)):
+            tk.Button(buttons, text=text, font=("Arial", 11), bg="#4b4b4b", fg="white",
+                      relief="flat", borderwidth=0, command=command).pack(side=tk.LEFT, padx=5,
+                                                                          expand=True, fill=tk.X)
+        self.status = tk.Label(self.window, anchor=tk.W, bg="#2b2b2b", fg="white")
+        self.status.pack(fill=tk.X, padx=10, pady=5)
+        self.render()
+
+    def close(self):
+        self.history_entries = None
+        self.window.destroy()
+        self.calculator.stats_panel = None
+
+    def add_value(self, text):
+        """Add an entered number or a result; anything that is not a number is skipped"""
+        self.stats.add_text(text)
+        self.schedule_refresh()
+
+    def clear(self):
+        self.stats = StreamingStats()
+        self.render()
+
+    def schedule_refresh(self):
+        """Show new values once the event loop is idle, coalescing rapid presses"""
+        if not self.refresh_scheduled:
+            self.refresh_scheduled = True
+            self.window.after_idle(self.render)
+
+    def render(self):
+        self.refresh_scheduled = False
+        for label, (_, value) in zip(self.session_labels, self.stats.rows()):
+            label.config(text=format_stat(value))
+        if self.history_stats is None:
+            history_rows = [(None, None)] * len(self.history_labels)
+        else:
+            history_rows = self.history_stats.rows()
+        for label, (_, value) in zip(self.history_labels, history_rows):
+            label.config(text="" if value is None else format_stat(value))
+
+    def summarize_history(self):
+        """Summarize the whole history from the start, a chunk per idle step"""
+        self.history_stats = StreamingStats()
+        self.history_entries = self.calculator.export_entries()
+        self.summarize_history_step(self.history_entries)
+
+    def summarize_history_step(self, entries):
+        if entries is not self.history_entries:
+            # Closed, or restarted by another click
+            return
+        chunk = list(itertools.islice(entries, HISTORY_CHUNK))
+        self.history_stats.add_entries(chunk)
+        if len(chunk) == HISTORY_CHUNK:
+            self.status.config(text=f"Summarizing history... {self.history_stats.count:,} results")
+            self.window.after(1, self.summarize_history_step, entries)
+        else:
+            self.history_entries = None
+            self.status.config(text=f"History: {self.history_stats.count:,} results")
+        self.render()
@@ -0,0 +1,184 @@
+import math
+import bisect
+import argparse
+from history_index import is_calculation, result_value
+
+# Quantiles estimated by default: median, 90th and 99th percentile
+DEFAULT_QUANTILES = (0.5, 0.9, 0.99)
+
+class P2Quantile:
+    """Running estimate of one quantile with the P² algorithm (Jain & Chlamtac).
+
+    Five markers track the minimum, the quantile, the maximum and two points
+    in between; each value moves them by at most one position, adjusting
+    their heights with a piecewise-parabolic fit. Memory and time per value
+    are constant. The first `exact` values are kept sorted and give exact
+    results; the markers start from them.
+    """
+
+    def __init__(self, p, exact=100):
+        self.p = p
+        self.exact = max(exact, 5)
+        self.values = []
+        self.heights = None
+        self.positions = None
+        self.desired = None
+        self.increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def start_markers(self):
+        values = self.values
+        last = len(values) - 1
+        self.desired = [last * f for f in self.increments]
+        positions = [round(d) for d in self.desired]
+        # Markers need distinct positions, in order
+        for i in (1, 2, 3):
+            positions[i] = min(max(positions[i], positions[i - 1] + 1), last - (4 - i))
+        self.positions = positions
+        self.heights = [values[n] for n in positions]
+        self.values = None
+
+    def add(self, x):
+        if self.values is not None:
+            bisect.insort(self.values, x)
+            if len(self.values) > self.exact:
+                self.start_markers()
+            return
+        q = self.heights
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+        n = self.positions
+        for i in range(k + 1, 5):
+            n[i] += 1
+        desired, increments = self.desired, self.increments
+        # Only the middle markers move; the end ones follow the extremes
+        for i in (1, 2, 3):
+            desired[i] += increments[i]
+            d = desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                height = self.parabolic(i, d)
+                if not q[i - 1] < height < q[i + 1]:
+                    height = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = height
+                n[i] += d
+
+    def parabolic(self, i, d):
+        q, n = self.heights, self.positions
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+
+    def value(self):
+        values = self.values
+        if values is None:
+            return self.heights[2]
+        if not values:
+            return math.nan
+        # Interpolated between the kept values
+        rank = self.p * (len(values) - 1)
+        low = int(rank)
+        high = min(low + 1, len(values) - 1)
+        return values[low] + (values[high] - values[low]) * (rank - low)
+
+class StreamingStats:
+    """Count, mean, variance, min, max and quantiles of a stream of numbers.
+
+    Mean and variance are updated with Welford's method, which stays
+    accurate over long streams; quantiles are P² estimates. Memory does not
+    grow with the number of values, so a stream of any length can be
+    summarized, one value at a time. NaN and infinite values are skipped.
+    """
+
+    def __init__(self, quantiles=DEFAULT_QUANTILES):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.quantiles = [P2Quantile(p) for p in quantiles]
+
+    def add(self, x):
+        if not math.isfinite(x):
+            return
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+        for quantile in self.quantiles:
+            quantile.add(x)
+
+    def add_text(self, text):
+        """Add a displayed or logged number; anything that is not one is skipped"""
+        if text:
+            self.add(result_value(text))
+
+    def add_entries(self, entries):
+        """Add the results of log entries, skipping clears and setting changes"""
+        for entry in entries:
+            if is_calculation(entry["operation"]):
+                self.add_text(entry["result"])
+
+    @property
+    def variance(self):
+        """Sample variance"""
+        return self.m2 / (self.count - 1) if self.count > 1 else math.nan
+
+    @property
+    def stddev(self):
+        return math.sqrt(self.variance) if self.count > 1 else math.nan
+
+    def rows(self):
+        """(label, value) pairs for display; values are NaN until defined"""
+        empty = self.count == 0
+        rows = [
+            ("Count", self.count),
+            ("Mean", math.nan if empty else self.mean),
+            ("Std dev", self.stddev),
+            ("Variance", self.variance),
+            ("Min", math.nan if empty else self.min),
+            ("Max", math.nan if empty else self.max),
+        ]
+        rows.extend((quantile_label(q.p), q.value()) for q in self.quantiles)
+        return rows
+
+def quantile_label(p):
+    return "Median" if p == 0.5 else f"P{p * 100:g}"
+
+def format_stat(value):
+    if isinstance(value, int):
+        return f"{value:,}"
+    return "-" if math.isnan(value) else f"{value:.10g}"
+
+def print_stats(stats):
+    for label, value in stats.rows():
+        print(f"{label:<10} {format_stat(value):>20}")
+
+def history_stats(store):
+    """Statistics of every result in a HistoryStore, archived entries included"""
+    stats = StreamingStats()
+    stats.add_entries(store.iter_entries())
+    return stats
+
+if __name__ == "__main__":
+    from history_store import HistoryStore
+    parser = argparse.ArgumentParser(description="Statistics of the results in the calculator history")
+    parser.add_argument('--db', default='calculator_history.db', help="SQLite history database")
+    args = parser.parse_args()
+
+    store = HistoryStore(args.db, max_rows=0)
+    try:
+        print_stats(history_stats(store))
+    finally:
+        store.close()
@@ -1,17 +1,14 @@
 import os
 import requests
-import time
 import math
 from dotenv import load_dotenv
 import logging
+from calculator_engine import operation_point
+from error_log import setup_error_logging
 
-# Set up logging - only log errors to file
-logging.basicConfig(
-    filename='calculator_test_errors.log',
-    level=logging.ERROR,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
+# Set up logging - only log errors, written to a rotating file by a
+# background thread with repeated errors limited
+setup_error_logging('calculator_test_errors.log')
 
 # Disable other loggers
 logging.getLogger('urllib3').setLevel(logging.ERROR)
@@ -210,24 +207,8 @@ class CalculatorTest:
                 print("InfluxDB settings not configured")
                 return
             
-            # Format the operation for better readability
-            if operation is None:
-                operation = "none"
-            else:
-                # Escape special characters and spaces in the operation string
-                operation = operation.replace('×', 'mul').replace('÷', 'div').replace(' ', '\\ ')
-                operation = operation.replace(',', '\\,').replace('=', '\\=')
-            
-            # Format the result - ensure it's a valid float
-            try:
-                result_float = float(result)
-                result_str = f"{result_float}"
-            except (ValueError, TypeError):
-                result_str = "0"
-            
             # Create line protocol with proper escaping
-            timestamp = int(time.time() * 1e9)  # Current time in nanoseconds
-            line = f"calculator_operation,operation={operation} result={result_str} {timestamp}"
+            line = operation_point(operation, result)
             
             # Prepare the request
             headers = {
@@ -0,0 +1,85 @@
+from fractions import Fraction
+from calculator_engine import CalculatorEngine, EngineState
+
+def press(engine, keys):
+    for key in keys:
+        engine.button_clicked(key)
+    return engine.display_text
+
+def test_undo_and_redo_keys():
+    engine = CalculatorEngine(precision_mode='float')
+    assert press(engine, ['1', '2', '+', '3', '=']) == '15'
+    assert press(engine, ['undo']) == '3'
+    assert engine.operation == '+' and engine.first_number == 12
+    assert press(engine, ['undo', 'undo']) == '12'
+    assert press(engine, ['redo', 'redo']) == '3'
+    assert press(engine, ['redo']) == '15'
+    # Nothing left to redo
+    assert press(engine, ['redo']) == '15'
+
+def test_clear_can_be_undone():
+    engine = CalculatorEngine(precision_mode='float')
+    press(engine, ['7', '×', '6', 'C'])
+    assert engine.display_text == '' and engine.first_number is None
+    assert press(engine, ['undo']) == '6'
+    assert press(engine, ['=']) == '42'
+
+def test_keys_that_change_nothing_are_not_recorded():
+    engine = CalculatorEngine()
+    press(engine, ['⌫', '⌫'])
+    assert not engine.undo_stack
+    press(engine, ['5'])
+    assert len(engine.undo_stack) == 1
+
+def test_undo_depth_limit(monkeypatch):
+    engine = CalculatorEngine(undo_depth=3)
+    press(engine, list('12345'))
+    assert len(engine.undo_stack) == 3
+    assert press(engine, ['undo'] * 5) == '12'
+    assert len(engine.redo_stack) == 3
+
+    monkeypatch.setenv('CALCULATOR_UNDO_DEPTH', '2')
+    engine = CalculatorEngine()
+    press(engine, list('1234'))
+    assert len(engine.undo_stack) == 2
+
+def test_new_input_clears_redo():
+    engine = CalculatorEngine()
+    press(engine, ['1', '2', 'undo'])
+    assert engine.redo_stack
+    assert press(engine, ['9']) == '19'
+    assert not engine.redo_stack
+    assert press(engine, ['redo']) == '19'
+    assert press(engine, ['undo']) == '1'
+
+def test_undo_restores_scientific_mode():
+    engine = CalculatorEngine()
+    press(engine, ['3', '0'])
+    engine.set_scientific_mode(True)
+    press(engine, ['sin'])
+    assert engine.scientific_mode
+    press(engine, ['undo', 'undo'])
+    assert not engine.scientific_mode and engine.display_text == '30'
+    press(engine, ['redo'])
+    assert engine.scientific_mode
+
+def test_undo_restores_precision_and_pending_operand():
+    engine = CalculatorEngine(precision_mode='float')
+    press(engine, ['1', '÷'])
+    engine.set_precision('fraction')
+    assert engine.first_number == Fraction(1)
+    press(engine, ['undo'])
+    assert engine.precision_mode == 'float'
+    assert type(engine.first_number) is float
+    press(engine, ['redo'])
+    assert engine.precision_mode == 'fraction'
+    assert press(engine, ['3', '=']) == '1/3'
+
+def test_snapshot_matches_engine_until_a_change():
+    engine = CalculatorEngine()
+    state = EngineState(engine)
+    assert state.matches(engine)
+    press(engine, ['4'])
+    assert not state.matches(engine)
+    state.restore(engine)
+    assert state.matches(engine) and engine.display_text == ''
@@ -0,0 +1,45 @@
+import asyncio
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+from calculator_server import CalculatorService
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.setenv("CALCULATOR_MAX_DIGITS", "50")
+    monkeypatch.setenv("INFLUXDB_METADATA_CACHE", "")
+    return CalculatorService(str(tmp_path / 'history.db'), str(tmp_path / 'log.json'))
+
+def test_evaluate_expression(service):
+    response = service.evaluate({'expression': '1÷3', 'precision': 'decimal', 'digits': 5})
+    assert response['result'] == '0.33333'
+    assert not response['error']
+
+def test_digits_up_to_the_limit(service):
+    response = service.evaluate({'expression': '2÷3', 'precision': 'decimal', 'digits': 50})
+    assert response['result'] == '0.' + '6' * 49 + '7'
+
+@pytest.mark.parametrize('digits', [51, 10000000, 0, -1, True, False, 2.5, '10'])
+def test_digits_out_of_range_rejected(service, digits):
+    with pytest.raises(ValueError, match="digits must be an integer from 1 to 50"):
+        service.evaluate({'expression': '1+1', 'precision': 'decimal', 'digits': digits})
+
+def test_invalid_requests_rejected(service):
+    with pytest.raises(ValueError):
+        service.evaluate(['1+1'])
+    with pytest.raises(ValueError):
+        service.evaluate({'expression': '1+1', 'precision': 'binary'})
+    with pytest.raises(ValueError):
+        service.evaluate({'keys': '12'})
+
+def test_http_digits_above_limit_is_400(service):
+    async def post(path, body):
+        async with TestClient(TestServer(service.create_app())) as client:
+            response = await client.post(path, json=body)
+            return response.status, await response.json()
+
+    status, body = asyncio.run(post('/evaluate', {'expression': '1÷3', 'precision': 'decimal',
+                                                  'digits': 10000000}))
+    assert status == 400 and 'digits' in body['error']
+    status, body = asyncio.run(post('/batch', {'expressions': ['1÷3'], 'precision': 'decimal',
+                                               'digits': 51}))
+    assert status == 200 and 'digits' in body['results'][0]['error']
@@ -0,0 +1,49 @@
+from circuit_breaker import CircuitBreaker
+
+def test_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3)
+    assert breaker.allow()
+    assert not breaker.record_failure(['a'])
+    assert not breaker.record_failure(['b'])
+    assert breaker.record_failure(['c'])
+    assert not breaker.allow()
+    assert breaker.stats() == {'state': 'open', 'failures': 3, 'buffered': 3, 'dropped': 0}
+    # Further failures do not report opening again
+    assert not breaker.record_failure(['d'])
+
+def test_success_resets_failures_and_returns_buffered_lines():
+    breaker = CircuitBreaker(failure_threshold=3)
+    breaker.record_failure(['a'])
+    breaker.record_failure(['b'])
+    assert breaker.record_success() == ['a', 'b']
+    assert not breaker.record_failure(['c'])
+    assert breaker.allow()
+    assert breaker.stats()['failures'] == 1
+
+def test_open_probe_close_cycle():
+    breaker = CircuitBreaker(failure_threshold=1, base_delay=1.0, max_delay=60.0)
+    assert breaker.record_failure(['a'])
+    # While open, writes are held and /health is probed with backoff
+    breaker.hold(['b', 'c'])
+    assert [breaker.probe_delay() for _ in range(8)] == [1, 2, 4, 8, 16, 32, 60, 60]
+    assert breaker.close() == ['a', 'b', 'c']
+    assert breaker.allow()
+    assert breaker.stats() == {'state': 'closed', 'failures': 0, 'buffered': 0, 'dropped': 0}
+    # Opening again starts the backoff over
+    assert breaker.record_failure(['d'])
+    assert breaker.probe_delay() == 1
+
+def test_buffer_overflow_drops_oldest_lines():
+    breaker = CircuitBreaker(failure_threshold=1, buffer_size=3)
+    breaker.record_failure(['a', 'b'])
+    breaker.hold(['c', 'd'])
+    breaker.hold(['e'])
+    assert breaker.stats()['dropped'] == 2
+    assert breaker.close() == ['c', 'd', 'e']
+    assert breaker.stats()['dropped'] == 2
+
+def test_from_env(monkeypatch):
+    monkeypatch.setenv("INFLUXDB_BREAKER_THRESHOLD", "5")
+    monkeypatch.setenv("INFLUXDB_BREAKER_BUFFER", "7")
+    breaker = CircuitBreaker.from_env()
+    assert breaker.failure_threshold == 5 and breaker.buffer.maxlen == 7
@@ -0,0 +1,124 @@
+import argparse
+import asyncio
+import json
+from datetime import timedelta
+import pytest
+import cleanup_influxdb
+from cleanup_influxdb import (cleanup_influxdb_async, load_checkpoint, parse_duration,
+                              split_range, start_checkpoint, record_checkpoint)
+from influxdb_async import InfluxDBError
+
+class FakeClient:
+    """Stands in for AsyncInfluxDBClient, recording deletes and failing the chosen chunks"""
+
+    def __init__(self, fail=()):
+        self.org = 'calculator'
+        self.bucket = 'calculator_logs'
+        self.fail = set(fail)
+        self.deleted = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    async def delete(self, start, stop, predicate):
+        await asyncio.sleep(0)
+        if (start, stop) in self.fail:
+            raise InfluxDBError(500, 'failed')
+        self.deleted.append((start, stop))
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    clients = []
+
+    def from_env(fail=(), **kwargs):
+        clients.append(FakeClient(fail))
+        return clients[-1]
+
+    def use(fail=()):
+        monkeypatch.setattr(cleanup_influxdb.AsyncInfluxDBClient, 'from_env',
+                            lambda **kwargs: from_env(fail, **kwargs))
+        return clients
+
+    return use
+
+def run(checkpoint, **kwargs):
+    kwargs.setdefault('start', '2024-01-01T00:00:00Z')
+    kwargs.setdefault('stop', '2024-01-05T00:00:00Z')
+    kwargs.setdefault('chunk', timedelta(days=1))
+    asyncio.run(cleanup_influxdb_async(checkpoint=str(checkpoint), confirm=False, cache_file=None, **kwargs))
+
+DAYS = [('2024-01-01T00:00:00Z', '2024-01-02T00:00:00Z'), ('2024-01-02T00:00:00Z', '2024-01-03T00:00:00Z'),
+        ('2024-01-03T00:00:00Z', '2024-01-04T00:00:00Z'), ('2024-01-04T00:00:00Z', '2024-01-05T00:00:00Z')]
+
+def test_split_range_chunk_boundaries():
+    assert split_range('2024-01-01T00:00:00Z', '2024-01-05T00:00:00Z', timedelta(days=1)) == DAYS
+    # The last chunk is cut short at stop
+    assert split_range('2024-01-01T00:00:00Z', '2024-01-01T05:00:00Z', timedelta(hours=2))[-1] == \
+        ('2024-01-01T04:00:00Z', '2024-01-01T05:00:00Z')
+    assert split_range('2024-01-01T00:00:00Z', '2024-01-02T00:00:00Z') == \
+        [('2024-01-01T00:00:00Z', '2024-01-02T00:00:00Z')]
+    assert split_range('2024-01-02T00:00:00Z', '2024-01-01T00:00:00Z', timedelta(days=1)) == []
+
+def test_split_range_converts_offsets_to_utc():
+    assert split_range('2024-01-01T00:00:00+02:00', '2024-01-01T12:00:00', timedelta(hours=12)) == \
+        [('2023-12-31T22:00:00Z', '2024-01-01T10:00:00Z'), ('2024-01-01T10:00:00Z', '2024-01-01T12:00:00Z')]
+
+def test_parse_duration():
+    assert parse_duration('12h') == timedelta(hours=12)
+    for text in ('0d', '1y', 'd', '-1d'):
+        with pytest.raises(ValueError):
+            parse_duration(text)
+
+def test_checkpoint_round_trip_and_truncated_line(tmp_path):
+    path = str(tmp_path / 'checkpoint.json')
+    settings = {'start': 'a', 'chunks': 4}
+    f = start_checkpoint(path, settings, {DAYS[0]})
+    record_checkpoint(f, DAYS[1])
+    f.write('["2024-01-03T00:00:00Z", "2024-01')
+    f.close()
+    assert load_checkpoint(path, settings) == {DAYS[0], DAYS[1]}
+
+def test_checkpoint_with_other_settings_is_ignored(tmp_path):
+    path = str(tmp_path / 'checkpoint.json')
+    start_checkpoint(path, {'start': 'a'}, {DAYS[0]}).close()
+    assert load_checkpoint(path, {'start': 'b'}) == set()
+    assert load_checkpoint(str(tmp_path / 'missing.json'), {'start': 'a'}) == set()
+    (tmp_path / 'garbage.json').write_text('not json\n')
+    assert load_checkpoint(str(tmp_path / 'garbage.json'), {'start': 'a'}) == set()
+
+def test_old_checkpoint_format(tmp_path):
+    path = tmp_path / 'checkpoint.json'
+    path.write_text(json.dumps({'settings': {'start': 'a'}, 'done': [list(DAYS[0])]}))
+    assert load_checkpoint(str(path), {'start': 'a'}) == {DAYS[0]}
+
+def test_resume_skips_completed_chunks(tmp_path, fake_client):
+    checkpoint = tmp_path / 'checkpoint.json'
+    clients = fake_client(fail={DAYS[2]})
+    run(checkpoint, concurrency=2)
+    assert sorted(clients[0].deleted) == [DAYS[0], DAYS[1], DAYS[3]]
+    assert checkpoint.exists()
+
+    clients = fake_client()
+    run(checkpoint, concurrency=2)
+    assert clients[-1].deleted == [DAYS[2]]
+    assert not checkpoint.exists()
+
+def test_resume_with_changed_range_starts_over(tmp_path, fake_client):
+    checkpoint = tmp_path / 'checkpoint.json'
+    fake_client(fail={DAYS[3]})
+    run(checkpoint)
+    clients = fake_client()
+    run(checkpoint, stop='2024-01-04T00:00:00Z')
+    assert sorted(clients[-1].deleted) == DAYS[:3]
+
+def test_concurrency_must_be_positive(tmp_path, fake_client):
+    clients = fake_client()
+    with pytest.raises(ValueError):
+        run(tmp_path / 'checkpoint.json', concurrency=0)
+    assert not clients
+    with pytest.raises(argparse.ArgumentTypeError):
+        cleanup_influxdb.parse_concurrency('0')
+    assert cleanup_influxdb.parse_concurrency('3') == 3
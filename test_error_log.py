@@ -0,0 +1,79 @@
+import logging
+from error_log import ErrorLogLimiter
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def make_record(msg, *args, level=logging.ERROR):
+    return logging.LogRecord('calculator', level, __file__, 1, msg, args or None, None)
+
+def passes(limiter, msg, *args, level=logging.ERROR):
+    """The logged message, or None if the limiter dropped the record"""
+    record = make_record(msg, *args, level=level)
+    return record.getMessage() if limiter.filter(record) else None
+
+def test_messages_differing_in_numbers_are_deduplicated():
+    clock = FakeClock()
+    limiter = ErrorLogLimiter(window=60, rate=100, clock=clock)
+    assert passes(limiter, "Export failed: HTTP 500 after 3 tries") == "Export failed: HTTP 500 after 3 tries"
+    assert passes(limiter, "Export failed: HTTP %d after %d tries", 503, 4) is None
+    assert passes(limiter, "Object at 0x7f3a2c not found") is not None
+    assert passes(limiter, "Object at 0x1b2c3d not found") is None
+    # Other text, or another level, is another error
+    assert passes(limiter, "Calculation failed: 1 / 0") is not None
+    assert passes(limiter, "Export failed: HTTP 500 after 3 tries", level=logging.WARNING) is not None
+
+def test_suppressed_count_is_reported_after_the_window():
+    clock = FakeClock()
+    limiter = ErrorLogLimiter(window=60, rate=100, clock=clock)
+    passes(limiter, "Export failed: HTTP 500")
+    for status in (502, 503, 504):
+        clock.now += 10
+        assert passes(limiter, f"Export failed: HTTP {status}") is None
+    clock.now += 31
+    assert passes(limiter, "Export failed: HTTP %d", 500) == \
+        "Export failed: HTTP 500 (3 similar messages suppressed)"
+    # The count starts over with the new window
+    clock.now += 61
+    assert passes(limiter, "Export failed: HTTP 500") == "Export failed: HTTP 500"
+
+def test_rate_cap_per_second():
+    clock = FakeClock()
+    limiter = ErrorLogLimiter(window=60, rate=2, clock=clock)
+    assert passes(limiter, "first error") is not None
+    assert passes(limiter, "second error") is not None
+    assert passes(limiter, "third error") is None
+    assert passes(limiter, "fourth error") is None
+    # Tokens refill at `rate` per second
+    clock.now += 0.5
+    assert passes(limiter, "fifth error") == "fifth error (2 messages dropped by rate limit)"
+    assert passes(limiter, "sixth error") is None
+    clock.now += 10
+    assert passes(limiter, "seventh error") == "seventh error (1 messages dropped by rate limit)"
+    assert passes(limiter, "eighth error") == "eighth error"
+    assert passes(limiter, "ninth error") is None
+
+def test_suppressed_and_dropped_notes_combine():
+    clock = FakeClock()
+    limiter = ErrorLogLimiter(window=1, rate=1, clock=clock)
+    passes(limiter, "Export failed: HTTP 500")
+    assert passes(limiter, "Export failed: HTTP 502") is None
+    assert passes(limiter, "other error") is None
+    clock.now += 1
+    assert passes(limiter, "Export failed: HTTP 503") == \
+        "Export failed: HTTP 503 (1 similar messages suppressed, 1 messages dropped by rate limit)"
+
+def test_pending_summary():
+    clock = FakeClock()
+    limiter = ErrorLogLimiter(window=60, rate=1, clock=clock)
+    passes(limiter, "Export failed: HTTP 500")
+    passes(limiter, "Export failed: HTTP 502")
+    passes(limiter, "Export failed: HTTP 503")
+    passes(limiter, "other error")
+    assert limiter.pending_summary() == ["2 similar messages suppressed: Export failed: HTTP #",
+                                         "1 messages dropped by rate limit"]
+    assert limiter.pending_summary() == []
@@ -0,0 +1,64 @@
+import pytest
+from export_policy import ExportPolicy, operator_name, parse_sample_rates
+
+def sampled(policy, operation, n=10000):
+    return sum(policy.record(operation, "1") for _ in range(n))
+
+def test_operator_names():
+    assert operator_name('1 + 2') == 'add'
+    assert operator_name('5 ±') == 'negate'
+    assert operator_name('sin(30°)') == 'sin'
+    assert operator_name('Clear') == 'clear'
+    assert operator_name('(1+2)*3') == 'expression'
+    assert operator_name(None) == 'none'
+
+def test_parse_sample_rates():
+    assert parse_sample_rates('clear=0, negate=0.1,*=1') == {'clear': 0.0, 'negate': 0.1, '*': 1.0}
+    assert parse_sample_rates('') == {}
+    with pytest.raises(ValueError):
+        parse_sample_rates('add=2')
+
+def test_raw_mode_writes_everything_by_default():
+    policy = ExportPolicy()
+    assert sampled(policy, '1 + 2', 100) == 100
+
+def test_sample_rates_per_operator():
+    policy = ExportPolicy(sample_rates={'clear': 0, 'negate': 0.1, '*': 1})
+    policy.random.seed(1)
+    assert sampled(policy, 'Clear') == 0
+    assert sampled(policy, '1 + 2') == 10000
+    assert 800 < sampled(policy, '5 ±') < 1200
+
+def test_default_rate_for_other_operators():
+    policy = ExportPolicy(sample_rates={'add': 1, '*': 0.5})
+    policy.random.seed(2)
+    assert sampled(policy, '1 + 2') == 10000
+    assert 4500 < sampled(policy, '1 × 2') < 5500
+
+def test_include_and_exclude():
+    policy = ExportPolicy(include={'add', 'clear'}, exclude={'clear'})
+    assert policy.record('1 + 2', '3')
+    assert not policy.record('Clear', '0')
+    assert not policy.record('1 × 2', '2')
+
+def test_aggregate_mode_counts_without_raw_points():
+    policy = ExportPolicy('aggregate', interval=60)
+    policy.reset(1000.0)
+    assert not policy.record('1 + 2', '3')
+    assert not policy.record('1 ÷ 3', '1/3')
+    assert not policy.record('1 ÷ 0', 'Error: Division by zero')
+    assert policy.summary_line(now=1030.0) is None
+    line = policy.summary_line(now=1060.0)
+    assert line.startswith('calculator_summary count=3i,errors=1i,')
+    assert 'result_max=3.0' in line and 'count_divide=2i' in line and 'count_add=1i' in line
+    assert policy.summary_line(now=1200.0, force=True) is None
+
+def test_aggregate_mode_with_sample_rate_writes_raw_points():
+    policy = ExportPolicy('aggregate', sample_rates={'add': 1})
+    assert policy.record('1 + 2', '3')
+    assert not policy.record('2 × 2', '4')
+    assert policy.counts == {'add': 1, 'multiply': 1}
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        ExportPolicy('sampled')
@@ -0,0 +1,127 @@
+import bisect
+import math
+import multiprocessing
+from history_file import HistoryFile, HEADER, RECORD, encode_entry
+from history_store import HistoryStore
+
+def make_records(times):
+    return [(t, i + 1, 0, 0, float(i), 1.0, float(i + 1)) for i, t in enumerate(times)]
+
+def test_append_round_trip(tmp_path):
+    path = str(tmp_path / 'history.bin')
+    records = make_records([10, 20, 30])
+    history = HistoryFile(path, stride=2)
+    history.append(records)
+    history.close()
+
+    reopened = HistoryFile(path)
+    assert reopened.stride == 2
+    assert [reopened.record(i) for i in range(len(reopened))] == records
+    assert list(reopened.iter_range()) == records
+    assert reopened.last_source_id() == 3
+    reopened.close()
+
+def test_partial_record_is_ignored_and_replaced(tmp_path):
+    path = str(tmp_path / 'history.bin')
+    history = HistoryFile(path)
+    history.append(make_records([10, 20]))
+    with open(path, 'ab') as f:
+        f.write(b'\0' * (RECORD.size // 2))
+    history.refresh()
+    assert len(history) == 2
+    history.append([(30, 3, 0, 0, 2.0, 1.0, 3.0)])
+    assert len(history) == 3
+    assert history.record(2)[0] == 30
+    history.close()
+
+def test_times_stay_non_decreasing(tmp_path):
+    history = HistoryFile(str(tmp_path / 'history.bin'))
+    history.append(make_records([10, 5, 20]))
+    assert [history.record(i)[0] for i in range(3)] == [10, 10, 20]
+    history.close()
+
+def test_find_time_matches_bisect(tmp_path):
+    times = [t // 3 for t in range(0, 300)]
+    history = HistoryFile(str(tmp_path / 'history.bin'), stride=8)
+    history.append(make_records(times))
+    for t in range(-1, 102):
+        assert history.find_time(t) == bisect.bisect_left(times, t)
+    assert history.range(10, 20) == (bisect.bisect_left(times, 10), bisect.bisect_left(times, 20))
+    history.close()
+
+def test_find_time_rebuilds_missing_index(tmp_path):
+    path = str(tmp_path / 'history.bin')
+    times = list(range(0, 100, 2))
+    history = HistoryFile(path, stride=4)
+    history.append(make_records(times[:25]))
+    history.close()
+    open(path + '.idx', 'wb').close()
+
+    history = HistoryFile(path, stride=4)
+    history.append(make_records(times[25:]))
+    assert len(history.index) == -(-len(times) // 4)
+    for t in range(-1, 101):
+        assert history.find_time(t) == bisect.bisect_left(times, t)
+    history.close()
+
+def test_encode_entry():
+    record = encode_entry({"timestamp": "2024-01-01 12:00:00", "operation": "1/3 ÷ 2", "result": "1/6"}, 7)
+    assert record[1] == 7
+    assert record[4:] == (1 / 3, 2.0, 1 / 6)
+    error = encode_entry({"timestamp": "2024-01-01 12:00:00", "operation": "1 ÷ 0",
+                          "result": "Error: Division by zero"})
+    assert error[3] == 1 and math.isnan(error[6])
+
+def test_sync_resumes_after_last_record(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history.db'), max_rows=0, archive='')
+    entries = [{"timestamp": f"2024-01-01 12:00:{i:02d}", "operation": f"{i} + 1", "result": str(i + 1)}
+               for i in range(5)]
+    store.append(entries[:3])
+    history = HistoryFile(str(tmp_path / 'history.bin'))
+    assert history.sync(store) == 3
+    store.append(entries[3:])
+    assert history.sync(store) == 2
+    assert history.sync(store) == 0
+    assert [history.record(i)[6] for i in range(len(history))] == [1.0, 2.0, 3.0, 4.0, 5.0]
+    assert HEADER.size + len(history) * RECORD.size == (tmp_path / 'history.bin').stat().st_size
+    history.close()
+    store.close()
+
+def make_entries(start, stop):
+    return [{"timestamp": "2024-01-01 12:00:00", "operation": f"{i} + 1", "result": str(i + 1)}
+            for i in range(start, stop)]
+
+def test_sync_includes_archived_rows(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history.db'), max_rows=10)
+    store.append(make_entries(0, 25))
+    history = HistoryFile(str(tmp_path / 'history.bin'))
+    assert history.sync(store) == 25
+    store.append(make_entries(25, 40))
+    assert history.sync(store) == 15
+    assert [history.record(i)[1] for i in range(len(history))] == list(range(1, 41))
+    assert [history.record(i)[6] for i in range(len(history))] == [float(i) for i in range(1, 41)]
+    history.close()
+    store.close()
+
+def sync_process(db_path, bin_path):
+    store = HistoryStore(db_path, max_rows=0)
+    history = HistoryFile(bin_path, stride=16)
+    history.sync(store, batch=50)
+    history.close()
+    store.close()
+
+def test_concurrent_syncs_do_not_interleave(tmp_path):
+    db_path, bin_path = str(tmp_path / 'history.db'), str(tmp_path / 'history.bin')
+    store = HistoryStore(db_path, max_rows=0)
+    store.append(make_entries(0, 2000))
+    store.close()
+    HistoryFile(bin_path, stride=16).close()
+    processes = [multiprocessing.Process(target=sync_process, args=(db_path, bin_path)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    history = HistoryFile(bin_path, stride=16)
+    assert [history.record(i)[1] for i in range(len(history))] == list(range(1, 2001))
+    assert list(history.index) == [history.record(i)[0] for i in range(0, 2000, 16)]
+    history.close()
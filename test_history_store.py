@@ -0,0 +1,91 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from history_store import HistoryStore
+
+def make_entries(start, stop):
+    return [{"timestamp": "2024-01-01 12:00:00", "operation": f"{i} + 1", "result": str(i + 1)}
+            for i in range(start, stop)]
+
+def test_pruned_rows_are_archived_and_read_back(tmp_path, monkeypatch):
+    # Small segments and the tightest retention settings still keep every archived row
+    monkeypatch.setenv("CALCULATOR_LOG_MAX_BYTES", "2000")
+    monkeypatch.setenv("CALCULATOR_LOG_BACKUPS", "1")
+    monkeypatch.setenv("CALCULATOR_LOG_RETENTION_DAYS", "0.000001")
+    store = HistoryStore(str(tmp_path / 'history.db'), max_rows=100)
+    for start in range(0, 3000, 100):
+        store.append(make_entries(start, start + 100))
+    store.archive.maintain()
+    assert store.conn.execute('SELECT COUNT(*) FROM history').fetchone()[0] == 100
+    assert list(store.iter_entries(chunk=7)) == make_entries(0, 3000)
+    store.close()
+
+def test_archive_disabled(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history.db'), max_rows=10, archive='')
+    store.append(make_entries(0, 25))
+    assert list(store.iter_entries()) == make_entries(15, 25)
+    store.close()
+
+def test_iter_entries_stop_id(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history.db'), max_rows=5)
+    store.append(make_entries(0, 12))
+    assert list(store.iter_entries(stop_id=10)) == make_entries(0, 10)
+    store.close()
+
+def test_two_instances_share_one_database(tmp_path):
+    path = str(tmp_path / 'history.db')
+    first, second = HistoryStore(path), HistoryStore(path)
+    assert first.instance != second.instance
+    assert first.recent(10) == [] and second.recent(10) == []
+    first.append(make_entries(0, 3))
+    second.append(make_entries(3, 5))
+    first.append(make_entries(5, 6))
+    # Each sees only the other's rows, and only once
+    assert first.new_entries() == make_entries(3, 5)
+    assert second.new_entries() == make_entries(0, 3) + make_entries(5, 6)
+    assert first.new_entries() == [] and second.new_entries() == []
+    second.append(make_entries(6, 8))
+    assert first.new_entries() == make_entries(6, 8)
+    # Neither overwrote the other's rows
+    assert list(first.iter_entries()) == make_entries(0, 8)
+    assert second.recent(3) == make_entries(5, 8)
+    first.close()
+    second.close()
+
+def test_recent_starts_following_from_the_newest_row(tmp_path):
+    path = str(tmp_path / 'history.db')
+    first = HistoryStore(path)
+    first.append(make_entries(0, 5))
+    second = HistoryStore(path)
+    assert second.recent(2) == make_entries(3, 5)
+    assert second.new_entries() == []
+    first.append(make_entries(5, 6))
+    assert second.new_entries() == make_entries(5, 6)
+    first.close()
+    second.close()
+
+def test_import_json_runs_once(tmp_path):
+    log_file = tmp_path / 'calculator_log.json'
+    log_file.write_text(json.dumps(make_entries(0, 4)))
+    path = str(tmp_path / 'history.db')
+    first, second = HistoryStore(path), HistoryStore(path)
+    assert first.import_json(str(log_file)) == 4
+    assert second.import_json(str(log_file)) == 0
+    assert first.import_json(str(tmp_path / 'missing.json')) == 0
+    assert list(second.iter_entries()) == make_entries(0, 4)
+    # Imported rows are tagged with the importing instance
+    assert second.new_entries() == make_entries(0, 4)
+    assert first.new_entries() == []
+    first.close()
+    second.close()
+
+def test_concurrent_imports_insert_once(tmp_path):
+    log_file = tmp_path / 'calculator_log.json'
+    log_file.write_text(json.dumps(make_entries(0, 50)))
+    path = str(tmp_path / 'history.db')
+    stores = [HistoryStore(path) for _ in range(4)]
+    with ThreadPoolExecutor(len(stores)) as pool:
+        counts = list(pool.map(lambda store: store.import_json(str(log_file)), stores))
+    assert sorted(counts) == [0, 0, 0, 50]
+    assert list(stores[0].iter_entries()) == make_entries(0, 50)
+    for store in stores:
+        store.close()
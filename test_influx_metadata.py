@@ -0,0 +1,91 @@
+import json
+import os
+import pytest
+import influx_metadata
+from influx_metadata import MetadataCache
+
+URL = 'http://localhost:8086'
+
+def test_put_get_and_persist(tmp_path):
+    path = str(tmp_path / 'metadata.json')
+    cache = MetadataCache(path)
+    assert cache.get(URL, 'org', 'calculator') is None
+    cache.put(URL, 'org', 'calculator', 'o1')
+    cache.put(URL, 'bucket', 'logs', 'b1', 'calculator')
+    cache.save()
+    reloaded = MetadataCache(path)
+    assert reloaded.get(URL, 'org', 'calculator') == 'o1'
+    assert reloaded.get(URL, 'bucket', 'logs', 'calculator') == 'b1'
+    # Buckets are keyed by organization, entries by server
+    assert reloaded.get(URL, 'bucket', 'logs', 'other') is None
+    assert reloaded.get('http://other:8086', 'org', 'calculator') is None
+
+def test_entries_expire_after_ttl(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(influx_metadata.time, 'time', lambda: now[0])
+    cache = MetadataCache(str(tmp_path / 'metadata.json'), ttl=60)
+    cache.put(URL, 'org', 'calculator', 'o1')
+    now[0] += 60
+    assert cache.get(URL, 'org', 'calculator') == 'o1'
+    now[0] += 1
+    assert cache.get(URL, 'org', 'calculator') is None
+
+def test_invalidate(tmp_path):
+    path = str(tmp_path / 'metadata.json')
+    cache = MetadataCache(path)
+    cache.put(URL, 'org', 'calculator', 'o1')
+    cache.save()
+    cache.invalidate(URL, 'org', 'calculator')
+    assert cache.dirty
+    cache.save()
+    assert MetadataCache(path).get(URL, 'org', 'calculator') is None
+
+def test_save_only_when_changed(tmp_path):
+    path = tmp_path / 'metadata.json'
+    cache = MetadataCache(str(path))
+    cache.get(URL, 'org', 'calculator')
+    cache.save()
+    assert not path.exists()
+
+def test_save_uses_a_unique_temporary_file(tmp_path, monkeypatch):
+    path = tmp_path / 'metadata.json'
+    # A stale file from the old fixed temporary name is left alone
+    (tmp_path / 'metadata.json.tmp').write_text('stale')
+    created = []
+    mkstemp = influx_metadata.tempfile.mkstemp
+
+    def recording_mkstemp(**kwargs):
+        created.append(mkstemp(**kwargs))
+        return created[-1]
+
+    monkeypatch.setattr(influx_metadata.tempfile, 'mkstemp', recording_mkstemp)
+    for id in ('o1', 'o2'):
+        cache = MetadataCache(str(path))
+        cache.put(URL, 'org', 'calculator', id)
+        cache.save()
+    names = [os.path.basename(name) for _, name in created]
+    assert len(set(names)) == 2
+    assert all(name.startswith('metadata.json.') and name.endswith('.tmp') for name in names)
+    assert sorted(os.listdir(tmp_path)) == ['metadata.json', 'metadata.json.tmp']
+    assert json.loads(path.read_text())[URL]['org:calculator']['id'] == 'o2'
+
+def test_failed_save_removes_temporary_file(tmp_path, monkeypatch):
+    cache = MetadataCache(str(tmp_path / 'metadata.json'))
+    cache.put(URL, 'org', 'calculator', 'o1')
+    monkeypatch.setattr(influx_metadata.json, 'dump', lambda *args: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        cache.save()
+    assert os.listdir(tmp_path) == []
+    assert cache.dirty
+
+def test_unreadable_file_is_empty(tmp_path):
+    path = tmp_path / 'metadata.json'
+    path.write_text('{truncated')
+    assert MetadataCache(str(path)).get(URL, 'org', 'calculator') is None
+
+def test_write_params(tmp_path):
+    cache = MetadataCache(str(tmp_path / 'metadata.json'))
+    assert cache.write_params(URL, 'calculator', 'logs') == {'org': 'calculator', 'bucket': 'logs'}
+    cache.put(URL, 'org', 'calculator', 'o1')
+    cache.put(URL, 'bucket', 'logs', 'b1', 'calculator')
+    assert cache.write_params(URL, 'calculator', 'logs') == {'orgID': 'o1', 'bucket': 'b1'}
@@ -1,83 +1,94 @@
-import os
-import requests
-from dotenv import load_dotenv
-import time
+import asyncio
+from aiohttp import ClientConnectionError
+from influxdb_async import AsyncInfluxDBClient
 
-def test_influxdb_connection():
-    # Load environment variables
-    load_dotenv()
+async def check_influxdb_connection(client):
+    # Health, organization and bucket checks are independent, so run them together.
+    # Lookups are filtered by name on the server and their IDs are cached for other scripts.
+    health, found_org, found_bucket = await asyncio.gather(
+        client.health(),
+        client.find_org(),
+        client.find_bucket(),
+        return_exceptions=True
+    )
+    
+    # Test 1: Check if InfluxDB is running
+    if isinstance(health, ClientConnectionError):
+        raise health
+    if isinstance(health, Exception):
+        # e.g. a timeout; str() of some exceptions is empty, so show the type too
+        print(f"\nHealth check failed: {health!r}")
+    else:
+        health_status, health_text = health
+        print(f"\nHealth check status: {health_status}")
+        print(f"Health check response: {health_text}")
+    
+    # Test 2: Check if our organization exists
+    if isinstance(found_org, Exception):
+        print(f"\nOrganization check failed: {found_org}")
+    elif found_org:
+        print(f"\nFound organization: {client.org}")
+        print(f"Organization ID: {found_org['id']}")
+    else:
+        print(f"\nOrganization '{client.org}' not found")
+        return
     
-    # Get InfluxDB settings from environment variables
-    url = os.getenv('INFLUXDB_URL', 'http://localhost:8086')
-    token = os.getenv('INFLUXDB_TOKEN')
-    org = os.getenv('INFLUXDB_ORG', 'calculator')
-    bucket = os.getenv('INFLUXDB_BUCKET', 'calculator_logs')
+    # Test 3: Check if our bucket exists
+    if isinstance(found_bucket, Exception):
+        print(f"\nBucket check failed: {found_bucket}")
+    elif found_bucket:
+        print(f"\nFound bucket: {client.bucket}")
+        print(f"Bucket ID: {found_bucket['id']}")
+        print(f"Retention Rules: {found_bucket.get('retentionRules', [])}")
+    else:
+        print(f"\nBucket '{client.bucket}' not found")
+    
+    print("\nInfluxDB connection test completed successfully!")
+
+class FailingClient:
+    """Client whose checks fail with the given exceptions"""
+    org = 'calculator'
+    bucket = 'calculator_logs'
+
+    def __init__(self, health_error, lookup_error):
+        self.health_error = health_error
+        self.lookup_error = lookup_error
+
+    async def health(self):
+        raise self.health_error
+
+    async def find_org(self):
+        raise self.lookup_error
+
+    async def find_bucket(self):
+        raise self.lookup_error
+
+def test_check_reports_failed_checks(capsys):
+    asyncio.run(check_influxdb_connection(FailingClient(asyncio.TimeoutError(), ValueError("bad reply"))))
+    output = capsys.readouterr().out
+    assert "Health check failed: TimeoutError()" in output
+    assert "Organization check failed: bad reply" in output
+    assert "Bucket check failed: bad reply" in output
+
+def test_influxdb_connection():
+    client = AsyncInfluxDBClient.from_env()
     
     print(f"Testing InfluxDB connection...")
-    print(f"URL: {url}")
-    print(f"Organization: {org}")
-    print(f"Bucket: {bucket}")
+    print(f"URL: {client.url}")
+    print(f"Organization: {client.org}")
+    print(f"Bucket: {client.bucket}")
     
-    headers = {
-        'Authorization': f'Token {token}',
-        'Content-Type': 'application/json'
-    }
+    async def run():
+        async with client:
+            await check_influxdb_connection(client)
     
     try:
-        # Test 1: Check if InfluxDB is running
-        health_url = f"{url}/health"
-        health_response = requests.get(health_url)
-        print(f"\nHealth check status: {health_response.status_code}")
-        print(f"Health check response: {health_response.text}")
-        
-        # Test 2: Check if our organization exists
-        org_url = f"{url}/api/v2/orgs"
-        org_response = requests.get(org_url, headers=headers)
-        print(f"\nOrganization check status: {org_response.status_code}")
-        
-        if org_response.status_code == 200:
-            orgs = org_response.json().get('orgs', [])
-            found_org = None
-            for o in orgs:
-                if o['name'] == org:
-                    found_org = o
-                    break
-            
-            if found_org:
-                print(f"Found organization: {org}")
-                print(f"Organization ID: {found_org['id']}")
-            else:
-                print(f"Organization '{org}' not found")
-                return
-        
-        # Test 3: Check if our bucket exists
-        bucket_url = f"{url}/api/v2/buckets"
-        params = {'org': org}
-        bucket_response = requests.get(bucket_url, headers=headers, params=params)
-        print(f"\nBucket check status: {bucket_response.status_code}")
-        
-        if bucket_response.status_code == 200:
-            buckets = bucket_response.json().get('buckets', [])
-            found_bucket = None
-            for b in buckets:
-                if b['name'] == bucket:
-                    found_bucket = b
-                    break
-            
-            if found_bucket:
-                print(f"Found bucket: {bucket}")
-                print(f"Bucket ID: {found_bucket['id']}")
-                print(f"Retention Rules: {found_bucket.get('retentionRules', [])}")
-            else:
-                print(f"Bucket '{bucket}' not found")
-        
-        print("\nInfluxDB connection test completed successfully!")
-        
-    except requests.exceptions.ConnectionError:
-        print(f"\nFailed to connect to InfluxDB at {url}")
+        asyncio.run(run())
+    except ClientConnectionError:
+        print(f"\nFailed to connect to InfluxDB at {client.url}")
         print("Please check if InfluxDB is running and the URL is correct")
     except Exception as e:
         print(f"\nError testing InfluxDB connection: {str(e)}")
 
 if __name__ == "__main__":
-    test_influxdb_connection() 
\ No newline at end of file
+    test_influxdb_connection() 
@@ -0,0 +1,70 @@
+import asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from calculator_engine import operation_point
+from influxdb_async import AsyncInfluxDBClient
+from line_protocol import LineBuffer, encode_point, escape_measurement, escape_key, escape_string
+
+def test_escape_measurement():
+    assert escape_measurement('calc ops,x') == 'calc\\ ops\\,x'
+    assert escape_measurement('plain') == 'plain'
+
+def test_escape_key():
+    assert escape_key('a b,c=d') == 'a\\ b\\,c\\=d'
+    assert escape_key('back\\slash') == 'back\\\\slash'
+
+def test_escape_string():
+    assert escape_string('say "hi" \\ bye') == 'say \\"hi\\" \\\\ bye'
+
+def test_encode_point_escapes_tags_and_fields():
+    line = encode_point('calculator_operation', {'operation': '1 + 2'},
+                        {'result': 3.0, 'text': 'a "b"'}, 10)
+    assert line == 'calculator_operation,operation=1\\ +\\ 2 result=3.0,text="a \\"b\\"" 10'
+
+def test_operation_point_numeric_and_fraction_results():
+    assert operation_point('1 + 1', '2', 5).endswith(' result=2.0 5')
+    assert ' result=0.3333333333333333 ' in operation_point('1 ÷ 3', '1/3', 5)
+    assert 'operation=1\\ div\\ 3' in operation_point('1 ÷ 3', '1/3', 5)
+
+def test_operation_point_text_results():
+    assert operation_point('Clear', '', 5) == 'calculator_operation,operation=Clear text="" 5'
+    assert ' text="Error: Division by zero" ' in operation_point('1 ÷ 0', 'Error: Division by zero', 5)
+    assert operation_point(None, '', 5).startswith('calculator_operation,operation=none ')
+
+def test_line_buffer_data_is_a_view():
+    buffer = LineBuffer()
+    buffer.extend(['a x=1 1', 'b x=2 2'])
+    buffer.add('c', {'t': ''}, {'x': 3}, 3)
+    data = buffer.data()
+    assert isinstance(data, memoryview)
+    assert bytes(data) == b'a x=1 1\nb x=2 2\nc x=3i 3' and len(buffer) == 3
+    # Clearing leaves a view still being sent intact
+    buffer.clear()
+    buffer.add_line('d x=4 4')
+    assert bytes(data) == b'a x=1 1\nb x=2 2\nc x=3i 3'
+    assert bytes(buffer.data()) == b'd x=4 4' and len(buffer) == 1
+
+def test_write_sends_line_buffer():
+    received = []
+
+    async def write(request):
+        received.append((request.query['bucket'], await request.read()))
+        return web.Response(status=204)
+
+    async def run():
+        app = web.Application()
+        app.router.add_post('/api/v2/write', write)
+        async with TestServer(app) as server:
+            url = str(server.make_url('')).rstrip('/')
+            async with AsyncInfluxDBClient(url, 'token', 'calculator', 'calculator_logs') as client:
+                buffer = LineBuffer()
+                buffer.extend(['a x=1 1', 'b x=2 2'])
+                await client.write(buffer)
+                buffer.clear()
+                buffer.add_line('c x=3 3')
+                await client.write(buffer)
+                await client.write(['d x=4 4'])
+
+    asyncio.run(run())
+    assert received == [('calculator_logs', b'a x=1 1\nb x=2 2'), ('calculator_logs', b'c x=3 3'),
+                        ('calculator_logs', b'd x=4 4')]
@@ -0,0 +1,184 @@
+import os
+import gzip
+import time
+import logging
+import pytest
+import log_segments
+from log_segments import SegmentedLog, SegmentHandler, read_lines, segment_paths
+from session_journal import SessionJournal
+
+def make_lines(start, stop):
+    # 30 bytes each
+    return [f"line {i:06d} {'x' * 17}\n" for i in range(start, stop)]
+
+def write_all(log, lines):
+    for line in lines:
+        log.write(line)
+    log.flush()
+
+@pytest.fixture
+def compress_now(monkeypatch):
+    monkeypatch.setattr(log_segments, 'COMPRESS_DELAY', 0)
+
+def test_size_rotation(tmp_path):
+    path = str(tmp_path / 'calc.log')
+    log = SegmentedLog(path, max_bytes=100, keep=None)
+    write_all(log, make_lines(0, 20))
+    segments = segment_paths(path)
+    assert len(segments) == 4
+    # A segment is rotated once it holds max_bytes, before the next write
+    assert all(os.path.getsize(name) == 120 for name in segments if not name.endswith('.gz'))
+    assert list(read_lines(path)) == make_lines(0, 20)
+    log.close()
+
+def test_size_counts_bytes(tmp_path):
+    path = str(tmp_path / 'calc.log')
+    log = SegmentedLog(path, max_bytes=100, keep=None)
+    # 15 characters but 17 bytes: counting characters would not rotate yet
+    write_all(log, ["7 × 6 = 42 ÷ 1\n"] * 7)
+    assert len(segment_paths(path)) == 1
+    assert log.size == 17
+    log.close()
+
+def test_time_rotation(tmp_path):
+    path = str(tmp_path / 'calc.log')
+    log = SegmentedLog(path, max_seconds=60, keep=None)
+    write_all(log, make_lines(0, 2))
+    assert not log.rotate_if_due()
+    log.started -= 61
+    assert log.rotate_if_due()
+    assert not log.rotate_if_due()
+    # An empty file is not rotated, however old
+    log.started -= 61
+    assert not log.rotate_if_due()
+    write_all(log, make_lines(2, 3))
+    assert log.rotate_if_due()
+    assert len(segment_paths(path)) == 2
+    assert list(read_lines(path)) == make_lines(0, 3)
+    log.close()
+
+def test_rotated_segments_are_compressed(tmp_path, compress_now):
+    path = str(tmp_path / 'calc.log')
+    log = SegmentedLog(path, max_bytes=100, keep=None)
+    write_all(log, make_lines(0, 20))
+    log.maintain()
+    segments = segment_paths(path)
+    assert len(segments) == 4 and all(name.endswith('.gz') for name in segments)
+    with gzip.open(segments[0], 'rt', encoding='utf-8') as f:
+        assert f.readlines() == make_lines(0, 4)
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+    assert list(read_lines(path)) == make_lines(0, 20)
+    log.close()
+
+def test_recent_segments_are_left_uncompressed(tmp_path):
+    path = str(tmp_path / 'calc.log')
+    log = SegmentedLog(path, max_bytes=100, keep=None)
+    write_all(log, make_lines(0, 8))
+    log.maintain()
+    assert not any(name.endswith('.gz') for name in segment_paths(path))
+    log.close()
+
+def test_segment_being_compressed_is_read_once(tmp_path):
+    path = str(tmp_path / 'calc.log')
+    log = SegmentedLog(path, max_bytes=100, keep=None)
+    write_all(log, make_lines(0, 8))
+    segment = segment_paths(path)[0]
+    with open(segment, 'rb') as source, gzip.open(segment + '.gz', 'wb') as target:
+        target.write(source.read())
+    assert segment_paths(path) == [segment]
+    assert list(read_lines(path)) == make_lines(0, 8)
+    log.close()
+
+def test_segment_compressed_while_reading_is_not_skipped(tmp_path, monkeypatch):
+    path = str(tmp_path / 'calc.log')
+    log = SegmentedLog(path, max_bytes=100, keep=None)
+    write_all(log, make_lines(0, 12))
+    listed = segment_paths(path)
+    # The listing is taken before maintenance compresses every segment
+    monkeypatch.setattr(log_segments, 'segment_paths', lambda path: listed)
+    for name in listed:
+        log_segments.compress_segment(name)
+    assert list(read_lines(path)) == make_lines(0, 12)
+    log.close()
+
+def test_keep_newest_segments(tmp_path, compress_now):
+    path = str(tmp_path / 'calc.log')
+    log = SegmentedLog(path, max_bytes=100, keep=2)
+    write_all(log, make_lines(0, 24))
+    log.maintain()
+    assert len(segment_paths(path)) == 2
+    assert list(read_lines(path)) == make_lines(12, 24)
+    log.close()
+
+def test_max_days(tmp_path, compress_now):
+    path = str(tmp_path / 'calc.log')
+    log = SegmentedLog(path, max_bytes=100, keep=None, max_days=1)
+    write_all(log, make_lines(0, 12))
+    old = segment_paths(path)[0]
+    two_days_ago = time.time() - 2 * 86400
+    os.utime(old, (two_days_ago, two_days_ago))
+    log.maintain()
+    assert len(segment_paths(path)) == 1
+    assert list(read_lines(path)) == make_lines(4, 12)
+    log.close()
+
+def test_no_retention_keeps_every_segment(tmp_path, compress_now):
+    path = str(tmp_path / 'calc.log')
+    log = SegmentedLog(path, max_bytes=100, keep=None, max_days=None)
+    write_all(log, make_lines(0, 40))
+    for name in segment_paths(path):
+        os.utime(name, (0, 0))
+    log.maintain()
+    assert list(read_lines(path)) == make_lines(0, 40)
+    log.close()
+
+def test_from_env(tmp_path, monkeypatch):
+    monkeypatch.setenv("CALCULATOR_LOG_MAX_BYTES", "100")
+    monkeypatch.setenv("CALCULATOR_LOG_ROTATE_SECONDS", "30")
+    monkeypatch.setenv("CALCULATOR_LOG_BACKUPS", "3")
+    monkeypatch.setenv("CALCULATOR_LOG_RETENTION_DAYS", "0.5")
+    log = SegmentedLog.from_env(str(tmp_path / 'calc.log'), keep=7)
+    assert (log.max_bytes, log.max_seconds, log.keep, log.max_days) == (100, 30.0, 7, 0.5)
+    log.close()
+
+def test_journal_is_exempt_from_retention(tmp_path, monkeypatch, compress_now):
+    monkeypatch.setenv("CALCULATOR_LOG_MAX_BYTES", "100")
+    monkeypatch.setenv("CALCULATOR_LOG_BACKUPS", "1")
+    monkeypatch.setenv("CALCULATOR_LOG_RETENTION_DAYS", "0.000001")
+    path = str(tmp_path / 'session.journal')
+    journal = SessionJournal(path)
+    for i in range(100):
+        journal.key(str(i % 10))
+    for name in segment_paths(path):
+        os.utime(name, (0, 0))
+    journal.log.maintain()
+    keys = [line.split('\t')[2] for line in read_lines(path) if '\tk\t' in line]
+    assert keys == [f"{i % 10}\n" for i in range(100)]
+    assert len(segment_paths(path)) > 5
+    journal.close()
+
+def test_shared_log_follows_rotation(tmp_path):
+    path = str(tmp_path / 'calc.log')
+    first = SegmentedLog(path, max_bytes=100, keep=None, shared=True)
+    second = SegmentedLog(path, max_bytes=100, keep=None, shared=True)
+    lines = make_lines(0, 30)
+    for i, line in enumerate(lines):
+        (first if i % 3 else second).write(line)
+        (first if i % 3 else second).flush()
+    assert list(read_lines(path)) == lines
+    first.close()
+    second.close()
+
+def test_read_lines_of_missing_log(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        list(read_lines(str(tmp_path / 'missing.log')))
+
+def test_segment_handler(tmp_path):
+    log = SegmentedLog(str(tmp_path / 'errors.log'), keep=None)
+    handler = SegmentHandler(log)
+    logger = logging.getLogger('test_segment_handler')
+    logger.addHandler(handler)
+    logger.error("Export failed: %s", 'timeout')
+    logger.removeHandler(handler)
+    handler.close()
+    assert list(read_lines(str(tmp_path / 'errors.log'))) == ["Export failed: timeout\n"]
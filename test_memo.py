@@ -0,0 +1,65 @@
+import memo
+from memo import LRUCache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def test_least_recently_used_is_evicted():
+    cache = LRUCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert list(cache.entries) == ['a', 'c']
+    assert cache.get('b') is None
+    cache.put('a', 10)
+    cache.put('d', 4)
+    assert list(cache.entries) == ['a', 'd']
+    assert cache.get('a') == 10
+
+def test_counters():
+    cache = LRUCache(maxsize=1)
+    cache.put('a', 1)
+    cache.get('a')
+    cache.get('b')
+    cache.put('b', 2)
+    assert cache.get('missing', 'default') == 'default'
+    assert cache.stats() == {'hits': 1, 'misses': 2, 'evictions': 1, 'size': 1, 'maxsize': 1}
+
+def test_cached_falsy_values_are_hits():
+    cache = LRUCache()
+    cache.put('zero', 0)
+    assert cache.get('zero', 'default') == 0
+    assert cache.hits == 1
+
+def test_ttl_expiry(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(memo.time, 'monotonic', clock)
+    cache = LRUCache(ttl=10)
+    cache.put('a', 1)
+    clock.now += 10
+    assert cache.get('a') == 1
+    clock.now += 0.5
+    assert cache.get('a') is None
+    assert len(cache) == 0
+    assert (cache.hits, cache.misses, cache.evictions) == (1, 1, 0)
+
+def test_put_refreshes_ttl(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(memo.time, 'monotonic', clock)
+    cache = LRUCache(ttl=10)
+    cache.put('a', 1)
+    clock.now += 8
+    cache.put('a', 2)
+    clock.now += 8
+    assert cache.get('a') == 2
+
+def test_clear():
+    cache = LRUCache()
+    cache.put('a', 1)
+    cache.clear()
+    assert len(cache) == 0 and cache.get('a') is None
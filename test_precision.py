@@ -0,0 +1,47 @@
+from decimal import Decimal
+from fractions import Fraction
+from calculator_engine import CalculatorEngine
+from precision import apply_operation, format_number, needs_promotion, parse_number
+
+def press(engine, keys):
+    for key in keys:
+        engine.button_clicked(key)
+    return engine.display_text
+
+def test_float_path_stays_float():
+    result = apply_operation('+', 0.1, 0.2)
+    assert type(result) is float
+    assert format_number(result) == "0.3"
+
+def test_zero_factor_is_not_promoted():
+    assert not needs_promotion('×', 5.0, 0.0, 0.0)
+    assert not needs_promotion('×', 0.0, 5.0, 0.0)
+    assert type(apply_operation('×', 5.0, 0.0)) is float
+
+def test_underflow_and_overflow_are_promoted():
+    assert needs_promotion('×', 1e-200, 1e-200, 0.0)
+    assert needs_promotion('÷', 1e-300, 1e300, 0.0)
+    assert needs_promotion('×', 1e200, 1e200, float('inf'))
+    assert apply_operation('×', 1e200, 1e200) == Decimal('1E+400')
+
+def test_parse_number_beyond_float_range():
+    assert parse_number('1e400') == Decimal('1E+400')
+    assert parse_number('1/4') == 0.25
+
+def test_fraction_mode_is_exact():
+    assert press(CalculatorEngine('fraction'), '1÷3=') == "1/3"
+    assert press(CalculatorEngine('fraction'), '1÷3×3=') == "1"
+    assert format_number(Fraction(4, 2)) == "2"
+
+def test_decimal_digits_above_28():
+    engine = CalculatorEngine('decimal', 1000)
+    result = press(engine, '2÷3=')
+    assert result == '0.' + '6' * 999 + '7'
+
+def test_decimal_large_integer_is_exact():
+    engine = CalculatorEngine('decimal', 40)
+    number = '123456789012345678901234567890123'
+    assert press(engine, number + '+0=') == number
+
+def test_decimal_rounds_to_digits():
+    assert press(CalculatorEngine('decimal', 5), '2÷3=') == '0.66667'
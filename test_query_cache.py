@@ -0,0 +1,139 @@
+import re
+import time
+import asyncio
+import pytest
+import query_cache
+from query_cache import NS_PER_SECOND, QueryCache, ns_to_rfc3339, rfc3339_to_ns
+from query_influxdb import iter_csv_records
+
+HOUR = 3600 * NS_PER_SECOND
+RANGE = re.compile(r'time\(v: "([^"]+)"\)')
+
+class FakeClient:
+    """Answers range queries from a list of (ns, result) points, as annotated CSV"""
+
+    def __init__(self, points):
+        self.points = points
+        self.queries = []
+
+    async def query_many(self, queries):
+        self.queries.append(queries)
+        return [self.answer(query) for query in queries]
+
+    def answer(self, query):
+        start, stop = (rfc3339_to_ns(value) for value in RANGE.findall(query))
+        lines = ['#datatype,string,long,dateTime:RFC3339,string,double,string',
+                 ',result,table,_time,_field,_value,operation']
+        lines += [f',_result,0,{ns_to_rfc3339(ns)},result,{value},{ns} + 0'
+                  for ns, value in self.points if start <= ns < stop]
+        return '\r\n'.join(lines) + '\r\n'
+
+def aligned_now():
+    now = time.time_ns()
+    return now - now % HOUR
+
+def get(cache, client, start, stop):
+    return asyncio.run(cache.get_records(client, 'calculator_logs', 'calculator_operation',
+                                         start, stop, iter_csv_records))
+
+def test_rfc3339_round_trip():
+    for ns in (0, 1_700_000_000_123_456_789, 1_700_000_000 * NS_PER_SECOND):
+        assert rfc3339_to_ns(ns_to_rfc3339(ns)) == ns
+    assert rfc3339_to_ns('2024-01-01T00:00:00.5Z') == 1704067200 * NS_PER_SECOND + NS_PER_SECOND // 2
+    assert rfc3339_to_ns('2024-01-01T02:00:00+02:00') == 1704067200 * NS_PER_SECOND
+
+def test_windows_are_aligned(tmp_path):
+    cache = QueryCache(str(tmp_path / 'cache.db'), window_seconds=10)
+    window = 10 * NS_PER_SECOND
+    assert list(cache.windows(15 * NS_PER_SECOND, 30 * NS_PER_SECOND)) == \
+        [(window, 2 * window), (2 * window, 3 * window)]
+    assert list(cache.windows(2 * window, 2 * window + 1)) == [(2 * window, 3 * window)]
+    assert list(cache.windows(2 * window, 2 * window)) == []
+    cache.close()
+
+def test_settled_windows_are_served_from_the_cache(tmp_path):
+    now = aligned_now()
+    points = [(now - hours * HOUR + 60 * NS_PER_SECOND, hours) for hours in range(1, 7)]
+    client = FakeClient(points)
+    cache = QueryCache(str(tmp_path / 'cache.db'), window_seconds=3600, settle=2 * 3600)
+    start, stop = now - 6 * HOUR, now + HOUR
+
+    records = get(cache, client, start, stop)
+    assert [float(r['_value']) for r in records] == [1, 2, 3, 4, 5, 6]
+    assert set(records[0]) == {'_time', '_field', '_value', 'operation'}
+    # All seven windows were missing and adjacent, so one range query fetched them
+    assert len(client.queries) == 1 and len(client.queries[0]) == 1
+    assert cache.stats()['misses'] == 7
+    # Only windows that ended at least `settle` ago were stored
+    assert cache.stats()['windows'] == 4
+
+    client.points.append((now - 5 * HOUR + 120 * NS_PER_SECOND, 99))
+    client.points.append((now - HOUR + 120 * NS_PER_SECOND, 42))
+    records = get(cache, client, start, stop)
+    # The settled window keeps its cached records; the recent ones are fetched again
+    assert [float(r['_value']) for r in records] == [42, 1, 2, 3, 4, 5, 6]
+    assert client.queries[-1] == [query_cache.range_query('calculator_logs', 'calculator_operation',
+                                                          now - 2 * HOUR, now + HOUR)]
+    assert cache.stats()['hits'] == 4
+    cache.close()
+
+def test_records_are_cut_to_the_requested_range(tmp_path):
+    now = aligned_now() - 10 * HOUR
+    client = FakeClient([(now + minute * 60 * NS_PER_SECOND, minute) for minute in range(0, 60, 10)])
+    cache = QueryCache(str(tmp_path / 'cache.db'), window_seconds=3600, settle=0)
+    start, stop = now + 15 * 60 * NS_PER_SECOND, now + 45 * 60 * NS_PER_SECOND
+    assert [float(r['_value']) for r in get(cache, client, start, stop)] == [40, 30, 20]
+    # The whole window was cached, so a wider range needs no query
+    assert [float(r['_value']) for r in get(cache, client, now, now + HOUR)] == [50, 40, 30, 20, 10, 0]
+    assert [queries for queries in client.queries if queries] == client.queries[:1]
+    cache.close()
+
+def test_failed_query_is_raised_and_not_cached(tmp_path):
+    class FailingClient:
+        async def query_many(self, queries):
+            return [RuntimeError('InfluxDB is down') for _ in queries]
+
+    now = aligned_now() - 10 * HOUR
+    cache = QueryCache(str(tmp_path / 'cache.db'), window_seconds=3600, settle=0)
+    with pytest.raises(RuntimeError):
+        get(cache, FailingClient(), now, now + HOUR)
+    assert cache.stats()['windows'] == 0
+    cache.close()
+
+def test_invalidate_drops_overlapping_windows(tmp_path):
+    cache = QueryCache(str(tmp_path / 'cache.db'), window_seconds=10)
+    for start in (0, 10, 20, 30):
+        cache.store('a', 'm', start, start + 10, [])
+    cache.store('b', 'm', 10, 20, [])
+    # [15, 25) overlaps windows [10, 20) and [20, 30), but not those ending or starting at its edges
+    assert cache.invalidate('a', 15, 25) == 2
+    assert cache.load('a', 'm', 0, 10) == [] and cache.load('a', 'm', 30, 40) == []
+    assert cache.load('a', 'm', 10, 20) is None and cache.load('a', 'm', 20, 30) is None
+    assert cache.load('b', 'm', 10, 20) == []
+    assert cache.invalidate('a', 10, 30) == 0
+    assert cache.invalidate('a', 10, 31) == 1
+    cache.close()
+
+def test_evicts_least_recently_used_windows(tmp_path, monkeypatch):
+    clock = iter(range(1000, 2000))
+    monkeypatch.setattr(query_cache.time, 'time', lambda: next(clock))
+    cache = QueryCache(str(tmp_path / 'cache.db'), window_seconds=10, max_bytes=100)
+    records = [{'_value': 'x' * 30}]
+    for start in (0, 10, 20):
+        cache.store('a', 'm', start, start + 10, records)
+    # Reading the oldest window makes it the most recently used
+    assert cache.load('a', 'm', 0, 10) == records
+    cache.evict()
+    assert cache.stats()['windows'] == 2
+    assert cache.load('a', 'm', 10, 20) is None
+    assert cache.load('a', 'm', 0, 10) == records and cache.load('a', 'm', 20, 30) == records
+    cache.close()
+
+def test_settle_from_env(tmp_path, monkeypatch):
+    monkeypatch.setenv("CALCULATOR_QUERY_SETTLE_SECONDS", "90")
+    cache = QueryCache.from_env(str(tmp_path / 'cache.db'))
+    assert cache.settle_ns == 90 * NS_PER_SECOND
+    cache.close()
+    cache = QueryCache.from_env(str(tmp_path / 'cache.db'), settle=5)
+    assert cache.settle_ns == 5 * NS_PER_SECOND
+    cache.close()
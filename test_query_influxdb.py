@@ -0,0 +1,23 @@
+from query_influxdb import load_checkpoint, save_checkpoint
+
+SOURCE = {'url': 'http://localhost:8086', 'org': 'calculator', 'bucket': 'calculator_logs'}
+
+def test_follow_checkpoint_round_trip(tmp_path):
+    path = str(tmp_path / 'checkpoint.json')
+    save_checkpoint(path, SOURCE, '2024-01-01T00:00:00.5Z')
+    assert load_checkpoint(path, dict(SOURCE)) == '2024-01-01T00:00:00.5Z'
+
+def test_follow_checkpoint_of_another_source_is_ignored(tmp_path):
+    path = str(tmp_path / 'checkpoint.json')
+    save_checkpoint(path, SOURCE, '2024-01-01T00:00:00Z')
+    assert load_checkpoint(path, {**SOURCE, 'bucket': 'kiosk_a'}) is None
+    assert load_checkpoint(path, {**SOURCE, 'org': 'other'}) is None
+    assert load_checkpoint(path, {**SOURCE, 'url': 'http://influx:8086'}) is None
+
+def test_follow_checkpoint_missing_or_old_format(tmp_path):
+    assert load_checkpoint(str(tmp_path / 'missing.json'), SOURCE) is None
+    old = tmp_path / 'old.json'
+    old.write_text('{"last_time": "2024-01-01T00:00:00Z"}')
+    assert load_checkpoint(str(old), SOURCE) is None
+    (tmp_path / 'list.json').write_text('[]')
+    assert load_checkpoint(str(tmp_path / 'list.json'), SOURCE) is None
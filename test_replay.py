@@ -0,0 +1,86 @@
+import log_segments
+from calculator_engine import CalculatorEngine
+from log_segments import segment_paths
+from replay import replay
+from session_journal import SessionJournal, read_journal, LOG
+
+class JournaledEngine(CalculatorEngine):
+    """Engine recording its session like the Tk window and the service do"""
+
+    def __init__(self, journal, precision_mode='float'):
+        super().__init__(precision_mode)
+        self.journal = journal
+        journal.reset(self.precision_mode, self.decimal_digits)
+
+    def add_to_log(self, operation, result):
+        self.journal.log_entry(self.make_log_entry(operation, result))
+
+def record_session(path):
+    journal = SessionJournal(str(path))
+    engine = JournaledEngine(journal)
+    for i in range(40):
+        for key in [str(i), '×', '3', '+', '1', '=', '±', '⌫', 'C']:
+            engine.button_clicked(key)
+    engine.evaluate_expression('2 * (3 + 4)')
+    engine.set_precision('fraction')
+    for key in ['1', '÷', '3', '=', 'undo', '6', '=']:
+        engine.button_clicked(key)
+    engine.set_scientific_mode(True)
+    for key in ['3', '0', 'sin']:
+        engine.button_clicked(key)
+    engine.recall_result('42')
+    engine.button_clicked('+')
+    engine.button_clicked('8')
+    engine.button_clicked('=')
+    # A second session in the same journal starts from its own reset
+    second = JournaledEngine(journal, 'decimal')
+    for key in ['1', '÷', '7', '=']:
+        second.button_clicked(key)
+    journal.close()
+    return journal
+
+def test_replay_across_rotated_segments(tmp_path, monkeypatch):
+    monkeypatch.setenv("CALCULATOR_LOG_MAX_BYTES", "300")
+    monkeypatch.setenv("CALCULATOR_LOG_BACKUPS", "1")
+    monkeypatch.setattr(log_segments, 'COMPRESS_DELAY', 0)
+    path = tmp_path / 'session.journal'
+    journal = record_session(path)
+    journal.log.maintain()
+    segments = segment_paths(str(path))
+    # The journal is exempt from retention, and its segments are compressed
+    assert len(segments) > 5 and all(name.endswith('.gz') for name in segments)
+
+    report = replay(str(path))
+    assert report.mismatches == []
+    assert report.sessions == 2
+    assert report.checked == sum(1 for record in read_journal(str(path)) if record[2] == LOG)
+    assert report.checked > 80
+
+def test_changed_result_is_a_mismatch(tmp_path):
+    path = tmp_path / 'session.journal'
+    journal = SessionJournal(str(path))
+    engine = JournaledEngine(journal)
+    for key in ['6', '×', '7', '=']:
+        engine.button_clicked(key)
+    journal.close()
+    text = path.read_text()
+    assert '\t42\n' in text
+    path.write_text(text.replace('\t42\n', '\t43\n'))
+
+    report = replay(str(path))
+    assert report.checked == 1
+    assert report.mismatches == [(7, '6.0 * 7.0 = 43', '6.0 * 7.0 = 42')]
+
+def test_unrecorded_entry_is_a_mismatch(tmp_path):
+    path = tmp_path / 'session.journal'
+    journal = SessionJournal(str(path))
+    engine = JournaledEngine(journal)
+    for key in ['2', '+', '2', '=']:
+        engine.button_clicked(key)
+    journal.close()
+    lines = path.read_text().splitlines(keepends=True)
+    path.write_text(''.join(line for line in lines if f'\t{LOG}\t' not in line))
+
+    report = replay(str(path))
+    assert report.checked == 0
+    assert report.mismatches == [('end', 'nothing', '2.0 + 2.0 = 4')]
@@ -0,0 +1,49 @@
+import math
+import pytest
+from calculator_engine import CalculatorEngine
+from scientific import EXACT_COS, EXACT_SIN, EXACT_TAN, trig_degrees
+
+def press(engine, keys):
+    for key in keys:
+        engine.button_clicked(key)
+    return engine.display_text
+
+@pytest.mark.parametrize('angle', sorted(EXACT_SIN))
+def test_exact_table_matches_math(angle):
+    radians = math.radians(angle)
+    assert math.isclose(EXACT_SIN[angle], math.sin(radians), abs_tol=1e-12)
+    assert math.isclose(EXACT_COS[angle], math.cos(radians), abs_tol=1e-12)
+    if EXACT_TAN[angle] is None:
+        assert angle in (90, 270)
+    else:
+        assert math.isclose(EXACT_TAN[angle], math.tan(radians), abs_tol=1e-12)
+
+def test_exact_values_at_standard_angles():
+    assert trig_degrees('sin', 180) == 0.0
+    assert trig_degrees('cos', 90) == 0.0
+    assert trig_degrees('tan', 45) == 1.0
+    assert trig_degrees('sin', 540.0) == 0.0
+    assert trig_degrees('cos', -60) == 0.5
+
+def test_tan_undefined():
+    assert trig_degrees('tan', 90) is None
+    assert trig_degrees('tan', -90) is None
+    assert trig_degrees('tan', 450) is None
+
+def test_other_angles_use_math():
+    assert trig_degrees('sin', 10.5) == math.sin(math.radians(10.5))
+    assert trig_degrees('tan', 89.5) == math.tan(math.radians(89.5))
+
+def test_engine_results():
+    assert press(CalculatorEngine(), ['1', '8', '0', 'sin', '=']) == '0'
+    assert press(CalculatorEngine(), ['6', '0', 'cos', '=']) == '0.5'
+    assert press(CalculatorEngine(), ['9', '0', 'tan', '=']) == 'Error: Undefined'
+    assert press(CalculatorEngine(), ['2', '7', '0', 'tan', '=']) == 'Error: Undefined'
+
+def test_engine_caches_function_results():
+    engine = CalculatorEngine()
+    press(engine, ['3', '0', 'sin', '='])
+    hits = engine.function_cache.hits
+    press(engine, ['C', '3', '0', 'sin', '='])
+    assert engine.display_text == '0.5'
+    assert engine.function_cache.hits == hits + 1
@@ -0,0 +1,85 @@
+import math
+import random
+import statistics
+from streaming_stats import P2Quantile, StreamingStats, format_stat, quantile_label
+
+def exact_quantile(values, p):
+    values = sorted(values)
+    rank = p * (len(values) - 1)
+    low = int(rank)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+def test_p2_exact_for_small_counts():
+    rng = random.Random(1)
+    values = [rng.uniform(0, 100) for _ in range(50)]
+    for p in (0.5, 0.9, 0.99):
+        quantile = P2Quantile(p)
+        for x in values:
+            quantile.add(x)
+        assert quantile.value() == exact_quantile(values, p)
+
+def test_p2_empty_and_single():
+    quantile = P2Quantile(0.5)
+    assert math.isnan(quantile.value())
+    quantile.add(7.0)
+    assert quantile.value() == 7.0
+
+def test_p2_estimates_large_streams():
+    rng = random.Random(2)
+    values = [rng.gauss(0, 1) for _ in range(100000)]
+    for p, tolerance in ((0.5, 0.02), (0.9, 0.03), (0.99, 0.08)):
+        quantile = P2Quantile(p)
+        for x in values:
+            quantile.add(x)
+        assert abs(quantile.value() - exact_quantile(values, p)) < tolerance
+
+def test_p2_sorted_input():
+    quantile = P2Quantile(0.5)
+    for x in range(10001):
+        quantile.add(float(x))
+    assert abs(quantile.value() - 5000) < 50
+
+def test_p2_constant_stream():
+    quantile = P2Quantile(0.9)
+    for _ in range(1000):
+        quantile.add(3.0)
+    assert quantile.value() == 3.0
+
+def test_streaming_stats_match_statistics():
+    rng = random.Random(3)
+    values = [rng.uniform(-1e6, 1e6) for _ in range(5000)]
+    stats = StreamingStats()
+    for x in values:
+        stats.add(x)
+    assert stats.count == len(values)
+    assert math.isclose(stats.mean, statistics.fmean(values), rel_tol=1e-9, abs_tol=1e-6)
+    assert math.isclose(stats.variance, statistics.variance(values), rel_tol=1e-9)
+    assert stats.min == min(values) and stats.max == max(values)
+
+def test_streaming_stats_skips_non_numbers():
+    stats = StreamingStats()
+    for text in ("1", "1/2", "Error: Division by zero", "", "inf", "2.5"):
+        stats.add_text(text)
+    assert stats.count == 3
+    assert math.isclose(stats.mean, 4 / 3)
+
+def test_add_entries_skips_clears_and_setting_changes():
+    stats = StreamingStats()
+    stats.add_entries([
+        {"operation": "1 + 1", "result": "2"},
+        {"operation": "Clear", "result": "0"},
+        {"operation": "Precision changed to Decimal", "result": ""},
+        {"operation": "2 × 2", "result": "4"},
+    ])
+    assert stats.count == 2 and stats.mean == 3.0
+
+def test_rows_before_and_after_values():
+    stats = StreamingStats()
+    rows = dict(stats.rows())
+    assert rows["Count"] == 0 and math.isnan(rows["Mean"]) and math.isnan(rows["Median"])
+    stats.add(4.0)
+    rows = dict(stats.rows())
+    assert rows["Mean"] == 4.0 and math.isnan(rows["Std dev"]) and rows["P99"] == 4.0
+    assert format_stat(rows["Count"]) == "1" and format_stat(rows["Std dev"]) == "-"
+    assert quantile_label(0.9) == "P90"